@@ -0,0 +1,102 @@
+"""Speed of comparing a transcription with its expected text on long passages.
+
+Builds a book-length reference text, derives a "transcription" from it by
+substituting, dropping, inserting and misspelling a fraction of the words, and
+times the previous ``difflib`` comparison (re-splitting the texts in every
+opcode) against ``helpers.text_alignment.align_texts``. Arabic passages are
+generated with diacritics on the reference only, which the alignment ignores.
+
+Usage (from ``src``):
+    python -m benchmarks.alignment_benchmark
+    python -m benchmarks.alignment_benchmark --words 2000,20000,100000 --error-rate 0.05
+"""
+import argparse
+import difflib
+import random
+import time
+from helpers.text_alignment import align_texts
+
+LATIN_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+ARABIC_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+ARABIC_DIACRITICS = "ًٌٍَُِّْ"
+
+
+def legacy_compare_texts(text1: str, text2: str):
+    """The comparison ``VoiceController`` used before the alignment module."""
+    seqm = difflib.SequenceMatcher(None, text1.split(), text2.split())
+    changes = []
+    for opcode, a0, a1, b0, b1 in seqm.get_opcodes():
+        if opcode == 'equal':
+            continue
+        elif opcode == 'insert':
+            changes.append({"type": "added", "text": " ".join(text2.split()[b0:b1])})
+        elif opcode == 'delete':
+            changes.append({"type": "removed", "text": " ".join(text1.split()[a0:a1])})
+        elif opcode == 'replace':
+            changes.append({
+                "type": "replaced",
+                "original": " ".join(text2.split()[b0:b1]),
+                "replacement": " ".join(text1.split()[a0:a1])
+            })
+    return changes
+
+
+def build_passages(words: int, error_rate: float, arabic: bool, seed: int = 0):
+    rng = random.Random(seed)
+    letters = ARABIC_LETTERS if arabic else LATIN_LETTERS
+    vocabulary = [ "".join(rng.choice(letters) for _ in range(rng.randint(2, 8))) for _ in range(3000) ]
+
+    reference, hypothesis = [], []
+    for _ in range(words):
+        word = rng.choice(vocabulary)
+        written = word
+        if arabic:
+            written = "".join(c + (rng.choice(ARABIC_DIACRITICS) if rng.random() < 0.5 else "") for c in word)
+        elif rng.random() < 0.1:
+            written = word.capitalize() + rng.choice([",", ".", ""])
+        reference.append(written)
+
+        roll = rng.random()
+        if roll < error_rate / 4:
+            continue                                              # dropped word
+        if roll < error_rate / 2:
+            hypothesis.extend([word, rng.choice(vocabulary)])     # inserted word
+        elif roll < error_rate * 3 / 4:
+            hypothesis.append(rng.choice(vocabulary))             # substituted word
+        elif roll < error_rate:
+            position = rng.randrange(len(word))                   # misspelled word
+            hypothesis.append(word[:position] + rng.choice(letters) + word[position + 1:])
+        else:
+            hypothesis.append(word)
+
+    return " ".join(reference), " ".join(hypothesis)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", default="1000,10000,50000", help="comma separated passage lengths")
+    parser.add_argument("--error-rate", type=float, default=0.03)
+    args = parser.parse_args()
+
+    print(f"{'passage':<16} {'difflib ms':>11} {'changes':>8} {'align ms':>9} {'changes':>8} "
+          f"{'confidence':>11} {'wer':>6}")
+    for arabic in (False, True):
+        for words in [ int(w) for w in args.words.split(",") ]:
+            reference, hypothesis = build_passages(words, args.error_rate, arabic)
+
+            legacy_changes, legacy_ms = timed(legacy_compare_texts, hypothesis, reference)
+            alignment, align_ms = timed(align_texts, reference, hypothesis)
+
+            name = f"{'ar' if arabic else 'en'} {words} words"
+            print(f"{name:<16} {legacy_ms:>11.1f} {len(legacy_changes):>8} {align_ms:>9.1f} "
+                  f"{len(alignment.error_runs()):>8} {alignment.confidence:>11.4f} {alignment.word_error_rate:>6.3f}")
+
+
+if __name__ == "__main__":
+    main()
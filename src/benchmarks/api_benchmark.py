@@ -0,0 +1,264 @@
+"""Offline latency/throughput benchmark for the full API.
+
+Boots the FastAPI app in-process against mongomock-motor, an in-memory Qdrant
+and the deterministic FAKE LLM backend (latency/error injection is configured
+through the FAKE_LLM_* environment variables), then drives every endpoint at the given
+concurrency and writes a JSON report that can be compared across commits.
+
+Usage (from ``src``, needs ``pip install -r benchmarks/requirements.txt``):
+    python -m benchmarks.api_benchmark --requests 200 --concurrency 16
+    python -m benchmarks.api_benchmark --compare benchmarks/results/<old>.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+import tracemalloc
+
+BENCH_ENV = {
+    "APP_NAME": "Specky",
+    "APP_VERSION": "bench",
+    "OPENAI_API_KEY": "",
+    "OPENAI_API_URL": "",
+    "COHERE_API_KEY": "",
+    "FILE_ALLOWED_TYPES": '["text/plain", "application/pdf"]',
+    "FILE_MAX_SIZE": "10",
+    "FILE_DEFAULT_CHUNK_SIZE": "512000",
+    "MONGODB_URL": "mongodb://localhost:27017",
+    "MONGODB_DATABASE": "specky_bench",
+    "GENERATION_BACKEND": "FAKE",
+    "EMBEDDING_BACKEND": "FAKE",
+    "GENERATION_MODEL_ID": "fake-generation",
+    "EMBEDDING_MODEL_ID": "fake-embedding",
+    "EMBEDDING_MODEL_SIZE": "384",
+    "INPUT_DAFAULT_MAX_CHARACTERS": "1024",
+    "GENERATION_DAFAULT_MAX_TOKENS": "200",
+    "GENERATION_DAFAULT_TEMPERATURE": "0.1",
+    "FAKE_LLM_LATENCY_DISTRIBUTION": "lognormal",
+    "FAKE_LLM_LATENCY_MS": "0",
+    "FAKE_LLM_LATENCY_JITTER_MS": "0",
+    "VECTOR_DB_BACKEND": "QDRANT",
+    "VECTOR_DB_PATH": ":memory:",
+    "VECTOR_DB_DISTANCE_METHOD": "cosine",
+}
+
+ENDPOINTS = ["upload", "process", "push", "search", "search_batch", "answer", "summary", "transcribe"]
+SEARCH_BATCH_SIZE = 32
+
+SAMPLE_TEXT = "\n\n".join(
+    " ".join(
+        f"Paragraph {p} sentence {s} talks about retrieval, speech and documents."
+        for s in range(8)
+    )
+    for p in range(40)
+)
+
+
+async def boot_app():
+    """Import the app with benchmark settings and start its service container on mongomock.
+
+    ``ASGITransport`` does not run the lifespan, so the container is started here.
+    """
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+
+    from mongomock_motor import AsyncMongoMockClient
+    from main import app
+    from helpers.config import get_settings
+    from helpers.container import ServiceContainer
+
+    container = ServiceContainer(settings=get_settings())
+    await container.startup(mongo_conn=AsyncMongoMockClient())
+    app.state.container = container
+
+    return app
+
+
+def build_request(endpoint: str, i: int, project_ids: list):
+    project_id = project_ids[i % len(project_ids)]
+
+    if endpoint == "upload":
+        return "POST", f"/api/v1/data/upload/{project_id}", {
+            "files": {"file": (f"bench_{i}.txt", SAMPLE_TEXT.encode("utf-8"), "text/plain")}
+        }
+    if endpoint == "process":
+        return "POST", f"/api/v1/data/process/{project_id}", {
+            # the sample paragraphs only differ by their numbers, keep them all so runs stay comparable
+            "json": {"chunk_size": 400, "overlap_size": 40, "do_reset": 1, "do_dedup": 0}
+        }
+    if endpoint == "push":
+        return "POST", f"/api/v1/nlp/index/push/{project_id}", {"json": {"do_reset": 0}}
+    if endpoint == "search":
+        return "POST", f"/api/v1/nlp/index/search/{project_id}", {
+            "json": {"text": f"what is said about retrieval {i}?", "limit": 5}
+        }
+    if endpoint == "search_batch":
+        return "POST", f"/api/v1/nlp/index/search-batch/{project_id}", {
+            "json": {"texts": [ f"what is said about retrieval {i}-{j}?" for j in range(SEARCH_BATCH_SIZE) ],
+                     "limit": 5}
+        }
+    if endpoint == "answer":
+        return "POST", f"/api/v1/nlp/index/answer/{project_id}", {
+            "json": {"text": f"what is said about speech {i}?", "limit": 5}
+        }
+    if endpoint == "summary":
+        return "POST", f"/api/v1/nlp/index/summry/{project_id}", {"params": {"target_word_count": 50}}
+    if endpoint == "transcribe":
+        return "POST", "/api/v1/voice/transcribe", {
+            "files": {"audio_file": (f"bench_{i}.mp3", os.urandom(2048), "audio/mpeg")},
+            "data": {"expected_text": "the quick brown fox jumped over a lazy dog", "language": "en"},
+        }
+
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))
+    return values[idx]
+
+
+async def run_endpoint(client, endpoint: str, requests: int, concurrency: int,
+                       project_ids: list, track_memory: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        method, url, kwargs = build_request(endpoint, i, project_ids)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+
+    if track_memory:
+        tracemalloc.reset_peak()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - started
+
+    peak_kb = tracemalloc.get_traced_memory()[1] / 1024 if track_memory else None
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(requests / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "peak_memory_kb": round(peak_kb, 1) if peak_kb is not None else None,
+    }
+
+
+async def run_benchmark(args):
+    import httpx
+
+    app = await boot_app()
+    project_ids = [f"bench{i}" for i in range(args.projects)]
+    endpoints = args.endpoints.split(",") if args.endpoints else ENDPOINTS
+
+    if args.memory:
+        tracemalloc.start()
+
+    results = {}
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for endpoint in ENDPOINTS:
+            # the data stages always run so that search/answer/summary have an index to hit
+            if endpoint not in endpoints and endpoint not in ("upload", "process", "push"):
+                continue
+
+            requests = args.requests if endpoint in endpoints else len(project_ids)
+            stats = await run_endpoint(client, endpoint, requests, args.concurrency,
+                                       project_ids, args.memory)
+            if endpoint in endpoints:
+                results[endpoint] = stats
+                print(f"{endpoint:<11} rps={stats['requests_per_second']:>9} "
+                      f"p50={stats['p50_ms']:>9}ms p95={stats['p95_ms']:>9}ms p99={stats['p99_ms']:>9}ms "
+                      f"errors={stats['errors']} peak={stats['peak_memory_kb']}KB")
+
+    if args.memory:
+        tracemalloc.stop()
+
+    await app.state.container.shutdown()
+
+    from controllers.ProjectController import ProjectController
+    for project_id in project_ids:
+        shutil.rmtree(ProjectController().get_project_path(project_id=project_id), ignore_errors=True)
+
+    return results
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\ncompared with {baseline['meta']['commit']} ({baseline_path})")
+    for endpoint, stats in current["endpoints"].items():
+        old = baseline["endpoints"].get(endpoint)
+        if not old:
+            continue
+        deltas = []
+        for key in ("requests_per_second", "p50_ms", "p95_ms", "p99_ms", "peak_memory_kb"):
+            if stats.get(key) is None or not old.get(key):
+                continue
+            deltas.append(f"{key}={(stats[key] - old[key]) / old[key] * 100:+.1f}%")
+        print(f"{endpoint:<11} " + " ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--projects", type=int, default=4, help="projects the requests are spread over")
+    parser.add_argument("--endpoints", default=None, help=f"comma separated subset of {','.join(ENDPOINTS)}")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip tracemalloc peak memory tracking (it slows down the run)")
+    parser.add_argument("--output", default=None, help="JSON report path, defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", default=None, help="previous JSON report to diff against")
+    args = parser.parse_args()
+
+    endpoints = asyncio.run(run_benchmark(args))
+
+    report = {
+        "meta": {
+            "commit": get_commit(),
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "endpoints": endpoints,
+    }
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
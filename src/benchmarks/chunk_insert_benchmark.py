@@ -0,0 +1,134 @@
+"""Documents per second of bulk chunk insertion, before and after the bulk path.
+
+Inserts the chunks of a large synthetic file three ways:
+
+* ``legacy``: ``DataChunk`` models dumped with ``.dict(by_alias=True)`` and
+  sent as ordered ``bulk_write`` batches of 100, one after another (the old
+  ``ChunkModel.insert_many_chunks``).
+* ``models``: the same models through ``ChunkModel.insert_many_chunks``,
+  now ``to_document`` and unordered batches with several in flight.
+* ``documents``: raw documents through ``ChunkModel.insert_chunk_documents``.
+
+Model construction is timed with the insert, as it is part of processing a
+file. Runs against mongomock-motor by default, whose cost is mostly Python;
+pass ``--mongo-url`` to measure against a real server (a throwaway database
+is created and dropped).
+
+Usage (from ``src``, needs ``pip install -r benchmarks/requirements.txt``):
+    python -m benchmarks.chunk_insert_benchmark
+    python -m benchmarks.chunk_insert_benchmark --chunks 100000 --mongo-url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import os
+import time
+import warnings
+from bson.objectid import ObjectId
+from pymongo import InsertOne
+from models.ChunkModel import ChunkModel
+from models.db_schemes import DataChunk
+from models.enums.DataBaseEnum import DataBaseEnum
+from benchmarks.api_benchmark import BENCH_ENV
+
+DATABASE_NAME = "specky_chunk_insert_bench"
+
+
+def build_fields(chunks: int, chunk_chars: int):
+    project_id, asset_id = ObjectId(), ObjectId()
+    sentence = "Paragraph {i} talks about retrieval, speech and documents. "
+    return [
+        {
+            "chunk_text": (sentence.format(i=i) * (chunk_chars // len(sentence) + 1))[:chunk_chars],
+            "chunk_metadata": {"source": "bench.pdf", "page": i // 8},
+            "chunk_order": i + 1,
+            "chunk_project_id": project_id,
+            "chunk_asset_id": asset_id,
+            "chunk_hash": f"{i:032x}",
+        }
+        for i in range(chunks)
+    ]
+
+
+async def insert_legacy(chunk_model: ChunkModel, fields: list):
+    chunks = [ DataChunk(**field) for field in fields ]
+    for i in range(0, len(chunks), 100):
+        await chunk_model.collection.bulk_write([
+            InsertOne(chunk.dict(by_alias=True, exclude_unset=True))
+            for chunk in chunks[i:i+100]
+        ])
+    return len(chunks)
+
+
+async def insert_models(chunk_model: ChunkModel, fields: list, batch_size: int, max_in_flight: int):
+    chunks = [ DataChunk(**field) for field in fields ]
+    return await chunk_model.insert_many_chunks(chunks=chunks, batch_size=batch_size, max_in_flight=max_in_flight)
+
+
+async def insert_documents(chunk_model: ChunkModel, fields: list, batch_size: int, max_in_flight: int):
+    documents = [ dict(field) for field in fields ]
+    return await chunk_model.insert_chunk_documents(documents=documents, batch_size=batch_size,
+                                                    max_in_flight=max_in_flight)
+
+
+async def run(args):
+    # the models read the app settings
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+
+    db = client[DATABASE_NAME]
+    chunk_model = await ChunkModel.create_instance(db_client=db)
+    fields = build_fields(args.chunks, args.chunk_chars)
+
+    cases = {
+        "legacy": lambda: insert_legacy(chunk_model, fields),
+        "models": lambda: insert_models(chunk_model, fields, args.batch_size, args.max_in_flight),
+        "documents": lambda: insert_documents(chunk_model, fields, args.batch_size, args.max_in_flight),
+    }
+
+    print(f"{args.chunks} chunks of {args.chunk_chars} chars, batch {args.batch_size}, "
+          f"{args.max_in_flight} in flight, {'mongo ' + args.mongo_url if args.mongo_url else 'mongomock'}")
+
+    rates = {}
+    try:
+        for name, insert in cases.items():
+            timings = []
+            for _ in range(args.rounds):
+                await db[DataBaseEnum.COLLECTION_CHUNK_NAME.value].delete_many({})
+                started = time.perf_counter()
+                inserted = await insert()
+                timings.append(time.perf_counter() - started)
+                assert inserted == args.chunks, f"{name} inserted {inserted} of {args.chunks} chunks"
+
+            best = min(timings)
+            rates[name] = args.chunks / best
+            print(f"{name:<10} best {best * 1000:9.1f}ms  {rates[name]:10.0f} docs/s  "
+                  f"x{rates[name] / rates['legacy']:.2f}")
+    finally:
+        await client.drop_database(DATABASE_NAME)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--chunk-chars", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--mongo-url", default=None, help="real mongo server, mongomock when not given")
+    args = parser.parse_args()
+
+    # the legacy path calls the deprecated pydantic .dict() on purpose
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
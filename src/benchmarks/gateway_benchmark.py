@@ -0,0 +1,121 @@
+"""Behaviour of the LLM gateway against a rate limited provider.
+
+Simulates a provider that serves at most ``--capacity`` concurrent calls and
+answers any call above it with a 429 carrying ``Retry-After``. ``--clients``
+threads then send calls for ``--seconds``, once straight to the provider and
+once through ``stores.llm.LLMGateway``, and the success rate, throughput and
+the adaptive concurrency limit over time are printed.
+
+Usage (from ``src``):
+    python -m benchmarks.gateway_benchmark
+    python -m benchmarks.gateway_benchmark --capacity 12 --clients 48 --seconds 10
+"""
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from stores.llm.LLMGateway import LLMGateway, ProviderUnavailableError
+
+
+class RateLimitError(Exception):
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("rate limited")
+        self.headers = {"retry-after": str(retry_after)}
+
+
+class SimulatedProvider:
+
+    def __init__(self, capacity: int, latency: float, retry_after: float):
+        self.capacity = capacity
+        self.latency = latency
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def call(self):
+        with self.lock:
+            if self.in_flight >= self.capacity:
+                raise RateLimitError(self.retry_after)
+            self.in_flight += 1
+        try:
+            time.sleep(self.latency)
+            return True
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def run(call, clients: int, seconds: float):
+    stats = {"ok": 0, "failed": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        while time.monotonic() < deadline:
+            try:
+                call()
+                outcome = "ok"
+            except (RateLimitError, ProviderUnavailableError):
+                outcome = "failed"
+            with lock:
+                stats[outcome] += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for _ in range(clients):
+            executor.submit(client)
+    stats["seconds"] = time.monotonic() - started
+    return stats
+
+
+def report(name: str, stats: dict):
+    total = stats["ok"] + stats["failed"]
+    print(f"{name:<10} ok={stats['ok']:>6} failed={stats['failed']:>6} "
+          f"success={stats['ok'] / max(1, total):>7.2%} throughput={stats['ok'] / stats['seconds']:>8.1f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacity", type=int, default=16, help="concurrent calls the provider accepts")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per provider call")
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    # every retry is logged as a warning, far too many here
+    logging.getLogger("stores.llm.LLMGateway").setLevel(logging.ERROR)
+
+    print(f"provider capacity {args.capacity}, {args.clients} clients, ideal throughput "
+          f"{args.capacity / args.latency:.1f}/s")
+
+    provider = SimulatedProvider(args.capacity, args.latency, args.retry_after)
+    report("direct", run(provider.call, args.clients, args.seconds))
+
+    gateway = LLMGateway(provider="simulated", initial_concurrency=4, max_concurrency=args.clients,
+                         max_attempts=6, base_delay=0.05, max_delay=2, queue_timeout=args.seconds * 2)
+    limiter = gateway.get_limiter("chat")
+
+    samples = []
+    sampling = threading.Event()
+
+    def sample():
+        while not sampling.wait(args.seconds / 10):
+            samples.append(int(limiter.limit))
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    stats = run(lambda: gateway.call("chat", provider.call), args.clients, args.seconds)
+    sampling.set()
+    sampler.join()
+
+    report("gateway", stats)
+    print(f"gateway concurrency limit over time: {samples}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Offline recall of reduced embeddings, to choose EMBEDDING_REDUCED_SIZE.
+
+Exact top ``--k`` neighbours of every query are computed with the full size
+embeddings and compared with the neighbours found after Matryoshka truncation
+and after a PCA projection fitted on ``--fit-size`` of the documents, for every
+size in ``--dims``. recall@k and the vector storage per document are printed.
+
+Real embeddings give the meaningful numbers: export the vectors of a project
+as a float32 ``.npy`` matrix (one row per chunk) and pass it with
+``--documents``, with ``--queries`` holding embedded questions (otherwise
+perturbed documents are used as queries). Without files, synthetic embeddings
+with most of their variance in a few directions and in their first values, as
+Matryoshka models produce, are generated.
+
+Usage (from ``src``):
+    python -m benchmarks.reduction_benchmark
+    python -m benchmarks.reduction_benchmark --documents docs.npy --queries queries.npy --dims 128 256 512
+"""
+import argparse
+import time
+import numpy as np
+from helpers.embedding_reduction import EmbeddingProjection, normalize
+
+
+def synthetic_embeddings(count: int, size: int, rank: int, rng: np.random.Generator) -> np.ndarray:
+    # a few latent topics dominate, and the leading values carry more variance than the trailing ones
+    latent = rng.standard_normal((count, rank)).astype(np.float32)
+    basis = rng.standard_normal((rank, size)).astype(np.float32)
+    scales = np.linspace(2.0, 0.2, size, dtype=np.float32)
+    vectors = latent @ basis * scales + 0.3 * rng.standard_normal((count, size)).astype(np.float32)
+    return normalize(vectors)
+
+
+def top_k(documents: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ documents.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return top
+
+
+def recall(expected: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected.tolist(), found.tolist()))
+    return hits / expected.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", help=".npy matrix of document embeddings")
+    parser.add_argument("--queries", help=".npy matrix of query embeddings")
+    parser.add_argument("--count", type=int, default=20000, help="synthetic documents")
+    parser.add_argument("--size", type=int, default=1536, help="synthetic embedding size")
+    parser.add_argument("--rank", type=int, default=96, help="latent directions of the synthetic embeddings")
+    parser.add_argument("--query-count", type=int, default=500)
+    parser.add_argument("--fit-size", type=int, default=4096, help="documents the PCA is fitted on")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 512, 768])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    if args.documents:
+        documents = normalize(np.load(args.documents).astype(np.float32))
+    else:
+        documents = synthetic_embeddings(args.count, args.size, args.rank, rng)
+
+    if args.queries:
+        queries = normalize(np.load(args.queries).astype(np.float32))
+    else:
+        picked = documents[rng.choice(len(documents), size=args.query_count, replace=False)]
+        queries = normalize(picked + 0.05 * rng.standard_normal(picked.shape).astype(np.float32))
+
+    size = documents.shape[1]
+    expected = top_k(documents, queries, args.k)
+    fit_sample = documents[rng.choice(len(documents), size=min(args.fit_size, len(documents)), replace=False)]
+
+    print(f"{len(documents)} documents, {len(queries)} queries, {size} dimensions, recall@{args.k}")
+    print(f"{'dims':>6} {'bytes/vector':>13} {'truncate':>9} {'pca':>9} {'pca fit':>9}")
+
+    for dimension in args.dims:
+        if dimension >= size:
+            continue
+
+        truncation = EmbeddingProjection(dimension=dimension)
+        truncate_recall = recall(expected, top_k(
+            np.asarray(truncation.transform(documents)), np.asarray(truncation.transform(queries)), args.k,
+        ))
+
+        pca_recall, fit_seconds = None, None
+        if len(fit_sample) > dimension:
+            started = time.perf_counter()
+            pca = EmbeddingProjection.fit_pca(fit_sample, dimension=dimension)
+            fit_seconds = time.perf_counter() - started
+            pca_recall = recall(expected, top_k(
+                np.asarray(pca.transform(documents)), np.asarray(pca.transform(queries)), args.k,
+            ))
+
+        print(f"{dimension:>6} {dimension * 4:>13} {truncate_recall:>9.3f} "
+              f"{'-' if pca_recall is None else f'{pca_recall:.3f}':>9} "
+              f"{'-' if fit_seconds is None else f'{fit_seconds:.2f}s':>9}")
+
+    print(f"{size:>6} {size * 4:>13} {1.0:>9.3f} {1.0:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Tail latency of generation through the routing provider.
+
+Builds FAKE backends: ``primary`` with a lognormal latency (``--median-ms``
+median, a long tail widened by ``--jitter-ms``) and ``secondary`` with a
+constant ``--secondary-ms`` latency. ``--requests`` generations are then sent
+by ``--clients`` threads straight to ``primary``, through a router without
+hedging and through a router with hedging, and p50/p95/p99 are printed.
+
+Usage (from ``src``):
+    python -m benchmarks.router_benchmark
+    python -m benchmarks.router_benchmark --median-ms 40 --jitter-ms 200 --requests 1000
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from stores.llm.LLMEnums import FakeEnums
+from stores.llm.providers.FakeProvider import FakeProvider
+from stores.llm.providers.RoutingProvider import RoutingProvider
+
+
+def build_backends(args, seed: int) -> dict:
+    primary = FakeProvider(latency_distribution=FakeEnums.LOGNORMAL.value, latency_ms=args.median_ms,
+                           latency_jitter_ms=args.jitter_ms, seed=seed)
+    secondary = FakeProvider(latency_distribution=FakeEnums.CONSTANT.value, latency_ms=args.secondary_ms,
+                             seed=seed + 1)
+    return {"primary": primary, "secondary": secondary}
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run(client, requests: int, clients: int) -> list:
+    client.set_generation_model(model_id="fake-chat")
+
+    def call(i: int) -> float:
+        started = time.perf_counter()
+        client.generate_text(prompt=f"question {i}")
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        return list(executor.map(call, range(requests)))
+
+
+def report(name: str, latencies: list):
+    print(f"{name:<10} p50={percentile(latencies, 50) * 1000:>7.1f}ms p95={percentile(latencies, 95) * 1000:>7.1f}ms "
+          f"p99={percentile(latencies, 99) * 1000:>7.1f}ms max={max(latencies) * 1000:>7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--median-ms", type=float, default=30)
+    parser.add_argument("--jitter-ms", type=float, default=120, help="widens the tail of the primary backend")
+    parser.add_argument("--secondary-ms", type=float, default=60)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--hedge-percentile", type=float, default=90)
+    args = parser.parse_args()
+
+    report("direct", run(build_backends(args, seed=1)["primary"], args.requests, args.clients))
+
+    router = RoutingProvider(backends=build_backends(args, seed=1))
+    report("routed", run(router, args.requests, args.clients))
+    router.close()
+
+    # a low minimum delay so the hedge fires at the measured percentile
+    router = RoutingProvider(backends=build_backends(args, seed=1), hedge=True,
+                             hedge_percentile=args.hedge_percentile, hedge_min_delay=0.01)
+    report("hedged", run(router, args.requests, args.clients))
+    router.close()
+
+
+if __name__ == "__main__":
+    main()
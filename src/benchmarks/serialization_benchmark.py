@@ -0,0 +1,110 @@
+"""CPU cost of rendering API responses, before and after the orjson switch.
+
+Measures process CPU time per response for the payloads that dominate the
+NLP routes (collection info, search results and megabyte-sized translation
+or summary text) rendered the old way (``json`` round trips, ``.dict()`` and
+``JSONResponse``) and the new way (typed serializers and ``ORJSONResponse``),
+plus the cost and the bytes saved by gzip/brotli compression.
+
+Usage (from ``src``):
+    python -m benchmarks.serialization_benchmark
+    python -m benchmarks.serialization_benchmark --results 50 --text-kb 2048 --rounds 50
+"""
+import argparse
+import json
+import random
+import time
+import warnings
+from fastapi.responses import JSONResponse, ORJSONResponse
+from qdrant_client import QdrantClient, models
+from models.db_schemes import RetrievedDocument
+from helpers.responses import serialize_retrieved_documents, compress_body, brotli
+
+
+def cpu_ms_per_call(func, rounds: int):
+    func()  # warm up
+    started = time.process_time()
+    for _ in range(rounds):
+        func()
+    return (time.process_time() - started) / rounds * 1000
+
+
+def build_payloads(results: int, text_kb: int):
+    client = QdrantClient(location=":memory:")
+    client.create_collection(
+        collection_name="bench",
+        vectors_config=models.VectorParams(size=384, distance=models.Distance.COSINE),
+    )
+    collection_info = client.get_collection(collection_name="bench")
+
+    documents = [
+        RetrievedDocument(text=f"Paragraph {i} talks about retrieval, speech and documents. " * 8,
+                          score=1 / (i + 1))
+        for i in range(results)
+    ]
+
+    # seeded random words so compression ratios resemble real prose rather than a repeated sentence
+    rng = random.Random(0)
+    vocabulary = [ "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9)))
+                   for _ in range(5000) ]
+    words, size = [], 0
+    while size < text_kb * 1024:
+        word = rng.choice(vocabulary)
+        words.append(word)
+        size += len(word) + 1
+    text = " ".join(words)
+
+    return collection_info, documents, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=20, help="retrieved documents per search response")
+    parser.add_argument("--text-kb", type=int, default=1024, help="size of the translation/summary text")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    # the old path calls the deprecated pydantic .dict() on purpose
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    collection_info, documents, text = build_payloads(args.results, args.text_kb)
+    text_rounds = max(1, args.rounds // 10)
+
+    cases = {
+        "collection info": (
+            lambda: JSONResponse(content={"collection_info": json.loads(
+                json.dumps(collection_info, default=lambda x: x.__dict__))}),
+            lambda: ORJSONResponse(content={"collection_info": collection_info.model_dump(mode="json")}),
+            args.rounds,
+        ),
+        f"search ({args.results} results)": (
+            lambda: JSONResponse(content={"results": [ d.dict() for d in documents ]}),
+            lambda: ORJSONResponse(content={"results": serialize_retrieved_documents(documents)}),
+            args.rounds,
+        ),
+        f"translation ({args.text_kb}KB)": (
+            lambda: JSONResponse(content={"translation": text}),
+            lambda: ORJSONResponse(content={"translation": text}),
+            text_rounds,
+        ),
+    }
+
+    print(f"{'payload':<26} {'json ms':>9} {'orjson ms':>10} {'saved':>7}")
+    for name, (old, new, rounds) in cases.items():
+        old_ms = cpu_ms_per_call(old, rounds)
+        new_ms = cpu_ms_per_call(new, rounds)
+        print(f"{name:<26} {old_ms:>9.3f} {new_ms:>10.3f} {(1 - new_ms / old_ms) * 100:>6.1f}%")
+
+    body = ORJSONResponse(content={"translation": text}).body
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+
+    print(f"\n{'compression':<26} {'cpu ms':>9} {'bytes':>10} {'ratio':>7}")
+    print(f"{'identity':<26} {0:>9.3f} {len(body):>10} {1:>7.2f}")
+    for encoding in encodings:
+        compressed = compress_body(body, encoding)
+        cpu_ms = cpu_ms_per_call(lambda: compress_body(body, encoding), text_rounds)
+        print(f"{encoding:<26} {cpu_ms:>9.3f} {len(compressed):>10} {len(body) / len(compressed):>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare the langchain recursive splitter with the built-in sentence splitter.
+
+Usage (from ``src``):
+    python -m benchmarks.splitter_benchmark --file assets/files/<project>/<file>.txt
+    python -m benchmarks.splitter_benchmark --paragraphs 20000 --chunk-size 512
+"""
+import argparse
+import random
+import statistics
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from helpers.text_splitter import SentenceTextSplitter
+
+EN_WORDS = ["the", "project", "document", "speech", "model", "retrieval", "answer",
+            "chunk", "vector", "query", "language", "summary", "pronunciation"]
+AR_WORDS = ["المستند", "السؤال", "الإجابة", "النص", "الملخص", "اللغة", "المستخدم"]
+
+
+def generate_text(paragraphs: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(paragraphs):
+        words = AR_WORDS if rng.random() < 0.3 else EN_WORDS
+        end = "؟" if words is AR_WORDS else rng.choice([".", "!", "?"])
+        sentences = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(5, 30))) + end
+            for _ in range(rng.randint(1, 8))
+        ]
+        out.append(" ".join(sentences))
+    return "\n\n".join(out)
+
+
+def run(name: str, splitter, text: str, repeat: int, length_function):
+    best = None
+    chunks = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = splitter.split_text(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    sizes = sorted(length_function(chunk) for chunk in chunks)
+    print(f"{name:<24} chunks={len(chunks):<8} time={best * 1000:9.1f}ms "
+          f"chunks/s={len(chunks) / best:11.0f} "
+          f"size min={sizes[0]} p50={sizes[len(sizes) // 2]} "
+          f"mean={statistics.mean(sizes):.1f} p95={sizes[int(len(sizes) * 0.95)]} max={sizes[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=None, help="UTF-8 text file to split")
+    parser.add_argument("--paragraphs", type=int, default=5000, help="synthetic paragraphs when no file is given")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = generate_text(args.paragraphs)
+
+    print(f"input: {len(text)} characters, chunk_size={args.chunk_size}, overlap={args.overlap}")
+
+    recursive = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=args.overlap, length_function=len,
+    )
+    sentence_chars = SentenceTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.overlap)
+    sentence_tokens = SentenceTextSplitter(
+        chunk_size=max(args.chunk_size // 4, 2), chunk_overlap=args.overlap // 4, length_unit="token",
+    )
+
+    run("recursive (chars)", recursive, text, args.repeat, len)
+    run("sentence (chars)", sentence_chars, text, args.repeat, len)
+    run("sentence (tokens)", sentence_tokens, text, args.repeat, sentence_tokens.length_function)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Import time report for the API cold start.
+
+Imports the app (and any extra modules) in a fresh interpreter with
+``python -X importtime`` and prints the slowest modules, so a new eager import
+of a heavy SDK shows up before it reaches the autoscaled pods.
+
+Usage (from ``src``):
+    python -m benchmarks.startup_report
+    python -m benchmarks.startup_report --top 40 --by-package
+    python -m benchmarks.startup_report --module main --module stores.llm.providers.OpenAIProvider
+    python -m benchmarks.startup_report --max-ms 800   # exit 1 when the total import time is above 800ms
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+START_MARKER = "--startup-report--"
+
+
+def measure_imports(modules: list):
+    """Import ``modules`` in a subprocess and return ``[(module, depth, self_us, cumulative_us)]``."""
+    # the marker separates the modules under test from the interpreter's own startup imports
+    code = "; ".join(["import sys", f"sys.stderr.write('{START_MARKER}\\n')"]
+                     + [f"import {module}" for module in modules])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}")
+
+    records = []
+    started = False
+    for line in result.stderr.splitlines():
+        if line == START_MARKER:
+            started = True
+            continue
+        if not started or not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        records.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+
+    return records
+
+
+def group_by_package(records: list):
+    """Sum the self time of every module into its top level package."""
+    packages = defaultdict(int)
+    for name, _, self_us, _ in records:
+        packages[name.split(".")[0]] += self_us
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", action="append", default=None,
+                        help="module to import, repeatable (defaults to main)")
+    parser.add_argument("--top", type=int, default=25, help="number of rows to print")
+    parser.add_argument("--by-package", action="store_true",
+                        help="aggregate self time per top level package instead of listing modules")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail when the total import time exceeds this budget")
+    args = parser.parse_args()
+
+    modules = args.module or ["main"]
+    records = measure_imports(modules)
+
+    total_us = sum(cumulative_us for _, depth, _, cumulative_us in records if depth == 0)
+
+    if args.by_package:
+        print(f"{'self ms':>10}  package")
+        for package, self_us in group_by_package(records)[:args.top]:
+            print(f"{self_us / 1000:>10.1f}  {package}")
+    else:
+        print(f"{'cumul ms':>10} {'self ms':>9}  module")
+        for name, _, self_us, cumulative_us in sorted(records, key=lambda r: r[3], reverse=True)[:args.top]:
+            print(f"{cumulative_us / 1000:>10.1f} {self_us / 1000:>9.1f}  {name}")
+
+    print(f"\n{len(records)} modules imported in {total_us / 1000:.1f}ms ({', '.join(modules)})")
+
+    if args.max_ms is not None and total_us / 1000 > args.max_ms:
+        print(f"import time is above the {args.max_ms:.0f}ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
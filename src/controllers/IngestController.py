@@ -0,0 +1,149 @@
+from .BaseController import BaseController
+from .ProcessController import ProcessController
+from .NLPController import NLPController
+from models.ChunkModel import ChunkModel
+from models.db_schemes import Project, DataChunk
+from models import TextSplitterEnum, LengthUnitEnum
+from helpers.pipeline import PipelineStage, run_pipeline
+from helpers.metrics import CHUNKS_PROCESSED
+from bson.objectid import ObjectId
+import asyncio
+import time
+
+class IngestController(BaseController):
+    """
+    Streams a file through parse -> split -> Mongo insert -> embed -> vector db upsert.
+
+    Each stage runs its own pool of workers connected by bounded queues, so
+    embedding of the first chunks starts while later pages are still parsed.
+    """
+
+    def __init__(self, process_controller: ProcessController,
+                 nlp_controller: NLPController, chunk_model: ChunkModel):
+        super().__init__()
+
+        self.process_controller = process_controller
+        self.nlp_controller = nlp_controller
+        self.chunk_model = chunk_model
+
+    async def ingest_file(self, project: Project, asset_id: ObjectId, file_id: str,
+                          chunk_size: int = 100, overlap_size: int = 20,
+                          splitter: str = TextSplitterEnum.RECURSIVE.value,
+                          length_unit: str = LengthUnitEnum.CHAR.value, dedup: bool = True):
+        """
+        Ingest one file of a project end to end.
+
+        Returns:
+            dict: inserted chunks, dropped near duplicates, indexed vectors, total seconds
+            and per-stage stats,
+            or None if the file can not be loaded.
+        """
+        pages = self.process_controller.get_file_pages(file_id=file_id)
+        if pages is None:
+            return None
+
+        settings = self.app_settings
+        counters = {"chunk_order": 0, "inserted_chunks": 0, "duplicate_chunks": 0, "indexed_vectors": 0}
+
+        # chunks near duplicating one already in the project are neither stored nor embedded
+        detector = None
+        if dedup:
+            detector = await self.process_controller.load_near_duplicate_detector(
+                chunk_model=self.chunk_model, project_id=project.id,
+            )
+
+        self.nlp_controller.ensure_vector_db_collection(project=project)
+
+        async def split(pages: list):
+            return await asyncio.to_thread(
+                self.process_controller.process_file_content,
+                file_content=pages,
+                file_id=file_id,
+                chunk_size=chunk_size,
+                overlap_size=overlap_size,
+                splitter=splitter,
+                length_unit=length_unit,
+            )
+
+        async def sequence(chunks: list):
+            records = []
+            for chunk in chunks:
+                counters["chunk_order"] += 1
+                record = DataChunk(
+                    chunk_text=chunk.page_content,
+                    chunk_metadata=chunk.metadata,
+                    chunk_order=counters["chunk_order"],
+                    chunk_project_id=project.id,
+                    chunk_asset_id=asset_id,
+                    chunk_hash=self.process_controller.get_chunk_hash(chunk.page_content),
+                )
+                record.id = ObjectId()
+                records.append(record)
+
+            CHUNKS_PROCESSED.labels(route="ingest").inc(len(records))
+
+            if detector is not None:
+                kept = await asyncio.to_thread(self.process_controller.drop_near_duplicates, detector, records)
+                counters["duplicate_chunks"] += len(records) - len(kept)
+                records = kept
+
+            return records
+
+        async def insert(records: list):
+            # awaited before the read of the counter, the insert workers run concurrently
+            inserted = await self.chunk_model.insert_many_chunks(chunks=records)
+            counters["inserted_chunks"] += inserted
+            return records
+
+        async def embed(records: list):
+            vectors = await asyncio.to_thread(
+                self.nlp_controller.embed_documents,
+                [ record.chunk_text for record in records ],
+            )
+
+            if not vectors or len(vectors) != len(records):
+                raise RuntimeError(f"Embedding failed for a batch of {len(records)} chunks")
+
+            return list(zip(records, vectors))
+
+        async def upsert(items: list):
+            records = [ record for record, _ in items ]
+            vectors = [ vector for _, vector in items ]
+
+            is_inserted = await asyncio.to_thread(
+                self.nlp_controller.insert_vectors,
+                project, records, vectors,
+            )
+
+            if not is_inserted:
+                raise RuntimeError(f"Vector db upsert failed for a batch of {len(records)} chunks")
+
+            counters["indexed_vectors"] += len(records)
+            return []
+
+        stages = [
+            PipelineStage("split", split, concurrency=settings.INGEST_SPLIT_CONCURRENCY, ordered=True),
+            PipelineStage("sequence", sequence),
+            PipelineStage("insert", insert, concurrency=settings.INGEST_INSERT_CONCURRENCY,
+                          batch_size=settings.INGEST_INSERT_BATCH_SIZE),
+            PipelineStage("embed", embed, concurrency=settings.INGEST_EMBED_CONCURRENCY,
+                          batch_size=settings.INGEST_EMBED_BATCH_SIZE),
+            PipelineStage("upsert", upsert, concurrency=settings.INGEST_UPSERT_CONCURRENCY,
+                          batch_size=settings.INGEST_UPSERT_BATCH_SIZE),
+        ]
+
+        started = time.perf_counter()
+        stages_stats = await run_pipeline(
+            source=pages,
+            stages=stages,
+            source_name="parse",
+            queue_size=settings.INGEST_QUEUE_SIZE,
+        )
+
+        return {
+            "inserted_chunks": counters["inserted_chunks"],
+            "duplicate_chunks": counters["duplicate_chunks"],
+            "indexed_vectors": counters["indexed_vectors"],
+            "total_seconds": round(time.perf_counter() - started, 4),
+            "stages": stages_stats,
+        }
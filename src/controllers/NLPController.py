@@ -1,93 +1,382 @@
 from .BaseController import BaseController
-from models.db_schemes import Project, DataChunk
+from models.db_schemes import Project, DataChunk, RetrievedDocument
+from bson.objectid import ObjectId
+from helpers.metrics import observe_stage
+from helpers.embedding_reduction import EmbeddingReducer
+from helpers.tracing import trace_methods
 from stores.llm.LLMEnums import DocumentTypeEnum
-from typing import List
-import json
+from typing import AsyncIterator, List, Optional
+import asyncio
+import logging
+import threading
+import uuid
 
+logger = logging.getLogger(__name__)
+
+@trace_methods("nlp", include=["index_into_vector_db", "promote_shadow_collection", "embed_documents", "insert_vectors",
+                               "delete_from_vector_db", "search_vector_db_collection",
+                               "search_vector_db_collection_batch", "fit_embedding_projection",
+                               "answer_rag_question", "summarize_text"])
 class NLPController(BaseController):
 
     def __init__(self, vectordb_client, generation_client, 
-                 embedding_client, template_parser):
+                 embedding_client, template_parser, embedding_reducer: EmbeddingReducer = None):
         super().__init__()
 
         self.vectordb_client = vectordb_client
         self.generation_client = generation_client
         self.embedding_client = embedding_client
         self.template_parser = template_parser
+        self.embedding_reducer = embedding_reducer
+
+        # alias switches of a project are serialized within the process
+        self.alias_locks = {}
+        self.alias_locks_lock = threading.Lock()
 
     def create_collection_name(self, project_id: str):
         return f"collection_{project_id}".strip()
     
-    def reset_vector_db_collection(self, project: Project):
+    def get_chunk_vector_id(self, chunk_id):
+        # qdrant ids must be unsigned ints or UUIDs, pad the 12-byte ObjectId
+        return str(uuid.UUID(bytes=ObjectId(str(chunk_id)).binary + bytes(4)))
+
+    def has_legacy_point_ids(self, project: Project) -> bool:
+        """Whether the project was indexed with the sequential int point ids used before ``get_chunk_vector_id``.
+
+        Those points can not be found by chunk id, so pushing again without a
+        reset would duplicate every chunk and deletes would miss them.
+        """
         collection_name = self.create_collection_name(project_id=project.project_id)
+        record_ids = self.vectordb_client.sample_record_ids(collection_name=collection_name, limit=1)
+        return bool(record_ids) and isinstance(record_ids[0], int)
+
+    def get_vector_size(self) -> int:
+        if self.embedding_reducer is not None:
+            return self.embedding_reducer.dimension
+        return self.embedding_client.embedding_size
+
+    def reduce_vectors(self, collection_name: str, vectors: List[list]) -> List[list]:
+        # documents and queries of a collection go through the same projection, it is keyed by
+        # the versioned collection so a reindex can fit a new one without touching the live index
+        if self.embedding_reducer is None or not vectors:
+            return vectors
+        with observe_stage("embed_reduce"):
+            return self.embedding_reducer.reduce(collection_name, vectors)
+
+    def create_collection_version_name(self, project_id: str, version: int):
+        # the random suffix keeps concurrent reindexes of a project out of each other's collection
+        return f"{self.create_collection_name(project_id=project_id)}_v{version}_{uuid.uuid4().hex[:8]}"
+
+    def get_alias_lock(self, project: Project) -> threading.Lock:
+        with self.alias_locks_lock:
+            return self.alias_locks.setdefault(project.project_id, threading.Lock())
+
+    def get_live_collection_name(self, project: Project) -> Optional[str]:
+        """Collection the alias of the project points to, None when the project was never indexed."""
+        alias_name = self.create_collection_name(project_id=project.project_id)
+
+        target = self.vectordb_client.get_alias_target(alias_name)
+        if target is not None:
+            return target
+
+        # projects indexed before the aliases have a collection with the alias name
+        if self.vectordb_client.is_collection_existed(alias_name):
+            return alias_name
+
+        return None
+
+    def get_projection_collection_name(self, project: Project) -> str:
+        """Collection whose projection reduces the vectors of the project, the alias name before the first push."""
+        return self.get_live_collection_name(project) or self.create_collection_name(project_id=project.project_id)
+
+    def migrate_alias_projections(self):
+        """Move the projections saved under an alias name to the collection the alias points to."""
+        if self.embedding_reducer is None:
+            return
+
+        for name in self.embedding_reducer.list_projections():
+            target = self.vectordb_client.get_alias_target(name)
+            if target is not None and self.embedding_reducer.export_projection(target) is None:
+                logger.info(f"Moving the projection of {name} to {target}")
+                self.embedding_reducer.move_projection(name, target)
+
+    def run_on_live_collection(self, project: Project, operation):
+        """Run ``operation(collection_name)`` on the live collection of the project, False if it has none.
+
+        The collection is addressed by name rather than through the alias so
+        the projection of a query always matches the vectors it is searched
+        against. If the operation fails or finds nothing because a reindex was
+        promoted meanwhile and dropped the collection, it runs again on the new one.
+        """
+        collection_name = self.get_live_collection_name(project)
+        if collection_name is None:
+            return False
+
+        try:
+            result = operation(collection_name)
+        except Exception:
+            if self.get_live_collection_name(project) in (None, collection_name):
+                raise
+            result = None
+
+        if not result:
+            live_name = self.get_live_collection_name(project)
+            if live_name is not None and live_name != collection_name:
+                return operation(live_name)
+
+        return result
+
+    def get_next_collection_version(self, project: Project) -> int:
+        live_name = self.get_live_collection_name(project)
+        prefix = f"{self.create_collection_name(project_id=project.project_id)}_v"
+
+        if live_name is None or not live_name.startswith(prefix):
+            return 1
+
+        version = live_name[len(prefix):].split("_")[0]
+        return int(version) + 1 if version.isdigit() else 1
+
+    def create_shadow_collection(self, project: Project) -> str:
+        """Create an empty collection for the next version of the project's index.
+
+        Searches keep going to the live collection until the shadow is
+        promoted with ``promote_shadow_collection``. The shadow starts with
+        the projection of the live collection.
+        """
+        live_name = self.get_live_collection_name(project)
+        collection_name = self.create_collection_version_name(project_id=project.project_id,
+                                                              version=self.get_next_collection_version(project))
+
+        if self.embedding_reducer is not None and live_name is not None:
+            content = self.embedding_reducer.export_projection(live_name)
+            if content is not None:
+                self.embedding_reducer.import_projection(collection_name, content)
+
+        self.vectordb_client.create_collection(
+            collection_name=collection_name,
+            embedding_size=self.get_vector_size(),
+            do_reset=False,
+        )
+
+        return collection_name
+
+    def promote_shadow_collection(self, project: Project, collection_name: str):
+        """Atomically point the alias of the project at ``collection_name`` and drop the previous version.
+
+        When two reindexes of a project overlap, the last one promoted wins
+        and the other's collection is dropped as the previous version.
+        """
+        with self.get_alias_lock(project):
+            return self.switch_live_collection(project, collection_name)
+
+    def switch_live_collection(self, project: Project, collection_name: str):
+        alias_name = self.create_collection_name(project_id=project.project_id)
+        live_name = self.get_live_collection_name(project)
+
+        if live_name == alias_name:
+            # an alias can not share its name with a collection, the legacy
+            # collection goes first so this one switch is not atomic
+            self.drop_shadow_collection(collection_name=alias_name)
+            live_name = None
+
+        self.vectordb_client.switch_alias(alias_name=alias_name, collection_name=collection_name)
+
+        if live_name is not None and live_name != collection_name:
+            self.drop_shadow_collection(collection_name=live_name)
+
+        return True
+
+    def drop_shadow_collection(self, collection_name: str):
+        if self.embedding_reducer is not None:
+            self.embedding_reducer.forget(collection_name)
         return self.vectordb_client.delete_collection(collection_name=collection_name)
+
+    def reset_vector_db_collection(self, project: Project):
+        collection_name = self.create_collection_name(project_id=project.project_id)
+        if self.embedding_reducer is not None:
+            self.embedding_reducer.forget(collection_name)
+
+        live_name = self.get_live_collection_name(project)
+        self.vectordb_client.delete_alias(alias_name=collection_name)
+        if live_name is not None:
+            return self.drop_shadow_collection(collection_name=live_name)
     
     def get_vector_db_collection_info(self, project: Project):
         collection_name = self.create_collection_name(project_id=project.project_id)
-        collection_info = self.vectordb_client.get_collection_info(collection_name=collection_name)
-    
-        return json.loads(
-            json.dumps(collection_info, default=lambda x: x.__dict__)
-        )
+        return self.vectordb_client.get_collection_info(collection_name=collection_name)
+
+    def get_embedding_projection_info(self, project: Project):
+        if self.embedding_reducer is None:
+            return None
+        return self.embedding_reducer.get_info(self.get_projection_collection_name(project))
+
+    def fit_embedding_projection(self, project: Project, chunks: List[DataChunk], collection_name: str):
+        """Fit the PCA projection of a shadow collection on a sample of the project's chunks.
+
+        The live collection keeps its projection; the shadow has to be
+        indexed and promoted before searches use the new one.
+
+        Returns:
+            dict: method and dimension of the new projection, or None if the
+            embeddings could not be computed.
+        """
+        vectors = self.embed_documents([ c.chunk_text for c in chunks ])
+        if not vectors or len(vectors) != len(chunks):
+            return None
+
+        with observe_stage("embed_reduce_fit"):
+            self.embedding_reducer.fit(collection_name, vectors)
+
+        return self.embedding_reducer.get_info(collection_name)
     
     def index_into_vector_db(self, project: Project, chunks: List[DataChunk],
                                    chunks_ids: List[int], 
-                                   do_reset: bool = False):
+                                   target_collection_name: str = None):
+        """Embed and insert chunks into the live collection of the project, or into ``target_collection_name``
+        (a shadow collection from ``create_shadow_collection``)."""
         
-        # step1: get collection name
-        collection_name = self.create_collection_name(project_id=project.project_id)
+        # step1: create collection if not exists
+        if target_collection_name is None:
+            _ = self.ensure_vector_db_collection(project=project)
+            target_collection_name = self.get_live_collection_name(project)
 
         # step2: manage items
         texts = [ c.chunk_text for c in chunks ]
         metadata = [ c.chunk_metadata for c in  chunks]
-        vectors = [
-            self.embedding_client.embed_text(text=text, 
-                                             document_type=DocumentTypeEnum.DOCUMENT.value)
-            for text in texts
-        ]
+        with observe_stage("index_embed"):
+            vectors = [
+                self.embedding_client.embed_text(text=text, 
+                                                 document_type=DocumentTypeEnum.DOCUMENT.value)
+                for text in texts
+            ]
 
-        # step3: create collection if not exists
-        _ = self.vectordb_client.create_collection(
-            collection_name=collection_name,
-            embedding_size=self.embedding_client.embedding_size,
-            do_reset=do_reset,
-        )
+        vectors = self.reduce_vectors(target_collection_name, vectors)
 
-        # step4: insert into vector db
-        _ = self.vectordb_client.insert_many(
-            collection_name=collection_name,
-            texts=texts,
-            metadata=metadata,
-            vectors=vectors,
-            record_ids=chunks_ids,
-        )
+        # step3: insert into vector db
+        with observe_stage("index_upsert"):
+            _ = self.vectordb_client.insert_many(
+                collection_name=target_collection_name,
+                texts=texts,
+                metadata=metadata,
+                vectors=vectors,
+                record_ids=chunks_ids,
+            )
 
         return True
 
-    def search_vector_db_collection(self, project: Project, text: str, limit: int = 10):
+    def ensure_vector_db_collection(self, project: Project):
+        with self.get_alias_lock(project):
+            if self.get_live_collection_name(project) is not None:
+                return False
+
+            # the first version of the index, behind the alias every read and write goes through
+            return self.switch_live_collection(project, self.create_shadow_collection(project))
+
+    def embed_documents(self, texts: List[str]):
+        return self.embedding_client.embed_texts(texts=texts,
+                                                 document_type=DocumentTypeEnum.DOCUMENT.value)
 
-        # step1: get collection name
+    def insert_vectors(self, project: Project, chunks: List[DataChunk], vectors: List[list]):
+        return self.run_on_live_collection(project, lambda collection_name: self.vectordb_client.insert_many(
+            collection_name=collection_name,
+            texts=[ c.chunk_text for c in chunks ],
+            metadata=[ c.chunk_metadata for c in chunks ],
+            vectors=self.reduce_vectors(collection_name, vectors),
+            record_ids=[ self.get_chunk_vector_id(c.id) for c in chunks ],
+        ))
+
+    def delete_from_vector_db(self, project: Project, chunks_ids: List[str]):
         collection_name = self.create_collection_name(project_id=project.project_id)
 
-        # step2: get text embedding vector
-        vector = self.embedding_client.embed_text(text=text, 
-                                                 document_type=DocumentTypeEnum.QUERY.value)
+        return self.vectordb_client.delete_many(
+            collection_name=collection_name,
+            record_ids=[ self.get_chunk_vector_id(chunk_id) for chunk_id in chunks_ids ],
+        )
+
+    def search_vector_db_collection(self, project: Project, text: str, limit: int = 10):
+
+        # step1: get text embedding vector
+        with observe_stage("query_embed"):
+            vector = self.embedding_client.embed_text(text=text, 
+                                                     document_type=DocumentTypeEnum.QUERY.value)
 
         if not vector or len(vector) == 0:
             return False
 
-        # step3: do semantic search
-        results = self.vectordb_client.search_by_vector(
-            collection_name=collection_name,
-            vector=vector,
-            limit=limit
-        )
+        # step2: do semantic search in the live collection, with its projection
+        def search(collection_name: str):
+            with observe_stage("vector_search"):
+                return self.vectordb_client.search_by_vector(
+                    collection_name=collection_name,
+                    vector=self.reduce_vectors(collection_name, [vector])[0],
+                    limit=limit
+                )
+
+        results = self.run_on_live_collection(project, search)
 
         if not results:
             return False
 
         return results
     
+    def search_vector_db_collection_batch(self, project: Project, texts: List[str], limit: int = 10):
+        """Search for every text with one embedding call and one vector db request.
+
+        Returns one list of documents per text, in the order of ``texts``, or
+        False when embedding or searching failed.
+        """
+        # repeated queries are embedded once
+        unique_texts = list(dict.fromkeys(texts))
+
+        with observe_stage("query_embed"):
+            vectors = self.embedding_client.embed_texts(texts=unique_texts,
+                                                        document_type=DocumentTypeEnum.QUERY.value)
+
+        if not vectors or len(vectors) != len(unique_texts):
+            return False
+
+        def search(collection_name: str):
+            with observe_stage("vector_search"):
+                return self.vectordb_client.search_many_by_vectors(
+                    collection_name=collection_name,
+                    vectors=self.reduce_vectors(collection_name, vectors),
+                    limit=limit
+                )
+
+        results = self.run_on_live_collection(project, search)
+        if results is None or results is False:
+            return False
+
+        results_by_text = dict(zip(unique_texts, results))
+        return [ results_by_text[text] for text in texts ]
+
+    def build_rag_prompt(self, query: str, retrieved_documents: List[RetrievedDocument]):
+        """Render the RAG prompt of a question, returns ``(full_prompt, chat_history)``."""
+        with observe_stage("rag_prompt"):
+            system_prompt = self.template_parser.get("rag", "system_prompt")
+
+            documents_prompts = self.template_parser.render_many("rag", "document_prompt", [
+                { "doc_num": idx + 1, "chunk_text": doc.text }
+                for idx, doc in enumerate(retrieved_documents)
+            ])
+
+            footer_prompt = self.template_parser.get("rag", "footer_prompt", {
+                "query": query
+            })
+
+            # Construct Generation Client Prompts
+            chat_history = [
+                self.generation_client.construct_prompt(
+                    prompt=system_prompt,
+                    role=self.generation_client.enums.SYSTEM.value,
+                )
+            ]
+
+            # documents one per line, then a blank line before the footer
+            full_prompt = "\n".join([ *documents_prompts, "", footer_prompt ])
+
+        return full_prompt, chat_history
+
     def answer_rag_question(self, project: Project, query: str, limit: int = 10):
         
         answer, full_prompt, chat_history = None, None, None
@@ -103,37 +392,58 @@ class NLPController(BaseController):
             return answer, full_prompt, chat_history
         
         # step2: Construct LLM prompt
-        system_prompt = self.template_parser.get("rag", "system_prompt")
+        full_prompt, chat_history = self.build_rag_prompt(query=query, retrieved_documents=retrieved_documents)
 
-        documents_prompts = "\n".join([
-            self.template_parser.get("rag", "document_prompt", {
-                    "doc_num": idx + 1,
-                    "chunk_text": doc.text,
-            })
-            for idx, doc in enumerate(retrieved_documents)
-        ])
-
-        footer_prompt = self.template_parser.get("rag", "footer_prompt", {
-            "query": query
-        })
-
-        # step3: Construct Generation Client Prompts
-        chat_history = [
-            self.generation_client.construct_prompt(
-                prompt=system_prompt,
-                role=self.generation_client.enums.SYSTEM.value,
+        # step3: Retrieve the Answer
+        with observe_stage("rag_generate"):
+            answer = self.generation_client.generate_text(
+                prompt=full_prompt,
+                chat_history=chat_history
             )
-        ]
 
-        full_prompt = "\n\n".join([ documents_prompts,  footer_prompt])
+        return answer, full_prompt, chat_history
 
-        # step4: Retrieve the Answer
-        answer = self.generation_client.generate_text(
-            prompt=full_prompt,
-            chat_history=chat_history
-        )
+    async def answer_rag_questions(self, queries: List[str], retrieved_documents: List[List[RetrievedDocument]],
+                                   concurrency: int = 4) -> AsyncIterator[dict]:
+        """Generate the answers of already retrieved questions concurrently, yielding each one as it completes.
 
-        return answer, full_prompt, chat_history
+        ``retrieved_documents`` holds the documents of every query, as returned by
+        ``search_vector_db_collection_batch``. Every result carries the ``index``
+        of its query; questions without documents or whose generation failed come
+        with a None answer.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def answer(index: int, query: str, documents: List[RetrievedDocument]):
+            result = {"index": index, "question": query, "answer": None, "full_prompt": None, "chat_history": None}
+            if not documents:
+                return result
+
+            full_prompt, chat_history = self.build_rag_prompt(query=query, retrieved_documents=documents)
+            async with semaphore:
+                try:
+                    with observe_stage("rag_generate"):
+                        result["answer"] = await asyncio.to_thread(
+                            self.generation_client.generate_text, prompt=full_prompt, chat_history=chat_history
+                        )
+                except Exception as e:
+                    # one failed generation must not end the whole batch
+                    logger.error(f"Error while answering question {index}: {e}")
+
+            result["full_prompt"], result["chat_history"] = full_prompt, chat_history
+            return result
+
+        tasks = [
+            asyncio.ensure_future(answer(index, query, documents))
+            for index, (query, documents) in enumerate(zip(queries, retrieved_documents))
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # the client went away, stop the remaining generations
+            for task in tasks:
+                task.cancel()
 
     def summarize_text(self, retrieved_documents: List[DataChunk], group_size: int = 5, target_word_count: int = 50):
         # Step 1: Retrieve relevant chunks
@@ -1,10 +1,12 @@
 from .BaseController import BaseController
 from .ProjectController import ProjectController
+import asyncio
 import os
-from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from models import ProcessingEnum
+import hashlib
+from bson.objectid import ObjectId
+from models import ProcessingEnum, TextSplitterEnum, LengthUnitEnum
+from helpers.text_splitter import SentenceTextSplitter
+from helpers.near_duplicates import NearDuplicateDetector
 
 class ProcessController(BaseController):
 
@@ -28,10 +30,13 @@ class ProcessController(BaseController):
         if not os.path.exists(file_path):
             return None
 
+        # loaders import langchain and PyMuPDF, keep them off the startup path
         if file_ext == ProcessingEnum.TXT.value:
+            from langchain_community.document_loaders import TextLoader
             return TextLoader(file_path, encoding="utf-8")
 
         if file_ext == ProcessingEnum.PDF.value:
+            from langchain_community.document_loaders import PyMuPDFLoader
             return PyMuPDFLoader(file_path)
         
         return None
@@ -44,15 +49,44 @@ class ProcessController(BaseController):
 
         return None
 
-    def process_file_content(self, file_content: list, file_id: str,
-                            chunk_size: int=100, overlap_size: int=20):
+    def get_file_pages(self, file_id: str):
+        """Lazily iterate over the documents (pages) of a file, or None if it can not be loaded."""
 
-        text_splitter = RecursiveCharacterTextSplitter(
+        loader = self.get_file_loader(file_id=file_id)
+        if loader:
+            return loader.lazy_load()
+
+        return None
+
+    def get_text_splitter(self, splitter: str, chunk_size: int, overlap_size: int,
+                          length_unit: str = LengthUnitEnum.CHAR.value):
+
+        if splitter == TextSplitterEnum.SENTENCE.value:
+            return SentenceTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=overlap_size,
+                length_unit=length_unit,
+            )
+
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        return RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=overlap_size,
             length_function=len,
         )
 
+    def process_file_content(self, file_content: list, file_id: str,
+                            chunk_size: int=100, overlap_size: int=20,
+                            splitter: str=TextSplitterEnum.RECURSIVE.value,
+                            length_unit: str=LengthUnitEnum.CHAR.value):
+
+        text_splitter = self.get_text_splitter(
+            splitter=splitter,
+            chunk_size=chunk_size,
+            overlap_size=overlap_size,
+            length_unit=length_unit,
+        )
+
         file_content_texts = [
             rec.page_content
             for rec in file_content
@@ -69,3 +103,112 @@ class ProcessController(BaseController):
         )
 
         return chunks
+
+    def get_near_duplicate_detector(self, threshold: float = None):
+        return NearDuplicateDetector(
+            threshold=threshold or self.app_settings.NEAR_DUPLICATE_THRESHOLD,
+            num_perm=self.app_settings.NEAR_DUPLICATE_NUM_PERM,
+            shingle_size=self.app_settings.NEAR_DUPLICATE_SHINGLE_SIZE,
+        )
+
+    async def load_near_duplicate_detector(self, chunk_model, project_id: ObjectId, threshold: float = None,
+                                           batch_size: int = 1000):
+        """Detector already holding the stored chunks of the project, so new chunks are compared to them too.
+
+        Only the signatures stored with the chunks are read. Chunks without a
+        usable one (stored with dedup off, imported, or hashed with other
+        parameters) are hashed once here and their signature saved.
+        """
+        detector = self.get_near_duplicate_detector(threshold=threshold)
+
+        async for records in chunk_model.iter_project_chunk_minhashes(project_id=project_id, params=detector.params,
+                                                                      batch_size=batch_size):
+            await asyncio.to_thread(self.index_stored_signatures, detector, records)
+
+        async for chunks in chunk_model.iter_project_chunks_without_minhash(project_id=project_id,
+                                                                            params=detector.params,
+                                                                            batch_size=batch_size):
+            minhashes = await asyncio.to_thread(self.index_near_duplicates, detector, chunks)
+            await chunk_model.update_chunks_minhash(minhashes=minhashes)
+
+        return detector
+
+    def index_stored_signatures(self, detector: NearDuplicateDetector, records: list):
+        for record in records:
+            detector.add(record["_id"], None, signature=detector.load_signature(record["chunk_minhash"]))
+
+    def index_near_duplicates(self, detector: NearDuplicateDetector, chunks: list):
+        """Hash and index ``chunks``, returns their signatures to store by chunk id."""
+        minhashes = {}
+        for chunk in chunks:
+            detector.add(chunk.id, chunk.chunk_text)
+            minhashes[chunk.id] = detector.dump_signature(chunk.id)
+
+        return minhashes
+
+    def drop_near_duplicates(self, detector: NearDuplicateDetector, chunks: list):
+        """Keep the first of every group of near duplicate chunks, compared with each other and the detector.
+
+        Chunks are keyed by their id, or by asset and order when they have none yet.
+        Kept chunks carry their signature, so later runs do not hash them again.
+        """
+        kept = []
+        for chunk in chunks:
+            key = chunk.id if chunk.id is not None else (chunk.chunk_asset_id, chunk.chunk_order)
+            if detector.add_if_unique(key, chunk.chunk_text) is None:
+                chunk.chunk_minhash = detector.dump_signature(key)
+                kept.append(chunk)
+
+        return kept
+
+    def get_chunk_hash(self, chunk_text: str):
+        return hashlib.blake2b(chunk_text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def diff_chunks(self, existing_chunks: list, new_chunks: list):
+        """Match the new chunks of an asset against its stored chunks by text hash.
+
+        Args:
+            existing_chunks (list): Stored ``DataChunk`` records of the asset.
+            new_chunks (list): Freshly split ``DataChunk`` records of the asset.
+
+        Returns:
+            dict: ``inserted`` new chunks (with pre-assigned ids), ``deleted``
+            ids of stale chunks, ``reordered`` kept chunks whose order changed
+            and the number of ``unchanged`` chunks.
+        """
+        existing_by_hash = {}
+        for chunk in existing_chunks:
+            chunk_hash = chunk.chunk_hash or self.get_chunk_hash(chunk.chunk_text)
+            existing_by_hash.setdefault(chunk_hash, []).append(chunk)
+
+        inserted, reordered = [], []
+        unchanged = 0
+
+        for chunk in new_chunks:
+            matches = existing_by_hash.get(chunk.chunk_hash)
+            if not matches:
+                chunk.id = ObjectId()
+                inserted.append(chunk)
+                continue
+
+            existing = matches.pop(0)
+            if existing.chunk_order != chunk.chunk_order:
+                existing.chunk_order = chunk.chunk_order
+                existing.chunk_metadata = chunk.chunk_metadata
+                existing.chunk_hash = chunk.chunk_hash
+                reordered.append(existing)
+            else:
+                unchanged += 1
+
+        deleted = [
+            chunk.id
+            for matches in existing_by_hash.values()
+            for chunk in matches
+        ]
+
+        return {
+            "inserted": inserted,
+            "deleted": deleted,
+            "reordered": reordered,
+            "unchanged": unchanged,
+        }
@@ -0,0 +1,369 @@
+from .BaseController import BaseController
+from .NLPController import NLPController
+from models.ChunkModel import ChunkModel
+from models.AssetModel import AssetModel
+from models.db_schemes import Project, DataChunk, Asset
+from helpers.embedding_reduction import REDUCTION_PCA
+from bson.objectid import ObjectId
+from datetime import datetime, timezone
+from typing import List, Optional
+import asyncio
+import gzip
+import io
+import logging
+import os
+import tarfile
+import time
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "specky-snapshot"
+SNAPSHOT_VERSION = 1
+
+MANIFEST_NAME = "manifest.json"
+ASSETS_NAME = "assets.jsonl.gz"
+PROJECTION_NAME = "projection.npz"
+
+
+class SnapshotError(ValueError):
+    """The archive is not a snapshot or can not be imported into this deployment."""
+
+
+class SnapshotController(BaseController):
+    """
+    Exports a project (assets metadata, chunks and vectors) to one archive and imports it back.
+
+    The archive is an uncompressed tar holding:
+
+    - ``manifest.json``: format version, source project, embedding model, vector size and shards.
+    - ``assets.jsonl.gz``: the asset records (the uploaded files themselves are not included).
+    - ``chunks/<n>.jsonl.gz``: gzip compressed JSON lines of up to ``shard_size`` chunks.
+    - ``vectors/<n>.npy``: float32 matrix with one row per chunk of the shard, in the
+      same order; rows of chunks that were never pushed are zero and flagged ``indexed: false``.
+    - ``projection.npz``: the PCA projection of the collection, when it has one.
+
+    Vectors are stored as indexed, after any dimensionality reduction, so an
+    import writes them straight to the vector db without embedding calls.
+    Shards keep the memory of both directions bounded whatever the project size.
+    """
+
+    def __init__(self, nlp_controller: NLPController, chunk_model: ChunkModel, asset_model: AssetModel,
+                 shard_size: int = 10000, vector_batch_size: int = 1000):
+        super().__init__()
+
+        self.nlp_controller = nlp_controller
+        self.chunk_model = chunk_model
+        self.asset_model = asset_model
+        self.shard_size = shard_size
+        self.vector_batch_size = vector_batch_size
+
+        self.snapshots_dir = os.path.join(self.base_dir, "assets/snapshots")
+
+    def get_snapshot_path(self, project_id: str) -> str:
+        """Unique path for a temporary archive of a project, under ``assets/snapshots``."""
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        return os.path.join(self.snapshots_dir, f"{project_id}_{self.generate_random_string()}.tar")
+
+    def get_embedding_model_id(self) -> Optional[str]:
+        return getattr(self.nlp_controller.embedding_client, "embedding_model_id", None)
+
+    def add_member(self, archive: tarfile.TarFile, name: str, content: bytes):
+        info = tarfile.TarInfo(name=name)
+        info.size = len(content)
+        info.mtime = int(time.time())
+        archive.addfile(info, io.BytesIO(content))
+
+    def encode_jsonl(self, records: List[dict]) -> bytes:
+        return gzip.compress(b"".join(orjson.dumps(record) + b"\n" for record in records), compresslevel=6)
+
+    def decode_jsonl(self, content: bytes) -> List[dict]:
+        return [ orjson.loads(line) for line in gzip.decompress(content).splitlines() if line ]
+
+    def get_shard_vectors(self, collection_name: str, chunks: List[DataChunk], vector_size: int):
+        """float32 matrix of the stored vectors of ``chunks`` and whether each chunk had one."""
+        vectors = np.zeros((len(chunks), vector_size), dtype=np.float32)
+        indexed = np.zeros(len(chunks), dtype=bool)
+
+        if not self.nlp_controller.vectordb_client.is_collection_existed(collection_name):
+            return vectors, indexed
+
+        record_ids = [ self.nlp_controller.get_chunk_vector_id(chunk.id) for chunk in chunks ]
+        for i in range(0, len(record_ids), self.vector_batch_size):
+            batch_ids = record_ids[i:i + self.vector_batch_size]
+            stored = self.nlp_controller.vectordb_client.get_vectors(collection_name=collection_name,
+                                                                     record_ids=batch_ids)
+            if stored is None:
+                raise RuntimeError(f"Reading the vectors of {collection_name} failed")
+
+            for j, record_id in enumerate(batch_ids):
+                vector = stored.get(record_id)
+                if vector is not None:
+                    vectors[i + j] = vector
+                    indexed[i + j] = True
+
+        return vectors, indexed
+
+    def write_shard(self, archive: tarfile.TarFile, shard_no: int, chunks: List[DataChunk],
+                    vectors: np.ndarray, indexed: np.ndarray) -> dict:
+        records = [
+            {
+                "id": str(chunk.id),
+                "text": chunk.chunk_text,
+                "metadata": chunk.chunk_metadata,
+                "order": chunk.chunk_order,
+                "asset_id": str(chunk.chunk_asset_id),
+                "hash": chunk.chunk_hash,
+                "indexed": bool(is_indexed),
+            }
+            for chunk, is_indexed in zip(chunks, indexed)
+        ]
+
+        vectors_buffer = io.BytesIO()
+        np.save(vectors_buffer, vectors, allow_pickle=False)
+
+        shard = {
+            "chunks": f"chunks/{shard_no:05d}.jsonl.gz",
+            "vectors": f"vectors/{shard_no:05d}.npy",
+            "count": len(chunks),
+            "indexed": int(indexed.sum()),
+        }
+        self.add_member(archive, shard["chunks"], self.encode_jsonl(records))
+        self.add_member(archive, shard["vectors"], vectors_buffer.getvalue())
+        return shard
+
+    async def export_project(self, project: Project, archive_path: str) -> dict:
+        """Write the snapshot of ``project`` to ``archive_path``, returns its manifest."""
+        started = time.perf_counter()
+        collection_name = self.nlp_controller.create_collection_name(project_id=project.project_id)
+        vector_size = self.nlp_controller.get_vector_size()
+
+        archive = await asyncio.to_thread(tarfile.open, archive_path, "w")
+        try:
+            assets = await self.asset_model.get_project_assets(asset_project_id=project.id)
+            await asyncio.to_thread(self.add_member, archive, ASSETS_NAME, self.encode_jsonl([
+                {
+                    "id": str(asset.id),
+                    "asset_type": asset.asset_type,
+                    "asset_name": asset.asset_name,
+                    "asset_size": asset.asset_size,
+                    "asset_config": asset.asset_config,
+                    # records inserted without it hold the default factory itself
+                    "asset_pushed_at": asset.asset_pushed_at if isinstance(asset.asset_pushed_at, datetime) else None,
+                }
+                for asset in assets
+            ]))
+
+            shards = []
+            async for chunks in self.chunk_model.iter_project_chunks(project_id=project.id,
+                                                                     batch_size=self.shard_size):
+                vectors, indexed = await asyncio.to_thread(self.get_shard_vectors,
+                                                           collection_name, chunks, vector_size)
+                shards.append(await asyncio.to_thread(self.write_shard, archive, len(shards),
+                                                      chunks, vectors, indexed))
+
+            projection = None
+            reducer = self.nlp_controller.embedding_reducer
+            if reducer is not None:
+                projection_name = await asyncio.to_thread(self.nlp_controller.get_projection_collection_name, project)
+                projection = reducer.get_info(projection_name)
+                content = reducer.export_projection(projection_name)
+                if content is not None:
+                    await asyncio.to_thread(self.add_member, archive, PROJECTION_NAME, content)
+
+            manifest = {
+                "format": SNAPSHOT_FORMAT,
+                "version": SNAPSHOT_VERSION,
+                "project_id": project.project_id,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "embedding_model_id": self.get_embedding_model_id(),
+                "vector_size": vector_size,
+                "vector_dtype": "float32",
+                "embedding_projection": projection,
+                "assets": len(assets),
+                "chunks": sum(shard["count"] for shard in shards),
+                "indexed_chunks": sum(shard["indexed"] for shard in shards),
+                "shards": shards,
+            }
+            # the manifest goes last, once the counts are known; readers look it up by name
+            await asyncio.to_thread(self.add_member, archive, MANIFEST_NAME, orjson.dumps(manifest))
+        finally:
+            await asyncio.to_thread(archive.close)
+
+        logger.info(f"Exported {manifest['chunks']} chunks of {project.project_id} "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return manifest
+
+    def read_member(self, archive: tarfile.TarFile, name: str) -> bytes:
+        try:
+            member = archive.extractfile(name)
+        except KeyError:
+            raise SnapshotError(f"The archive has no {name}")
+        return member.read()
+
+    def read_manifest(self, archive: tarfile.TarFile) -> dict:
+        manifest = orjson.loads(self.read_member(archive, MANIFEST_NAME))
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError("The archive is not a project snapshot")
+        if manifest.get("version", 0) > SNAPSHOT_VERSION:
+            raise SnapshotError(f"Snapshot version {manifest['version']} is newer than this server")
+        return manifest
+
+    def check_compatibility(self, manifest: dict):
+        """Stored vectors are only usable with the same embedding model, size and projection kind."""
+        vector_size = self.nlp_controller.get_vector_size()
+        if manifest["vector_size"] != vector_size:
+            raise SnapshotError(f"The snapshot vectors have {manifest['vector_size']} dimensions, "
+                                f"this deployment indexes {vector_size}")
+
+        embedding_model_id = self.get_embedding_model_id()
+        if manifest["embedding_model_id"] != embedding_model_id:
+            raise SnapshotError(f"The snapshot was embedded with {manifest['embedding_model_id']}, "
+                                f"this deployment uses {embedding_model_id}")
+
+        projection = manifest.get("embedding_projection") or {}
+        reducer = self.nlp_controller.embedding_reducer
+        if projection.get("method") == REDUCTION_PCA and (reducer is None or reducer.method != REDUCTION_PCA):
+            raise SnapshotError("The snapshot vectors use a PCA projection, set EMBEDDING_REDUCTION=pca to import it")
+
+    def read_shard(self, archive: tarfile.TarFile, shard: dict):
+        records = self.decode_jsonl(self.read_member(archive, shard["chunks"]))
+        vectors = np.load(io.BytesIO(self.read_member(archive, shard["vectors"])), allow_pickle=False)
+        if len(records) != len(vectors):
+            raise SnapshotError(f"{shard['chunks']} and {shard['vectors']} have different lengths")
+        return records, vectors
+
+    async def import_assets(self, project: Project, records: List[dict]) -> dict:
+        """Create the asset records missing from the project, returns the new id of every snapshot asset id."""
+        existing = {
+            asset.asset_name: asset.id
+            for asset in await self.asset_model.get_project_assets(asset_project_id=project.id)
+        }
+
+        asset_ids = {}
+        for record in records:
+            snapshot_id = record.pop("id")
+            if record["asset_name"] in existing:
+                asset_ids[snapshot_id] = existing[record["asset_name"]]
+                continue
+
+            # unset fields keep their defaults, as in the source record
+            fields = { key: value for key, value in record.items() if value is not None }
+            asset = await self.asset_model.create_asset(asset=Asset(asset_project_id=project.id, **fields))
+            asset_ids[snapshot_id] = asset.id
+
+        return asset_ids
+
+    def upsert_vectors(self, collection_name: str, chunks: List[DataChunk], vectors: np.ndarray,
+                       indexed: List[bool]) -> bool:
+        rows = [ i for i, is_indexed in enumerate(indexed) if is_indexed ]
+        if not rows:
+            return True
+
+        # stored vectors were already reduced, they go to the vector db as they are
+        return self.nlp_controller.vectordb_client.insert_many(
+            collection_name=collection_name,
+            texts=[ chunks[i].chunk_text for i in rows ],
+            metadata=[ chunks[i].chunk_metadata for i in rows ],
+            vectors=vectors[rows].tolist(),
+            record_ids=[ self.nlp_controller.get_chunk_vector_id(chunks[i].id) for i in rows ],
+            batch_size=self.vector_batch_size,
+        )
+
+    async def import_project(self, project: Project, archive_path: str, do_reset: bool = False) -> dict:
+        """Load a snapshot into ``project``; chunks get new ids so a project can be imported next to its source.
+
+        Raises:
+            SnapshotError: the archive is invalid or its vectors do not fit this deployment.
+        """
+        started = time.perf_counter()
+        collection_name = self.nlp_controller.create_collection_name(project_id=project.project_id)
+
+        try:
+            archive = await asyncio.to_thread(tarfile.open, archive_path, "r")
+        except tarfile.TarError as e:
+            raise SnapshotError(f"The archive is not a readable tar file ({type(e).__name__})")
+
+        try:
+            manifest = await asyncio.to_thread(self.read_manifest, archive)
+            self.check_compatibility(manifest)
+
+            reducer = self.nlp_controller.embedding_reducer
+            projection_content = None
+            if reducer is not None and PROJECTION_NAME in archive.getnames():
+                projection_content = await asyncio.to_thread(self.read_member, archive, PROJECTION_NAME)
+
+            # vectors reduced with another projection can not share a collection,
+            # a reset collection is recreated without one
+            adopt_projection = reducer is not None and bool(do_reset)
+            if reducer is not None and not do_reset:
+                projection_name = await asyncio.to_thread(self.nlp_controller.get_projection_collection_name, project)
+                current_content = await asyncio.to_thread(reducer.export_projection, projection_name)
+                if current_content != projection_content:
+                    has_vectors = await asyncio.to_thread(self.nlp_controller.vectordb_client.sample_record_ids,
+                                                          collection_name=collection_name, limit=1)
+                    if has_vectors:
+                        raise SnapshotError("The snapshot vectors were reduced with another projection than "
+                                            "the vectors of this project, import it with do_reset")
+                    adopt_projection = True
+
+            if do_reset:
+                await self.chunk_model.delete_chunks_by_project_id(project_id=project.id)
+                await asyncio.to_thread(self.nlp_controller.reset_vector_db_collection, project)
+
+            await asyncio.to_thread(self.nlp_controller.ensure_vector_db_collection, project)
+
+            if adopt_projection:
+                # the projection belongs to the collection the alias points to
+                projection_name = await asyncio.to_thread(self.nlp_controller.get_projection_collection_name, project)
+                if projection_content is None:
+                    reducer.forget(projection_name)
+                else:
+                    reducer.import_projection(projection_name, projection_content)
+
+            assets = await asyncio.to_thread(self.decode_jsonl, self.read_member(archive, ASSETS_NAME))
+            asset_ids = await self.import_assets(project, assets)
+
+            inserted_chunks, indexed_vectors = 0, 0
+            pending_upsert = None
+
+            for shard in manifest["shards"]:
+                records, vectors = await asyncio.to_thread(self.read_shard, archive, shard)
+
+                chunks = [
+                    DataChunk(
+                        _id=ObjectId(),
+                        chunk_text=record["text"],
+                        chunk_metadata=record["metadata"],
+                        chunk_order=record["order"],
+                        chunk_project_id=project.id,
+                        chunk_asset_id=asset_ids.get(record["asset_id"]) or ObjectId(record["asset_id"]),
+                        chunk_hash=record["hash"],
+                    )
+                    for record in records
+                ]
+                indexed = [ record["indexed"] for record in records ]
+
+                # the vector upsert of a shard overlaps the mongo insert of the next one
+                inserted_chunks += await self.chunk_model.insert_many_chunks(chunks=chunks)
+                if pending_upsert is not None and not await pending_upsert:
+                    raise RuntimeError("Vector db upsert failed")
+
+                pending_upsert = asyncio.ensure_future(asyncio.to_thread(
+                    self.upsert_vectors, collection_name, chunks, vectors, indexed,
+                ))
+                indexed_vectors += sum(indexed)
+
+            if pending_upsert is not None and not await pending_upsert:
+                raise RuntimeError("Vector db upsert failed")
+        finally:
+            await asyncio.to_thread(archive.close)
+
+        return {
+            "source_project_id": manifest["project_id"],
+            "imported_assets": len(asset_ids),
+            "inserted_chunks": inserted_chunks,
+            "indexed_vectors": indexed_vectors,
+            "total_seconds": round(time.perf_counter() - started, 4),
+        }
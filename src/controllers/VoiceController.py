@@ -1,17 +1,26 @@
 from fastapi import UploadFile, HTTPException
-import difflib
+import asyncio
 import io
-import tempfile
 import os
 import logging
 import uuid
-from typing import Dict, Any, Optional, List
+from typing import AsyncIterator, Dict, Any, Optional, List
+from helpers.audio_store import AudioStore
+from helpers.tts_cache import TTSCache, get_tts_key
+from helpers.audio_segments import split_audio, stitch_transcripts
+from helpers.text_alignment import Alignment, align_texts
 
 class VoiceController:
-    def __init__(self, generation_client):
+    def __init__(self, generation_client, tts_cache: Optional[TTSCache] = None, tts_concurrency: int = 4,
+                 transcription_segment_seconds: float = 120, transcription_overlap_seconds: float = 3,
+                 transcription_concurrency: int = 4):
         # self.model = whisper.load_model("base")
         self.generation_client = generation_client
-        self.audio_storage: Dict[str, bytes] = {}
+        self.tts_cache = tts_cache or TTSCache(store=AudioStore(directory="assets/audio_changes"))
+        self.tts_concurrency = tts_concurrency
+        self.transcription_segment_seconds = transcription_segment_seconds
+        self.transcription_overlap_seconds = transcription_overlap_seconds
+        self.transcription_concurrency = transcription_concurrency
         logging.basicConfig(level=logging.ERROR)
 
     def text_to_speech(self, text: str) -> Optional[io.BytesIO]:
@@ -23,25 +32,123 @@ class VoiceController:
             logging.exception(f"Error in TTS: {e}")
             return None
 
+    def get_tts_key(self, text: str) -> str:
+        return get_tts_key(
+            text=text,
+            model=getattr(self.generation_client, "tts_model_id", type(self.generation_client).__name__),
+            voice=getattr(self.generation_client, "tts_voice", ""),
+        )
+
+    async def synthesize_audio(self, text: str) -> Optional[bytes]:
+        """Synthesize ``text`` off the event loop and return the audio bytes."""
+        audio_stream = await asyncio.to_thread(self.text_to_speech, text)
+        if audio_stream is None:
+            return None
+        return await asyncio.to_thread(audio_stream.read)
+
+    async def stream_audio(self, text: str) -> AsyncIterator[bytes]:
+        """Audio chunks of ``text`` as the provider produces them, read off the event loop."""
+        try:
+            chunks = await asyncio.to_thread(self.generation_client.text_to_speech_stream, text)
+        except Exception as e:
+            logging.exception(f"Error in TTS stream: {e}")
+            chunks = None
+
+        if chunks is None:
+            raise RuntimeError("Failed to generate speech")
+
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    yield chunk
+        finally:
+            # closes the provider response when the client goes away mid stream
+            if hasattr(chunks, "close"):
+                await asyncio.to_thread(chunks.close)
+
+    def stream_speech(self, text: str) -> AsyncIterator[bytes]:
+        """Stream the speech of ``text``, from the cache when possible, caching it while it streams."""
+        return self.tts_cache.stream_or_create(self.get_tts_key(text), lambda: self.stream_audio(text))
+
+    async def synthesize_phrases(self, phrases: List[str]) -> Dict[str, Optional[str]]:
+        """Make sure every phrase has cached audio and map each one to its audio id.
+
+        Identical phrases are synthesized once, cached ones are not synthesized at
+        all and the misses run concurrently. Phrases that failed map to None.
+        """
+        keys = { phrase: self.get_tts_key(phrase) for phrase in dict.fromkeys(phrases) }
+        semaphore = asyncio.Semaphore(self.tts_concurrency)
+
+        async def ensure_cached(phrase: str, key: str):
+            async with semaphore:
+                return await self.tts_cache.get_or_create(key, lambda: self.synthesize_audio(phrase))
+
+        results = await asyncio.gather(*[ ensure_cached(phrase, key) for phrase, key in keys.items() ])
+
+        return {
+            phrase: key if is_cached else None
+            for (phrase, key), is_cached in zip(keys.items(), results)
+        }
+
     def compare_texts(self, text1: str, text2: str) -> List[Dict[str, Any]]:
-        """Compares two texts and returns detailed changes."""
-        seqm = difflib.SequenceMatcher(None, text1.split(), text2.split())
+        """Compares a transcription (text1) with the expected text (text2) and returns detailed changes."""
+        return self.get_changes(align_texts(reference=text2, hypothesis=text1))
+
+    def get_changes(self, alignment: Alignment) -> List[Dict[str, Any]]:
+        """Group consecutive word edits into added/removed/replaced changes."""
         changes = []
-        for opcode, a0, a1, b0, b1 in seqm.get_opcodes():
-            if opcode == 'equal':
-                continue
-            elif opcode == 'insert':
-                changes.append({"type": "added", "text": " ".join(text2.split()[b0:b1])})
-            elif opcode == 'delete':
-                changes.append({"type": "removed", "text": " ".join(text1.split()[a0:a1])})
-            elif opcode == 'replace':
-                changes.append({
-                    "type": "replaced",
-                    "original": " ".join(text2.split()[b0:b1]),
-                    "replacement": " ".join(text1.split()[a0:a1])
-                })
+        for run in alignment.error_runs():
+            expected = " ".join(edit.reference.text for edit in run if edit.reference)
+            transcribed = " ".join(edit.hypothesis.text for edit in run if edit.hypothesis)
+            position = next((edit.reference.index for edit in run if edit.reference), None)
+            similarity = round(sum(edit.similarity for edit in run) / len(run), 4)
+
+            if expected and transcribed:
+                change = {"type": "replaced", "original": expected, "replacement": transcribed}
+            elif expected:
+                change = {"type": "added", "text": expected}
+            else:
+                change = {"type": "removed", "text": transcribed}
+
+            changes.append({**change, "position": position, "similarity": similarity})
+
         return changes
 
+    async def transcribe_audio(self, audio_bytes: bytes, filename: str,
+                               prompt: str = "", language: str = "en") -> Optional[str]:
+        """Transcribe an in-memory recording, long ones as overlapping segments in parallel.
+
+        Returns None when any segment could not be transcribed.
+        """
+        file_ext = os.path.splitext(filename or "")[1] or ".mp3"
+        segments = await asyncio.to_thread(
+            split_audio, audio_bytes, file_ext,
+            self.transcription_segment_seconds, self.transcription_overlap_seconds
+        )
+        semaphore = asyncio.Semaphore(self.transcription_concurrency)
+
+        async def transcribe_segment(i: int, segment: bytes):
+            audio_file = io.BytesIO(segment)
+            audio_file.name = f"segment_{i}{file_ext}"
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self.generation_client.transcribe,
+                    audio_file=audio_file, prompt=prompt, language=language
+                )
+
+        texts = await asyncio.gather(*[ transcribe_segment(i, segment) for i, segment in enumerate(segments) ])
+        if any(text is None for text in texts):
+            return None
+
+        # roughly three words per second of overlap, with some slack
+        return stitch_transcripts(
+            [ text.strip() for text in texts ],
+            max_overlap_words=max(10, int(self.transcription_overlap_seconds * 4) + 5),
+        )
+
     async def process_transcription(
         self,
         file: UploadFile,
@@ -49,66 +156,50 @@ class VoiceController:
         language: str = 'en',
         prompt: str = ""
     ) -> Dict[str, Any]:
-        temp_audio_path = None
-        try:
-            if not file.content_type.startswith("audio/"):
-                raise HTTPException(status_code=400, detail="Invalid file type. Only audio files are accepted.")
-
-            # Save uploaded file to a temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_audio_file:
-                file_content = await file.read()
-                temp_audio_file.write(file_content)
-                temp_audio_path = temp_audio_file.name
-
-            # Transcribe audio file
-            transcription_request = {
-                "audio_filepath": temp_audio_path,
-                "prompt": prompt,
-                "language": language
-            }
-            result = self.generation_client.transcribe(**transcription_request)
-
-            transcribed_text = result.strip()
-            differences = self.compare_texts(transcribed_text, expected_text)
-
-            response_data = {
-                "transcribed_text": transcribed_text,
-                "expected_text": expected_text,
-                "changes": [],
-                "confidence_score": None  # Add confidence score if needed
-            }
-
-            # Generate TTS for replacement changes
-            for change in differences:
-                change_data = {"type": change["type"]}
-
-                if change["type"] == "replaced":
-                    change_data["original"] = change["original"]
-                    change_data["replacement"] = change["replacement"]
-
-                    # Generate TTS for replacement text
-                    replacement_audio = self.text_to_speech(change["original"])
-                    if replacement_audio:
-                        unique_id = str(uuid.uuid4())
-                        replacement_audio_path = f"assets/audio_changes/{unique_id}_replacement.mp3"
-                        os.makedirs(os.path.dirname(replacement_audio_path), exist_ok=True)
-                        # with open(replacement_audio_path, "wb") as f:
-                        #     f.write(replacement_audio.read())
-                        replacement_audio.stream_to_file(replacement_audio_path)
-                        change_data["replacement_audio_url"] = f"/audio/{unique_id}_replacement.mp3"
-
-                response_data["changes"].append(change_data)
-
-            return response_data
-        finally:
-            if temp_audio_path:
-                try:
-                    os.remove(temp_audio_path)
-                except (FileNotFoundError, Exception) as e:
-                    logging.error(f"Error removing temporary file: {e}")
-
-
-
-    def clear_storage(self) -> None:
-        """Clear the audio storage."""
-        self.audio_storage.clear()
\ No newline at end of file
+        if not file.content_type.startswith("audio/"):
+            raise HTTPException(status_code=400, detail="Invalid file type. Only audio files are accepted.")
+
+        # the recording stays in memory, providers receive a named buffer instead of a temp file
+        transcribed_text = await self.transcribe_audio(
+            audio_bytes=await file.read(),
+            filename=file.filename,
+            prompt=prompt,
+            language=language,
+        )
+
+        if transcribed_text is None:
+            raise HTTPException(status_code=500, detail="Failed to transcribe the audio")
+
+        # long passages take a while to align, keep the event loop free
+        alignment = await asyncio.to_thread(align_texts, expected_text, transcribed_text)
+        differences = self.get_changes(alignment)
+
+        response_data = {
+            "transcribed_text": transcribed_text,
+            "expected_text": expected_text,
+            "changes": [],
+            "confidence_score": round(alignment.confidence, 4),
+        }
+
+        # Generate TTS for replacement changes, once per distinct phrase
+        replacement_audio_ids = await self.synthesize_phrases([
+            change["original"] for change in differences if change["type"] == "replaced"
+        ])
+
+        for change in differences:
+            change_data = {"type": change["type"], "position": change["position"],
+                           "similarity": change["similarity"]}
+
+            if change["type"] == "replaced":
+                change_data["original"] = change["original"]
+                change_data["replacement"] = change["replacement"]
+
+                audio_id = replacement_audio_ids.get(change["original"])
+                if audio_id:
+                    change_data["replacement_audio_url"] = f"/audio/{audio_id}"
+            else:
+                change_data["text"] = change["text"]
+
+            response_data["changes"].append(change_data)
+
+        return response_data
@@ -2,4 +2,5 @@ from .DataController import DataController
 from .ProjectController import ProjectController
 from .ProcessController import ProcessController
 from .NLPController import NLPController
-
+from .IngestController import IngestController
+from .SnapshotController import SnapshotController
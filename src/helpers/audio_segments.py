@@ -0,0 +1,183 @@
+import io
+import logging
+import re
+import wave
+from difflib import SequenceMatcher
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# kbps per bitrate index, keyed by (mpeg version 1 or 2, layer)
+MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# sample rates per sample rate index, keyed by the version bits (MPEG 2.5, reserved, MPEG 2, MPEG 1)
+MP3_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+WORD_NORMALIZER = re.compile(r"[^\w]+")
+
+
+def parse_mp3_frame_header(header: bytes):
+    """Return ``(frame_length, duration_seconds)`` of the MPEG audio frame starting with ``header``, or None."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (header[1] >> 3) & 0x03
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    version = 1 if version_bits == 3 else 2
+    bitrate = MP3_BITRATES[(version, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384 / sample_rate
+
+    samples = 1152 if layer == 2 or version == 1 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples / sample_rate
+
+
+def get_mp3_frames(data: bytes) -> List[Tuple[int, int, float]]:
+    """List the ``(offset, length, duration)`` of the audio frames of an MP3, skipping tags and garbage."""
+    position = 0
+
+    # ID3v2 tag: 10 byte header with a syncsafe size, plus an optional 10 byte footer
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        position = 10 + size + (10 if data[5] & 0x10 else 0)
+
+    frames = []
+    while position + 4 <= len(data):
+        frame = parse_mp3_frame_header(data[position:position + 4])
+        if frame is None or position + frame[0] > len(data):
+            # resynchronise on the next possible frame header
+            position = data.find(b"\xff", position + 1)
+            if position < 0:
+                break
+            continue
+
+        frames.append((position, frame[0], frame[1]))
+        position += frame[0]
+
+    return frames
+
+
+def get_segment_windows(duration: float, segment_seconds: float, overlap_seconds: float):
+    """Start/end times of segments of ``segment_seconds`` that each extend ``overlap_seconds`` into the next."""
+    windows = []
+    start = 0.0
+    while start < duration:
+        windows.append((start, min(duration, start + segment_seconds + overlap_seconds)))
+        start += segment_seconds
+    return windows
+
+
+def split_mp3(data: bytes, segment_seconds: float, overlap_seconds: float) -> List[bytes]:
+    frames = get_mp3_frames(data)
+    if not frames:
+        return [data]
+
+    starts, elapsed = [], 0.0
+    for _, _, duration in frames:
+        starts.append(elapsed)
+        elapsed += duration
+
+    if elapsed <= segment_seconds + overlap_seconds:
+        return [data]
+
+    segments = []
+    for start, end in get_segment_windows(elapsed, segment_seconds, overlap_seconds):
+        segments.append(b"".join(
+            data[offset:offset + length]
+            for (offset, length, _), frame_start in zip(frames, starts)
+            if start <= frame_start < end
+        ))
+
+    return segments
+
+
+def split_wav(data: bytes, segment_seconds: float, overlap_seconds: float) -> List[bytes]:
+    with wave.open(io.BytesIO(data), "rb") as reader:
+        params = reader.getparams()
+        pcm = reader.readframes(params.nframes)
+
+    frame_size = params.sampwidth * params.nchannels
+    duration = params.nframes / params.framerate
+    if duration <= segment_seconds + overlap_seconds:
+        return [data]
+
+    segments = []
+    for start, end in get_segment_windows(duration, segment_seconds, overlap_seconds):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as writer:
+            writer.setparams(params)
+            writer.writeframes(pcm[int(start * params.framerate) * frame_size:int(end * params.framerate) * frame_size])
+        segments.append(buffer.getvalue())
+
+    return segments
+
+
+def split_audio(data: bytes, file_ext: str, segment_seconds: float, overlap_seconds: float) -> List[bytes]:
+    """Split an MP3 or PCM WAV recording into overlapping segments without decoding it.
+
+    MP3s are cut on frame boundaries and WAVs on sample boundaries; any other
+    container, or a recording shorter than one segment, is returned whole.
+    """
+    file_ext = file_ext.lower()
+    try:
+        if file_ext in (".mp3", ".mpga", ".mpeg"):
+            return split_mp3(data, segment_seconds, overlap_seconds)
+        if file_ext == ".wav":
+            return split_wav(data, segment_seconds, overlap_seconds)
+    except (wave.Error, EOFError, ValueError) as e:
+        logger.warning(f"Could not split {file_ext} audio, transcribing it whole: {e}")
+
+    return [data]
+
+
+def normalize_word(word: str) -> str:
+    return WORD_NORMALIZER.sub("", word.lower())
+
+
+def stitch_transcripts(texts: List[str], max_overlap_words: int = 30, min_match_words: int = 2) -> str:
+    """Join the transcripts of overlapping segments, dropping the words heard twice.
+
+    The tail of the text so far and the head of the next segment are aligned on
+    their longest common run of (case and punctuation insensitive) words and
+    joined there; without such a run the segments are simply concatenated.
+    """
+    words = []
+    for text in texts:
+        next_words = text.split()
+        if not next_words:
+            continue
+        if not words:
+            words = next_words
+            continue
+
+        tail = words[-max_overlap_words:]
+        head = next_words[:max_overlap_words]
+        match = SequenceMatcher(
+            None, [ normalize_word(w) for w in tail ], [ normalize_word(w) for w in head ], autojunk=False
+        ).find_longest_match(0, len(tail), 0, len(head))
+
+        if match.size >= min(min_match_words, len(head)):
+            words = words[:len(words) - len(tail) + match.a] + next_words[match.b:]
+        else:
+            words = words + next_words
+
+    return " ".join(words)
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+import aiofiles
+from helpers.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+AUDIO_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+BYTES_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Resolve a single ``bytes=`` range against a body of ``size`` bytes.
+
+    Returns the inclusive ``(start, end)`` offsets, or None when the header should
+    be ignored (malformed or multiple ranges, which are answered with the full body).
+
+    Raises:
+        RangeNotSatisfiable: the range starts past the end of the body.
+    """
+    match = BYTES_RANGE.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, end
+
+
+class AudioStore:
+    """
+    Bounded directory of generated audio clips.
+
+    Clips are addressed by id (``<id>.mp3``) and indexed in memory by last access
+    time. ``sweep`` deletes clips not read for ``ttl_seconds`` and then the least
+    recently used ones until the directory fits in ``max_bytes``; it runs
+    periodically from ``run_sweeper`` and after writes that overflow the cap.
+    The index is rebuilt from the directory on startup, using file access times.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 7 * 24 * 3600,
+                 sweep_interval_seconds: float = 300):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        # id -> (size, last access), least recently used first
+        self.index = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".part"):
+                # left over by an interrupted write
+                os.remove(entry.path)
+                continue
+            audio_id, ext = os.path.splitext(entry.name)
+            if ext != ".mp3":
+                continue
+            stat = entry.stat()
+            entries.append((max(stat.st_atime, stat.st_mtime), audio_id, stat.st_size))
+
+        with self.lock:
+            self.index.clear()
+            self.total_bytes = 0
+            for last_access, audio_id, size in sorted(entries):
+                self.index[audio_id] = (size, last_access)
+                self.total_bytes += size
+
+    @staticmethod
+    def is_valid_id(audio_id: str) -> bool:
+        return bool(AUDIO_ID.match(audio_id))
+
+    def get_path(self, audio_id: str) -> str:
+        return os.path.join(self.directory, f"{audio_id}.mp3")
+
+    def touch(self, audio_id: str) -> Optional[int]:
+        """Mark a clip as used and return its size, None when it is not stored."""
+        with self.lock:
+            entry = self.index.get(audio_id)
+            if entry is None:
+                return None
+            self.index[audio_id] = (entry[0], time.time())
+            self.index.move_to_end(audio_id)
+            return entry[0]
+
+    def contains(self, audio_id: str) -> bool:
+        return self.touch(audio_id) is not None
+
+    def get_etag(self, audio_id: str) -> Optional[str]:
+        """Validator of a stored clip; ids are content addresses, the size guards against rewrites."""
+        with self.lock:
+            entry = self.index.get(audio_id)
+        if entry is None:
+            return None
+        return f'"{audio_id}-{entry[0]:x}"'
+
+    def read(self, audio_id: str) -> Optional[bytes]:
+        if self.touch(audio_id) is None:
+            return None
+        try:
+            with open(self.get_path(audio_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            self.forget(audio_id)
+            return None
+
+    def put(self, audio_id: str, content: bytes):
+        # write to a temporary name first so readers never see a partial clip
+        path = self.get_path(audio_id)
+        temp_path = f"{path}.{uuid.uuid4().hex}.part"
+        with open(temp_path, "wb") as f:
+            f.write(content)
+
+        # the rename and the index update are one step for sweep
+        with self.lock:
+            os.replace(temp_path, path)
+            previous = self.index.pop(audio_id, None)
+            if previous is not None:
+                self.total_bytes -= previous[0]
+            self.index[audio_id] = (len(content), time.time())
+            self.total_bytes += len(content)
+            overflow = self.total_bytes > self.max_bytes
+
+        if overflow:
+            self.sweep()
+
+    def forget(self, audio_id: str):
+        with self.lock:
+            entry = self.index.pop(audio_id, None)
+            if entry is not None:
+                self.total_bytes -= entry[0]
+
+    def remove(self, audio_id: str):
+        with self.lock:
+            self.remove_locked(audio_id)
+
+    def remove_locked(self, audio_id: str):
+        entry = self.index.pop(audio_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[0]
+        try:
+            os.remove(self.get_path(audio_id))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self) -> int:
+        """Delete expired clips, then the least recently used ones above the size cap. Returns the count."""
+        expired_before = time.time() - self.ttl_seconds
+        victims = []
+
+        # victims are deleted without releasing the lock, a clip touched or put between
+        # the pick and the delete would be handed out and then 404
+        with self.lock:
+            # the index is ordered by last access, so expired clips come first
+            remaining = self.total_bytes
+            for audio_id, (size, last_access) in self.index.items():
+                if last_access >= expired_before and remaining <= self.max_bytes:
+                    break
+                victims.append(audio_id)
+                remaining -= size
+
+            for audio_id in victims:
+                self.remove_locked(audio_id)
+
+        if victims:
+            CACHE_REQUESTS.labels(cache="audio_store", result="evicted").inc(len(victims))
+            logger.info(f"Audio store evicted {len(victims)} clips, {self.total_bytes} bytes stored")
+
+        return len(victims)
+
+    async def run_sweeper(self):
+        """Sweep every ``sweep_interval_seconds`` until cancelled."""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Audio store sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval_seconds)
+
+
+async def iter_file_range(path: str, start: int, end: int, chunk_size: int = 64 * 1024):
+    """Stream the inclusive byte range ``start``-``end`` of a file."""
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -1,3 +1,5 @@
+from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -12,6 +14,14 @@ class Settings(BaseSettings):
 
     MONGODB_URL: str
     MONGODB_DATABASE: str
+    MONGODB_MIN_POOL_SIZE: int = 4
+    MONGODB_MAX_POOL_SIZE: int = 100
+
+    STARTUP_WARMUP: bool = True
+
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_BROTLI_QUALITY: int = 4
 
     GENERATION_BACKEND: str
     EMBEDDING_BACKEND: str
@@ -27,15 +37,85 @@ class Settings(BaseSettings):
     GENERATION_DAFAULT_MAX_TOKENS: int = None
     GENERATION_DAFAULT_TEMPERATURE: float = None
 
+    FAKE_LLM_LATENCY_DISTRIBUTION: str = "constant"
+    FAKE_LLM_LATENCY_MS: float = 0.0
+    FAKE_LLM_LATENCY_JITTER_MS: float = 0.0
+    FAKE_LLM_ERROR_RATE: float = 0.0
+    FAKE_LLM_RATE_LIMIT_RATE: float = 0.0
+    FAKE_LLM_RETRY_AFTER_SECONDS: float = 1.0
+    FAKE_LLM_SEED: int = 0
+
+    EMBEDDING_REDUCTION: Optional[str] = None
+    EMBEDDING_REDUCED_SIZE: Optional[int] = None
+
+    GENERATION_ROUTER_BACKENDS: list = []
+    GENERATION_ROUTER_MODEL_IDS: dict = {}
+    GENERATION_ROUTER_HEDGE: bool = False
+    GENERATION_ROUTER_HEDGE_PERCENTILE: float = 95
+    GENERATION_ROUTER_HEDGE_MIN_DELAY_SECONDS: float = 0.2
+    GENERATION_ROUTER_LATENCY_WINDOW: int = 100
+    GENERATION_ROUTER_MIN_SAMPLES: int = 10
+    GENERATION_ROUTER_ERROR_THRESHOLD: float = 0.5
+    GENERATION_ROUTER_EJECT_SECONDS: float = 30
+
+    LLM_GATEWAY_INITIAL_CONCURRENCY: int = 8
+    LLM_GATEWAY_MIN_CONCURRENCY: int = 1
+    LLM_GATEWAY_MAX_CONCURRENCY: int = 64
+    LLM_GATEWAY_DECREASE_FACTOR: float = 0.7
+    LLM_GATEWAY_MAX_ATTEMPTS: int = 4
+    LLM_GATEWAY_BASE_DELAY_SECONDS: float = 0.5
+    LLM_GATEWAY_MAX_DELAY_SECONDS: float = 20
+    LLM_GATEWAY_BREAKER_FAILURES: int = 10
+    LLM_GATEWAY_BREAKER_RESET_SECONDS: float = 30
+    LLM_GATEWAY_QUEUE_TIMEOUT_SECONDS: float = 60
+
     VECTOR_DB_BACKEND : str
     VECTOR_DB_PATH : str
     VECTOR_DB_DISTANCE_METHOD: str = None
 
     PRIMARY_LANG: str = "en"
     DEFAULT_LANG: str = "en"
+    TEMPLATES_HOT_RELOAD: bool = False
+
+    RAG_BATCH_CONCURRENCY: int = 4
+
+    TRANSCRIPTION_SEGMENT_SECONDS: float = 120
+    TRANSCRIPTION_OVERLAP_SECONDS: float = 3
+    TRANSCRIPTION_CONCURRENCY: int = 4
+
+    TTS_CONCURRENCY: int = 4
+    TTS_CACHE_MEMORY_ITEMS: int = 512
+    TTS_CACHE_MEMORY_ITEM_MAX_BYTES: int = 262144
+    TTS_PREWARM_WORDS: list = []
+
+    AUDIO_STORE_MAX_BYTES: int = 536870912
+    AUDIO_STORE_TTL_SECONDS: float = 604800
+    AUDIO_STORE_SWEEP_INTERVAL_SECONDS: float = 300
+    AUDIO_CACHE_MAX_AGE_SECONDS: int = 86400
+
+    TRACING_SAMPLE_RATE: float = 0.0
+    TRACING_EXPORTER: str = "file"
+    TRACING_FILE_PATH: str = "assets/traces/spans.jsonl"
+
+    INGEST_QUEUE_SIZE: int = 64
+    NEAR_DUPLICATE_THRESHOLD: float = 0.85
+    NEAR_DUPLICATE_NUM_PERM: int = 128
+    NEAR_DUPLICATE_SHINGLE_SIZE: int = 5
+
+    INGEST_SPLIT_CONCURRENCY: int = 2
+    INGEST_INSERT_CONCURRENCY: int = 2
+    INGEST_INSERT_BATCH_SIZE: int = 100
+    INGEST_EMBED_CONCURRENCY: int = 4
+    INGEST_EMBED_BATCH_SIZE: int = 64
+    INGEST_UPSERT_CONCURRENCY: int = 2
+    INGEST_UPSERT_BATCH_SIZE: int = 128
+
+    SNAPSHOT_SHARD_SIZE: int = 10000
+    SNAPSHOT_VECTOR_BATCH_SIZE: int = 1000
 
     class Config:
         env_file = ".env"
 
+@lru_cache
 def get_settings():
     return Settings()
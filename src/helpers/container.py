@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import os
+from fastapi import Request
+from motor.motor_asyncio import AsyncIOMotorClient
+from helpers.config import Settings
+from stores.llm.LLMProviderFactory import LLMProviderFactory
+from stores.vectordb.VectorDBProviderFactory import VectorDBProviderFactory
+from stores.llm.templates.template_parser import TemplateParser
+from controllers import DataController, ProjectController, NLPController
+from controllers.VoiceController import VoiceController
+from controllers.SnapshotController import SnapshotController
+from models.ProjectModel import ProjectModel
+from models.ChunkModel import ChunkModel
+from models.AssetModel import AssetModel
+from helpers.audio_store import AudioStore
+from helpers.tts_cache import TTSCache
+from helpers.embedding_reduction import EmbeddingReducer
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class ServiceContainer:
+    """
+    Clients, models and stateless controllers shared by every request.
+
+    Built once by the application lifespan and handed to the routes through
+    the ``get_*`` dependencies below, so no request pays for parsing settings,
+    creating provider clients or checking mongo collections again.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+
+        self.mongo_conn = None
+        self.db_client = None
+        self.generation_client = None
+        self.embedding_client = None
+        self.vectordb_client = None
+        self.template_parser = None
+        self.embedding_reducer = None
+
+        self.project_model = None
+        self.chunk_model = None
+        self.asset_model = None
+
+        self.data_controller = None
+        self.project_controller = None
+        self.nlp_controller = None
+        self.voice_controller = None
+        self.snapshot_controller = None
+
+        self.audio_store = None
+        self.tts_cache = None
+        self.background_tasks = set()
+
+    async def startup(self, mongo_conn=None):
+        """Connect the clients, initialise the collections and build the controllers.
+
+        Args:
+            mongo_conn (optional): Already created mongo client, e.g. a mock in benchmarks.
+        """
+        settings = self.settings
+
+        # connect to the database
+        self.mongo_conn = mongo_conn or AsyncIOMotorClient(
+            settings.MONGODB_URL,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        )
+        self.db_client = self.mongo_conn[settings.MONGODB_DATABASE]
+
+        # create the provider factories
+        llm_provider_factory = LLMProviderFactory(settings)
+        vectordb_provider_factory = VectorDBProviderFactory(settings)
+
+        # generation client
+        self.generation_client = llm_provider_factory.create(provider=settings.GENERATION_BACKEND)
+        self.generation_client.set_generation_model(model_id=settings.GENERATION_MODEL_ID)
+
+        # embedding client
+        self.embedding_client = llm_provider_factory.create(provider=settings.EMBEDDING_BACKEND)
+        self.embedding_client.set_embedding_model(model_id=settings.EMBEDDING_MODEL_ID,
+                                                  embedding_size=settings.EMBEDDING_MODEL_SIZE)
+
+        # vector db client
+        self.vectordb_client = vectordb_provider_factory.create(provider=settings.VECTOR_DB_BACKEND)
+        self.vectordb_client.connect()
+
+        self.template_parser = TemplateParser(
+            language=settings.PRIMARY_LANG,
+            default_language=settings.DEFAULT_LANG,
+            hot_reload=settings.TEMPLATES_HOT_RELOAD,
+        )
+
+        if settings.STARTUP_WARMUP:
+            await self.warmup()
+
+        # collections and indexes are checked once here instead of on every request
+        self.project_model = await ProjectModel.create_instance(db_client=self.db_client)
+        self.chunk_model = await ChunkModel.create_instance(db_client=self.db_client)
+        self.asset_model = await AssetModel.create_instance(db_client=self.db_client)
+
+        self.data_controller = DataController()
+        self.project_controller = ProjectController()
+
+        if settings.EMBEDDING_REDUCTION:
+            self.embedding_reducer = EmbeddingReducer(
+                method=settings.EMBEDDING_REDUCTION,
+                dimension=settings.EMBEDDING_REDUCED_SIZE,
+                directory=os.path.join(self.data_controller.database_dir, "projections"),
+            )
+
+        self.nlp_controller = NLPController(
+            vectordb_client=self.vectordb_client,
+            generation_client=self.generation_client,
+            embedding_client=self.embedding_client,
+            template_parser=self.template_parser,
+            embedding_reducer=self.embedding_reducer,
+        )
+        # projections used to be saved under the alias of the project
+        await asyncio.to_thread(self.nlp_controller.migrate_alias_projections)
+
+        self.snapshot_controller = SnapshotController(
+            nlp_controller=self.nlp_controller,
+            chunk_model=self.chunk_model,
+            asset_model=self.asset_model,
+            shard_size=settings.SNAPSHOT_SHARD_SIZE,
+            vector_batch_size=settings.SNAPSHOT_VECTOR_BATCH_SIZE,
+        )
+        self.audio_store = AudioStore(
+            directory="assets/audio_changes",
+            max_bytes=settings.AUDIO_STORE_MAX_BYTES,
+            ttl_seconds=settings.AUDIO_STORE_TTL_SECONDS,
+            sweep_interval_seconds=settings.AUDIO_STORE_SWEEP_INTERVAL_SECONDS,
+        )
+        self.run_in_background(self.audio_store.run_sweeper())
+
+        self.tts_cache = TTSCache(
+            store=self.audio_store,
+            memory_items=settings.TTS_CACHE_MEMORY_ITEMS,
+            memory_item_max_bytes=settings.TTS_CACHE_MEMORY_ITEM_MAX_BYTES,
+        )
+        self.voice_controller = VoiceController(
+            generation_client=self.generation_client,
+            tts_cache=self.tts_cache,
+            tts_concurrency=settings.TTS_CONCURRENCY,
+            transcription_segment_seconds=settings.TRANSCRIPTION_SEGMENT_SECONDS,
+            transcription_overlap_seconds=settings.TRANSCRIPTION_OVERLAP_SECONDS,
+            transcription_concurrency=settings.TRANSCRIPTION_CONCURRENCY,
+        )
+
+        if settings.TTS_PREWARM_WORDS:
+            # only words missing from the cache are synthesized, the startup does not wait for them
+            self.run_in_background(self.voice_controller.synthesize_phrases(settings.TTS_PREWARM_WORDS))
+
+    def run_in_background(self, coroutine):
+        """Keep a reference to a fire and forget task so it is not garbage collected and can be cancelled."""
+        task = asyncio.create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    async def warmup(self):
+        """Send one probe request per backend so the first user request finds open connections.
+
+        Probes run concurrently; a failing probe is logged and never blocks the startup.
+        """
+        probes = {
+            "mongodb": self.db_client.command("ping"),
+            "vectordb": asyncio.to_thread(self.vectordb_client.list_all_collections),
+            "generation": asyncio.to_thread(self.generation_client.warmup),
+        }
+        if self.embedding_client is not self.generation_client:
+            probes["embedding"] = asyncio.to_thread(self.embedding_client.warmup)
+
+        results = await asyncio.gather(*probes.values(), return_exceptions=True)
+
+        for name, result in zip(probes.keys(), results):
+            if isinstance(result, BaseException) or result is False:
+                logger.warning(f"Warmup probe for {name} failed: {result}")
+
+    async def shutdown(self):
+        """Cancel the background tasks and close every client opened by ``startup``."""
+        for task in list(self.background_tasks):
+            task.cancel()
+        if self.background_tasks:
+            await asyncio.gather(*self.background_tasks, return_exceptions=True)
+
+        for client in (self.generation_client, self.embedding_client):
+            if client is not None:
+                client.close()
+
+        if self.vectordb_client is not None:
+            self.vectordb_client.disconnect()
+
+        if self.mongo_conn is not None:
+            self.mongo_conn.close()
+
+
+def get_container(request: Request) -> ServiceContainer:
+    return request.app.state.container
+
+
+def get_project_model(request: Request) -> ProjectModel:
+    return request.app.state.container.project_model
+
+
+def get_chunk_model(request: Request) -> ChunkModel:
+    return request.app.state.container.chunk_model
+
+
+def get_asset_model(request: Request) -> AssetModel:
+    return request.app.state.container.asset_model
+
+
+def get_data_controller(request: Request) -> DataController:
+    return request.app.state.container.data_controller
+
+
+def get_project_controller(request: Request) -> ProjectController:
+    return request.app.state.container.project_controller
+
+
+def get_nlp_controller(request: Request) -> NLPController:
+    return request.app.state.container.nlp_controller
+
+
+def get_voice_controller(request: Request) -> VoiceController:
+    return request.app.state.container.voice_controller
+
+
+def get_audio_store(request: Request) -> AudioStore:
+    return request.app.state.container.audio_store
+
+
+def get_snapshot_controller(request: Request) -> SnapshotController:
+    return request.app.state.container.snapshot_controller
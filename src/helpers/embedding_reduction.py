@@ -0,0 +1,175 @@
+import logging
+import os
+import threading
+from typing import Dict, List
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REDUCTION_TRUNCATE = "truncate"
+REDUCTION_PCA = "pca"
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingProjection:
+    """
+    Linear map from full size embeddings to ``dimension`` components.
+
+    Without ``components`` it is Matryoshka truncation (the first ``dimension``
+    values), otherwise the PCA projection ``(x - mean) @ components.T``. The
+    output is re-normalized so cosine and dot distances keep their meaning.
+    """
+
+    def __init__(self, dimension: int, mean: np.ndarray = None, components: np.ndarray = None):
+        self.dimension = dimension
+        self.mean = mean
+        self.components = components
+
+    @property
+    def method(self) -> str:
+        return REDUCTION_TRUNCATE if self.components is None else REDUCTION_PCA
+
+    @classmethod
+    def fit_pca(cls, vectors: List[list], dimension: int) -> "EmbeddingProjection":
+        """Fit the ``dimension`` principal components of ``vectors``, which needs more vectors than dimensions."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.shape[0] <= dimension:
+            raise ValueError(f"PCA to {dimension} dimensions needs more than {dimension} vectors, "
+                             f"got {matrix.shape[0]}")
+
+        mean = matrix.mean(axis=0)
+        # rows of vt are the principal axes, by decreasing explained variance
+        _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        return cls(dimension=dimension, mean=mean, components=vt[:dimension].astype(np.float32))
+
+    def transform(self, vectors: List[list]) -> List[list]:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.components is None:
+            reduced = matrix[:, :self.dimension]
+        else:
+            reduced = (matrix - self.mean) @ self.components.T
+        return normalize(reduced).tolist()
+
+    def save(self, path: str):
+        # written next to the final file and renamed so readers never see half a projection
+        temp_path = f"{path}.part.npz"
+        np.savez(temp_path, dimension=self.dimension, mean=self.mean, components=self.components)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingProjection":
+        with np.load(path) as data:
+            return cls(dimension=int(data["dimension"]), mean=data["mean"], components=data["components"])
+
+
+class EmbeddingReducer:
+    """
+    Reduces the embeddings of every collection to ``dimension`` values.
+
+    Collections use Matryoshka truncation unless a PCA projection was fitted
+    for them with ``fit``, which is kept in ``directory`` as
+    ``<collection_name>.npz``. Documents and queries of a collection always go
+    through the same projection; fitting a new one invalidates the vectors
+    already stored, so it is fitted for a new collection that is indexed
+    before it replaces the old one.
+    """
+
+    def __init__(self, method: str, dimension: int, directory: str):
+        if method not in (REDUCTION_TRUNCATE, REDUCTION_PCA):
+            raise ValueError(f"Unknown embedding reduction {method!r}")
+        if not dimension or dimension <= 0:
+            raise ValueError("EMBEDDING_REDUCED_SIZE must be set to reduce embeddings")
+
+        self.method = method
+        self.dimension = dimension
+        self.directory = directory
+
+        self.truncation = EmbeddingProjection(dimension=dimension)
+        self.projections: Dict[str, EmbeddingProjection] = {}
+        self.lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, collection_name: str) -> str:
+        return os.path.join(self.directory, f"{collection_name}.npz")
+
+    def get_projection(self, collection_name: str) -> EmbeddingProjection:
+        projection = self.projections.get(collection_name)
+        if projection is not None:
+            return projection
+
+        projection = self.truncation
+        path = self.get_path(collection_name)
+        if self.method == REDUCTION_PCA and os.path.exists(path):
+            try:
+                projection = EmbeddingProjection.load(path)
+            except Exception as e:
+                logger.error(f"Error while loading the projection of {collection_name}: {e}")
+                raise
+
+            if projection.dimension != self.dimension:
+                raise ValueError(f"The projection of {collection_name} has {projection.dimension} dimensions, "
+                                 f"{self.dimension} are configured")
+
+        with self.lock:
+            return self.projections.setdefault(collection_name, projection)
+
+    def reduce(self, collection_name: str, vectors: List[list]) -> List[list]:
+        if not vectors:
+            return vectors
+        return self.get_projection(collection_name).transform(vectors)
+
+    def fit(self, collection_name: str, vectors: List[list]) -> EmbeddingProjection:
+        projection = EmbeddingProjection.fit_pca(vectors, dimension=self.dimension)
+        projection.save(self.get_path(collection_name))
+        with self.lock:
+            self.projections[collection_name] = projection
+        return projection
+
+    def export_projection(self, collection_name: str):
+        """Content of the fitted projection file of a collection, None when it uses truncation."""
+        try:
+            with open(self.get_path(collection_name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def import_projection(self, collection_name: str, content: bytes):
+        path = self.get_path(collection_name)
+        with open(f"{path}.part", "wb") as f:
+            f.write(content)
+        os.replace(f"{path}.part", path)
+
+        with self.lock:
+            self.projections.pop(collection_name, None)
+
+    def list_projections(self) -> List[str]:
+        """Names of the collections with a fitted projection file."""
+        return [
+            name[:-len(".npz")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".npz") and not name.endswith(".part.npz")
+        ]
+
+    def move_projection(self, source_name: str, target_name: str):
+        content = self.export_projection(source_name)
+        if content is not None:
+            self.import_projection(target_name, content)
+        self.forget(source_name)
+
+    def forget(self, collection_name: str):
+        with self.lock:
+            self.projections.pop(collection_name, None)
+        try:
+            os.remove(self.get_path(collection_name))
+        except FileNotFoundError:
+            pass
+
+    def get_info(self, collection_name: str) -> dict:
+        projection = self.get_projection(collection_name)
+        return {"method": projection.method, "dimension": projection.dimension}
@@ -0,0 +1,203 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+from helpers.tracing import tracer
+
+# Labels are limited to route, stage, provider, model and operation so the
+# number of series stays bounded; never label by project or file.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUESTS = Counter(
+    "specky_http_requests_total", "HTTP requests handled",
+    ["route", "method", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "specky_http_request_duration_seconds", "HTTP request latency",
+    ["route", "method"], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "specky_http_requests_in_flight", "HTTP requests currently being handled",
+)
+
+STAGE_DURATION = Histogram(
+    "specky_stage_duration_seconds", "Latency of internal pipeline stages",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+
+PROVIDER_CALLS = Counter(
+    "specky_provider_calls_total", "Calls made to LLM providers",
+    ["provider", "model", "operation", "outcome"],
+)
+PROVIDER_CALL_DURATION = Histogram(
+    "specky_provider_call_duration_seconds", "Latency of LLM provider calls",
+    ["provider", "model", "operation"], buckets=LATENCY_BUCKETS,
+)
+PROVIDER_RETRIES = Counter(
+    "specky_provider_retries_total", "Retried LLM provider calls",
+    ["provider", "operation"],
+)
+PROVIDER_CONCURRENCY_LIMIT = Gauge(
+    "specky_provider_concurrency_limit", "Adaptive concurrency limit of LLM provider endpoints",
+    ["provider", "operation"],
+)
+PROVIDER_IN_FLIGHT = Gauge(
+    "specky_provider_in_flight", "LLM provider calls currently sent",
+    ["provider", "operation"],
+)
+PROVIDER_QUEUE_DEPTH = Gauge(
+    "specky_provider_queue_depth", "LLM provider calls waiting for a concurrency slot",
+    ["provider", "operation"],
+)
+PROVIDER_QUEUE_WAIT = Histogram(
+    "specky_provider_queue_wait_seconds", "Time LLM provider calls waited for a concurrency slot",
+    ["provider", "operation"], buckets=LATENCY_BUCKETS,
+)
+PROVIDER_CIRCUIT_STATE = Gauge(
+    "specky_provider_circuit_state", "Circuit breaker state of LLM provider endpoints (0 closed, 1 half open, 2 open)",
+    ["provider", "operation"],
+)
+ROUTER_CALLS = Counter(
+    "specky_router_calls_total", "Generation calls sent to each backend of the routing provider",
+    ["backend", "outcome"],
+)
+ROUTER_HEDGES = Counter(
+    "specky_router_hedges_total", "Hedged generation calls of the routing provider, and which call won",
+    ["outcome"],
+)
+PROVIDER_TOKENS = Counter(
+    "specky_provider_tokens_total", "Tokens sent to and received from LLM providers",
+    ["provider", "model", "direction"],
+)
+
+VECTORS_UPSERTED = Counter(
+    "specky_vectors_upserted_total", "Vectors written to the vector db",
+    ["provider"],
+)
+CHUNKS_PROCESSED = Counter(
+    "specky_chunks_processed_total", "Chunks produced by file processing",
+    ["route"],
+)
+JOBS_IN_FLIGHT = Gauge(
+    "specky_jobs_in_flight", "Long running jobs currently executing",
+    ["job"],
+)
+
+CACHE_REQUESTS = Counter(
+    "specky_cache_requests_total", "Cache lookups",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Time a block into the stage latency histogram and trace it as a ``stage.<stage>`` span."""
+    started = time.perf_counter()
+    try:
+        with tracer.start_span(f"stage.{stage}"):
+            yield
+    finally:
+        STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def track_job(job: str):
+    """Decorator keeping ``specky_jobs_in_flight`` up to date for sync or async callables."""
+    gauge = JOBS_IN_FLIGHT.labels(job=job)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                gauge.inc()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    gauge.dec()
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            gauge.inc()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                gauge.dec()
+        return wrapper
+
+    return decorator
+
+
+def track_provider_call(operation: str, model_attr: str = None, model: str = None):
+    """Decorator for provider methods recording call counts, outcomes and latency.
+
+    The provider label is read from ``self.provider_name`` and the model label
+    from ``self.<model_attr>`` (or the fixed ``model``). A call counts as an
+    error when it raises or returns None.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            provider = getattr(self, "provider_name", type(self).__name__)
+            model_id = model or (getattr(self, model_attr, None) if model_attr else None) or "unknown"
+
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(self, *args, **kwargs)
+                if result is not None:
+                    outcome = "success"
+                return result
+            finally:
+                PROVIDER_CALL_DURATION.labels(provider=provider, model=model_id, operation=operation) \
+                    .observe(time.perf_counter() - started)
+                PROVIDER_CALLS.labels(provider=provider, model=model_id, operation=operation,
+                                      outcome=outcome).inc()
+        return wrapper
+
+    return decorator
+
+
+def record_tokens(provider: str, model: str, input_tokens: int = None, output_tokens: int = None):
+    if input_tokens:
+        PROVIDER_TOKENS.labels(provider=provider, model=model or "unknown", direction="in").inc(input_tokens)
+    if output_tokens:
+        PROVIDER_TOKENS.labels(provider=provider, model=model or "unknown", direction="out").inc(output_tokens)
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware recording request counts, latency and in-flight requests.
+
+    Requests are labelled by the matched route template (``/api/v1/nlp/index/search/{project_id}``)
+    rather than the raw path to keep label cardinality low.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope.get("method", "")
+
+            HTTP_REQUEST_DURATION.labels(route=route_path, method=method) \
+                .observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(route=route_path, method=method, status=status["code"]).inc()
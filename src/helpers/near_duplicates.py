@@ -0,0 +1,155 @@
+import re
+import zlib
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+WHITESPACE = re.compile(r"\s+")
+
+# hashes are taken modulo a Mersenne prime larger than the 32 bit shingle hashes
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def get_shingles(text: str, shingle_size: int = 5) -> np.ndarray:
+    """32 bit hashes of the character shingles of the normalized text."""
+    normalized = WHITESPACE.sub(" ", text).strip().lower()
+    if len(normalized) <= shingle_size:
+        shingles = {normalized}
+    else:
+        shingles = { normalized[i:i + shingle_size] for i in range(len(normalized) - shingle_size + 1) }
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def get_false_probabilities(threshold: float, bands: int, rows: int, steps: int = 100) -> Tuple[float, float]:
+    """Area of the false positive and false negative regions of the LSH S-curve around ``threshold``."""
+    def probability(s: float) -> float:
+        return 1 - (1 - s ** rows) ** bands
+
+    false_positive = sum(probability(threshold * (i + 0.5) / steps) for i in range(steps)) * threshold / steps
+    width = (1 - threshold) / steps
+    false_negative = sum(1 - probability(threshold + width * (i + 0.5)) for i in range(steps)) * width
+    return false_positive, false_negative
+
+
+def get_optimal_bands(threshold: float, num_perm: int, false_negative_weight: float = 0.9) -> Tuple[int, int]:
+    """Bands and rows per band splitting ``num_perm`` hashes with the fewest misclassified pairs.
+
+    Candidates are verified against their signatures, so missed duplicates
+    weigh more than false candidates.
+    """
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        false_positive, false_negative = get_false_probabilities(threshold, bands, rows)
+        error = (1 - false_negative_weight) * false_positive + false_negative_weight * false_negative
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateDetector:
+    """
+    MinHash / LSH index of chunk texts finding near duplicates.
+
+    Every text gets a ``num_perm`` MinHash signature of its character shingles,
+    split into bands. Texts sharing a band are candidates, and a candidate
+    whose signature agrees on at least ``threshold`` of its values (the
+    estimated Jaccard similarity) is a near duplicate. Lookups cost one
+    signature and a few dict hits however many texts are indexed.
+
+    Signatures do not depend on the threshold, so they can be stored with
+    ``dump_signature`` and indexed again later without hashing the texts.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        if not 0 < threshold <= 1:
+            raise ValueError("The near duplicate threshold must be in (0, 1]")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = get_optimal_bands(threshold, num_perm)
+
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, set]] = [ {} for _ in range(self.bands) ]
+
+    def get_signature(self, text: str) -> np.ndarray:
+        shingles = get_shingles(text, self.shingle_size)
+        # one universal hash per permutation, the signature keeps the minimum over the shingles
+        hashes = ((np.outer(shingles, self.a) + self.b) % MERSENNE_PRIME) & MAX_HASH
+        return hashes.min(axis=0)
+
+    @property
+    def params(self) -> str:
+        """Parameters a stored signature must have been computed with to be reused."""
+        return f"{self.num_perm}:{self.shingle_size}:{self.seed}"
+
+    def dump_signature(self, key: Hashable) -> dict:
+        # the hashes are masked to 32 bits, half the size of the uint64 array
+        return {"params": self.params, "signature": self.signatures[key].astype(np.uint32).tobytes()}
+
+    def load_signature(self, dump: Optional[dict]) -> Optional[np.ndarray]:
+        """Signature of a ``dump_signature`` result, None if missing or computed with other parameters."""
+        if not dump or dump.get("params") != self.params:
+            return None
+        return np.frombuffer(dump["signature"], dtype=np.uint32).astype(np.uint64)
+
+    def get_bands(self, signature: np.ndarray) -> List[bytes]:
+        return [ signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands) ]
+
+    def find(self, text: str) -> Optional[Hashable]:
+        """Key of an indexed text similar to ``text``, or None."""
+        return self.find_signature(self.get_signature(text))
+
+    def find_signature(self, signature: np.ndarray) -> Optional[Hashable]:
+        best_key, best_similarity = None, 0.0
+        seen = set()
+
+        for bucket, band in zip(self.buckets, self.get_bands(signature)):
+            for key in bucket.get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                similarity = float(np.mean(self.signatures[key] == signature))
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+
+        return best_key
+
+    def add(self, key: Hashable, text: str, signature: np.ndarray = None):
+        if key in self.signatures:
+            self.remove(key)
+
+        signature = self.get_signature(text) if signature is None else signature
+        self.signatures[key] = signature
+        for bucket, band in zip(self.buckets, self.get_bands(signature)):
+            bucket.setdefault(band, set()).add(key)
+
+    def remove(self, key: Hashable):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+
+        for bucket, band in zip(self.buckets, self.get_bands(signature)):
+            keys = bucket.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[band]
+
+    def add_if_unique(self, key: Hashable, text: str) -> Optional[Hashable]:
+        """Index ``text`` unless it is a near duplicate; returns the key of its original, None if it was added."""
+        signature = self.get_signature(text)
+        original = self.find_signature(signature)
+        if original is None:
+            self.add(key, text, signature=signature)
+        return original
+
+    def __len__(self):
+        return len(self.signatures)
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Iterator, List
+
+_DONE = object()
+
+
+class PipelineStage:
+    """One step of an async pipeline.
+
+    Args:
+        name (str): Stage name used in the reported stats.
+        handler (Callable): ``async handler(items: list) -> list`` receiving a
+            batch of up to ``batch_size`` items and returning the items to pass
+            to the next stage.
+        concurrency (int): Number of workers running the handler.
+        batch_size (int): Maximum number of items handed to one handler call.
+        ordered (bool): Emit outputs in the order the inputs arrived, even
+            when several workers finish out of order. Requires ``batch_size=1``.
+    """
+
+    def __init__(self, name: str, handler: Callable[[list], Awaitable[list]],
+                 concurrency: int = 1, batch_size: int = 1, ordered: bool = False):
+
+        if ordered and batch_size != 1:
+            raise ValueError("ordered stages must use batch_size=1")
+
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.ordered = ordered
+
+
+class StageStats:
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.items_in = 0
+        self.items_out = 0
+        self.calls = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        wall_seconds = (self.finished_at or time.perf_counter()) - (self.started_at or time.perf_counter())
+        return {
+            "stage": self.name,
+            "concurrency": self.concurrency,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "calls": self.calls,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "wall_seconds": round(wall_seconds, 4),
+            "items_per_second": round(self.items_in / wall_seconds, 2) if wall_seconds > 0 else None,
+        }
+
+
+async def run_pipeline(source: Iterator, stages: List[PipelineStage],
+                       source_name: str = "source", queue_size: int = 64) -> List[dict]:
+    """Run ``source`` items through ``stages`` connected by bounded queues.
+
+    The blocking ``source`` iterator is pulled in a worker thread. Every queue
+    holds at most ``queue_size`` items, so a slow stage throttles the stages
+    before it instead of letting their output pile up in memory. The first
+    exception raised by any stage cancels the whole pipeline and is re-raised.
+
+    Returns:
+        List[dict]: Per-stage stats, the source first.
+    """
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    source_stats = StageStats(source_name, concurrency=1)
+    stats = [StageStats(stage.name, stage.concurrency) for stage in stages]
+
+    async def produce():
+        source_stats.started_at = time.perf_counter()
+        iterator = iter(source)
+        while True:
+            started = time.perf_counter()
+            item = await asyncio.to_thread(next, iterator, _DONE)
+            source_stats.busy_seconds += time.perf_counter() - started
+            if item is _DONE:
+                break
+            source_stats.items_out += 1
+            await queues[0].put((source_stats.items_out, item))
+
+        source_stats.items_in = source_stats.items_out
+        source_stats.finished_at = time.perf_counter()
+        for _ in range(stages[0].concurrency):
+            await queues[0].put(_DONE)
+
+    async def run_stage(idx: int):
+        stage, stage_stats = stages[idx], stats[idx]
+        in_queue = queues[idx]
+        out_queue = queues[idx + 1] if idx + 1 < len(stages) else None
+
+        pending, next_seq, out_seq = {}, 1, [0]
+        emit_lock = asyncio.Lock()
+
+        async def emit(outputs):
+            stage_stats.items_out += len(outputs)
+            if out_queue is None:
+                return
+            for output in outputs:
+                out_seq[0] += 1
+                await out_queue.put((out_seq[0], output))
+
+        async def worker():
+            nonlocal next_seq
+            done = False
+            while not done:
+                batch = []
+                while len(batch) < stage.batch_size:
+                    entry = await in_queue.get()
+                    if entry is _DONE:
+                        done = True
+                        break
+                    batch.append(entry)
+
+                if not batch:
+                    break
+
+                if stage_stats.started_at is None:
+                    stage_stats.started_at = time.perf_counter()
+
+                started = time.perf_counter()
+                outputs = await stage.handler([item for _, item in batch]) or []
+                stage_stats.busy_seconds += time.perf_counter() - started
+                stage_stats.items_in += len(batch)
+                stage_stats.calls += 1
+
+                async with emit_lock:
+                    if not stage.ordered:
+                        await emit(outputs)
+                        continue
+
+                    pending[batch[0][0]] = outputs
+                    while next_seq in pending:
+                        await emit(pending.pop(next_seq))
+                        next_seq += 1
+
+        await asyncio.gather(*[worker() for _ in range(stage.concurrency)])
+        stage_stats.finished_at = time.perf_counter()
+
+        if out_queue is not None:
+            for _ in range(stages[idx + 1].concurrency):
+                await out_queue.put(_DONE)
+
+    tasks = [asyncio.ensure_future(produce())] + [
+        asyncio.ensure_future(run_stage(idx)) for idx in range(len(stages))
+    ]
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    return [source_stats.to_dict()] + [stage_stats.to_dict() for stage_stats in stats]
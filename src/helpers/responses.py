@@ -0,0 +1,140 @@
+import gzip
+import logging
+from typing import List
+from helpers.config import get_settings
+from models.db_schemes import RetrievedDocument
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def serialize_retrieved_documents(documents: List[RetrievedDocument]) -> List[dict]:
+    """Build the response dicts straight from the fields, skipping pydantic's generic ``.dict()``."""
+    return [ {"text": document.text, "score": document.score} for document in documents ]
+
+
+def get_quality(parameters: List[str]) -> float:
+    """q-value of an Accept-Encoding entry, 1 when missing; a malformed value counts as refused."""
+    for parameter in parameters:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def select_encoding(accept_encoding: str):
+    """Pick ``br`` or ``gzip`` from an Accept-Encoding header, brotli first when installed.
+
+    Encodings listed with ``q=0`` (in any spelling, e.g. ``br; q=0.0``) are refused.
+    """
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *parameters = part.split(";")
+        if get_quality(parameters) > 0:
+            accepted.add(coding.strip().lower())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing complete JSON/text responses above a size threshold.
+
+    Only single-message bodies are compressed; streamed responses (audio,
+    NDJSON) pass through untouched so they keep their time to first byte.
+    """
+
+    def __init__(self, app, minimum_size: int = None, gzip_level: int = None, brotli_quality: int = None):
+        # the middleware stack is built on the first request, after the settings are available
+        settings = get_settings()
+
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else settings.RESPONSE_COMPRESSION_MIN_SIZE
+        self.gzip_level = gzip_level if gzip_level is not None else settings.RESPONSE_GZIP_LEVEL
+        self.brotli_quality = brotli_quality if brotli_quality is not None else settings.RESPONSE_BROTLI_QUALITY
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                encoding = select_encoding(value.decode("latin-1"))
+                break
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+
+            if message["type"] == "http.response.start":
+                # hold the headers back until the body shows whether it is worth compressing
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            held_start, start_message = start_message, None
+            body = message.get("body", b"")
+
+            if message.get("more_body", False) or not self.should_compress(held_start, body):
+                await send(held_start)
+                await send(message)
+                return
+
+            compressed = compress_body(body, encoding, gzip_level=self.gzip_level,
+                                       brotli_quality=self.brotli_quality)
+
+            headers = [
+                (key, value) for key, value in held_start.get("headers", [])
+                if key not in (b"content-length", b"vary")
+            ]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+
+            await send({**held_start, "headers": headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def should_compress(self, start_message: dict, body: bytes) -> bool:
+        if len(body) < self.minimum_size:
+            return False
+
+        content_type = b""
+        for key, value in start_message.get("headers", []):
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value
+
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_CONTENT_TYPES)
@@ -0,0 +1,243 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import List
+
+# tashkeel, quranic marks, superscript alef and tatweel
+ARABIC_DIACRITICS = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+ARABIC_LETTER_VARIANTS = str.maketrans({"\u0623": "\u0627", "\u0625": "\u0627", "\u0622": "\u0627",
+                                       "\u0671": "\u0627", "\u0649": "\u064A"})
+NON_WORD = re.compile(r"[^\w]+")
+TOKEN = re.compile(r"\S+")
+
+MATCH = "match"
+SUBSTITUTION = "substitution"
+INSERTION = "insertion"  # word in the hypothesis only (said but not expected)
+DELETION = "deletion"    # word in the reference only (expected but not said)
+
+
+def normalize_word(word: str) -> str:
+    """Case fold and drop punctuation, Arabic diacritics and Arabic letter variants."""
+    word = unicodedata.normalize("NFKC", word).casefold()
+    word = ARABIC_DIACRITICS.sub("", word).translate(ARABIC_LETTER_VARIANTS)
+    return NON_WORD.sub("", word)
+
+
+class Token:
+
+    __slots__ = ("text", "normalized", "index", "start", "end")
+
+    def __init__(self, text: str, normalized: str, index: int, start: int, end: int):
+        self.text = text
+        self.normalized = normalized
+        self.index = index
+        self.start = start
+        self.end = end
+
+
+def tokenize(text: str) -> List[Token]:
+    """Split on whitespace and normalize every word once; pure punctuation tokens are dropped."""
+    tokens = []
+    for match in TOKEN.finditer(text):
+        normalized = normalize_word(match.group())
+        if normalized:
+            tokens.append(Token(match.group(), normalized, len(tokens), match.start(), match.end()))
+    return tokens
+
+
+def levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+@lru_cache(maxsize=65536)
+def word_similarity(a: str, b: str) -> float:
+    """1 - normalized character edit distance, 1.0 for identical words."""
+    if a == b:
+        return 1.0
+    return 1 - levenshtein(a, b) / max(len(a), len(b))
+
+
+def align_chars(reference: str, hypothesis: str) -> List[dict]:
+    """Character edits turning ``reference`` into ``hypothesis``, with positions in both strings."""
+    n, m = len(reference), len(hypothesis)
+    cost = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n + 1):
+        cost[i][0] = i
+    for j in range(m + 1):
+        cost[0][j] = j
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            cost[i][j] = min(cost[i - 1][j] + 1, cost[i][j - 1] + 1,
+                             cost[i - 1][j - 1] + (reference[i - 1] != hypothesis[j - 1]))
+
+    edits = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and cost[i][j] == cost[i - 1][j - 1] + (reference[i - 1] != hypothesis[j - 1]):
+            if reference[i - 1] != hypothesis[j - 1]:
+                edits.append({"op": SUBSTITUTION, "reference_position": i - 1, "hypothesis_position": j - 1,
+                              "reference": reference[i - 1], "hypothesis": hypothesis[j - 1]})
+            i, j = i - 1, j - 1
+        elif i > 0 and cost[i][j] == cost[i - 1][j] + 1:
+            edits.append({"op": DELETION, "reference_position": i - 1, "hypothesis_position": j,
+                          "reference": reference[i - 1], "hypothesis": None})
+            i -= 1
+        else:
+            edits.append({"op": INSERTION, "reference_position": i, "hypothesis_position": j - 1,
+                          "reference": None, "hypothesis": hypothesis[j - 1]})
+            j -= 1
+
+    edits.reverse()
+    return edits
+
+
+class WordEdit:
+    """One aligned slot: a reference word, a hypothesis word, or both."""
+
+    __slots__ = ("op", "reference", "hypothesis", "similarity")
+
+    def __init__(self, op: str, reference: Token = None, hypothesis: Token = None, similarity: float = 0.0):
+        self.op = op
+        self.reference = reference
+        self.hypothesis = hypothesis
+        self.similarity = similarity
+
+    def char_edits(self) -> List[dict]:
+        """Character edits of a substitution, positions are in the normalized words."""
+        if self.op != SUBSTITUTION:
+            return []
+        return align_chars(self.reference.normalized, self.hypothesis.normalized)
+
+    def to_dict(self, with_char_edits: bool = False) -> dict:
+        data = {
+            "op": self.op,
+            "reference": self.reference.text if self.reference else None,
+            "hypothesis": self.hypothesis.text if self.hypothesis else None,
+            "reference_index": self.reference.index if self.reference else None,
+            "hypothesis_index": self.hypothesis.index if self.hypothesis else None,
+            "reference_span": (self.reference.start, self.reference.end) if self.reference else None,
+            "hypothesis_span": (self.hypothesis.start, self.hypothesis.end) if self.hypothesis else None,
+            "similarity": round(self.similarity, 4),
+        }
+        if with_char_edits:
+            data["char_edits"] = self.char_edits()
+        return data
+
+
+class Alignment:
+
+    def __init__(self, edits: List[WordEdit], reference: List[Token], hypothesis: List[Token]):
+        self.edits = edits
+        self.reference = reference
+        self.hypothesis = hypothesis
+
+    @property
+    def confidence(self) -> float:
+        """Mean word similarity over all aligned slots, 1.0 when both texts are empty."""
+        if not self.edits:
+            return 1.0
+        return sum(edit.similarity for edit in self.edits) / len(self.edits)
+
+    @property
+    def word_error_rate(self) -> float:
+        errors = sum(1 for edit in self.edits if edit.op != MATCH)
+        return errors / max(1, len(self.reference))
+
+    def error_runs(self) -> List[List[WordEdit]]:
+        """Consecutive non matching edits, the unit the voice API reports as one change."""
+        runs, run = [], []
+        for edit in self.edits:
+            if edit.op == MATCH:
+                if run:
+                    runs.append(run)
+                    run = []
+            else:
+                run.append(edit)
+        if run:
+            runs.append(run)
+        return runs
+
+
+def align_gap(reference: List[Token], hypothesis: List[Token], max_cells: int) -> List[WordEdit]:
+    """Weighted word edit distance over an unmatched region, substitutions cost 1 - similarity."""
+    n, m = len(reference), len(hypothesis)
+
+    if n * m > max_cells:
+        # too large to align exactly: pair the words positionally
+        edits = []
+        for r, h in zip(reference, hypothesis):
+            similarity = word_similarity(r.normalized, h.normalized)
+            edits.append(WordEdit(MATCH if similarity == 1.0 else SUBSTITUTION, r, h, similarity))
+        edits += [ WordEdit(DELETION, reference=r) for r in reference[m:] ]
+        edits += [ WordEdit(INSERTION, hypothesis=h) for h in hypothesis[n:] ]
+        return edits
+
+    cost = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n + 1):
+        cost[i][0] = float(i)
+    for j in range(m + 1):
+        cost[0][j] = float(j)
+    for i in range(1, n + 1):
+        word = reference[i - 1].normalized
+        for j in range(1, m + 1):
+            cost[i][j] = min(cost[i - 1][j] + 1, cost[i][j - 1] + 1,
+                             cost[i - 1][j - 1] + 1 - word_similarity(word, hypothesis[j - 1].normalized))
+
+    edits = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0:
+            similarity = word_similarity(reference[i - 1].normalized, hypothesis[j - 1].normalized)
+            if abs(cost[i][j] - (cost[i - 1][j - 1] + 1 - similarity)) < 1e-9:
+                op = MATCH if similarity == 1.0 else SUBSTITUTION
+                edits.append(WordEdit(op, reference[i - 1], hypothesis[j - 1], similarity))
+                i, j = i - 1, j - 1
+                continue
+        if i > 0 and abs(cost[i][j] - (cost[i - 1][j] + 1)) < 1e-9:
+            edits.append(WordEdit(DELETION, reference=reference[i - 1]))
+            i -= 1
+        else:
+            edits.append(WordEdit(INSERTION, hypothesis=hypothesis[j - 1]))
+            j -= 1
+
+    edits.reverse()
+    return edits
+
+
+def align_texts(reference: str, hypothesis: str, max_gap_cells: int = 250_000) -> Alignment:
+    """
+    Align an expected (reference) text with a transcription (hypothesis).
+
+    Both texts are tokenized and normalized once and mapped to integer ids.
+    Identical runs are found with ``SequenceMatcher`` on the ids, which is
+    close to linear for similar texts, and only the unmatched regions in
+    between go through the quadratic weighted edit distance.
+    """
+    reference_tokens = tokenize(reference)
+    hypothesis_tokens = tokenize(hypothesis)
+
+    vocabulary = {}
+    reference_ids = [ vocabulary.setdefault(t.normalized, len(vocabulary)) for t in reference_tokens ]
+    hypothesis_ids = [ vocabulary.setdefault(t.normalized, len(vocabulary)) for t in hypothesis_tokens ]
+
+    edits = []
+    matcher = SequenceMatcher(None, reference_ids, hypothesis_ids)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            edits.extend(
+                WordEdit(MATCH, reference_tokens[i], hypothesis_tokens[j], 1.0)
+                for i, j in zip(range(i1, i2), range(j1, j2))
+            )
+        else:
+            edits.extend(align_gap(reference_tokens[i1:i2], hypothesis_tokens[j1:j2], max_gap_cells))
+
+    return Alignment(edits, reference_tokens, hypothesis_tokens)
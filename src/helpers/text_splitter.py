@@ -0,0 +1,157 @@
+import re
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Sentence terminators for Latin and Arabic scripts: . ! ? … plus the Arabic
+# question mark (؟), semicolon (؛), full stop (۔) and the line separator.
+_SENTENCE_RE = re.compile(r"[^.!?…؟؛۔\n]*(?:[.!?…؟؛۔]+|\n|$)\s*")
+_PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t]*\n\s*")
+_WORD_RE = re.compile(r"\S+\s*")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+class TextChunk:
+    """A split piece of text with the metadata of its source record.
+
+    Exposes the same ``page_content``/``metadata`` attributes as langchain
+    documents so both splitters can feed the same pipeline.
+    """
+
+    __slots__ = ("page_content", "metadata")
+
+    def __init__(self, page_content: str, metadata: dict = None):
+        self.page_content = page_content
+        self.metadata = metadata if metadata is not None else {}
+
+
+def get_token_counter(encoding_name: str = "cl100k_base") -> Callable[[str], int]:
+    """Return a function counting tokens of a string.
+
+    Uses ``tiktoken`` when the encoding can be loaded and falls back to a
+    word/punctuation regex estimate otherwise (e.g. no network to fetch the
+    BPE ranks).
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(encoding_name)
+        return lambda text: len(encoding.encode_ordinary(text))
+    except Exception as e:
+        logger.warning(f"tiktoken encoding {encoding_name} is not available, estimating tokens: {e}")
+        return lambda text: len(_TOKEN_RE.findall(text))
+
+
+class SentenceTextSplitter:
+    """Sentence and paragraph aware splitter with char or token based sizes.
+
+    The text is scanned once into sentence spans which are then packed greedily
+    into chunks of at most ``chunk_size`` units. Chunks prefer to end on a
+    paragraph break once they are half full, and the next chunk starts with the
+    trailing sentences of the previous one that fit into ``chunk_overlap``.
+    Sentences longer than ``chunk_size`` are split on words.
+    """
+
+    def __init__(self, chunk_size: int = 100, chunk_overlap: int = 20,
+                 length_unit: str = "char", encoding_name: str = "cl100k_base"):
+
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+
+        if chunk_overlap < 0 or chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be in [0, chunk_size)")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_unit = length_unit
+
+        if length_unit == "token":
+            self.length_function = get_token_counter(encoding_name=encoding_name)
+        else:
+            self.length_function = len
+
+    def _get_units(self, text: str):
+        """Return ``(start, end, length, starts_paragraph)`` spans covering the text."""
+        paragraph_starts = {m.end() for m in _PARAGRAPH_BREAK_RE.finditer(text)}
+        units = []
+
+        for match in _SENTENCE_RE.finditer(text):
+            start, end = match.span()
+            if start == end:
+                continue
+
+            length = self.length_function(match.group())
+            starts_paragraph = start in paragraph_starts
+
+            if length <= self.chunk_size:
+                units.append((start, end, length, starts_paragraph))
+                continue
+
+            # sentence is too long on its own, fall back to words
+            for word in _WORD_RE.finditer(text, start, end):
+                word_start, word_end = word.span()
+                word_length = self.length_function(word.group())
+
+                if word_length <= self.chunk_size or self.length_unit == "token":
+                    units.append((word_start, word_end, word_length, starts_paragraph))
+                else:
+                    for i in range(word_start, word_end, self.chunk_size):
+                        piece_end = min(i + self.chunk_size, word_end)
+                        units.append((i, piece_end, piece_end - i, starts_paragraph))
+
+                starts_paragraph = False
+
+        return units
+
+    def split_text(self, text: str) -> List[str]:
+        if not text:
+            return []
+
+        units = self._get_units(text)
+        chunks = []
+
+        first = 0
+        while first < len(units):
+            last = first
+            total = units[first][2]
+
+            while last + 1 < len(units):
+                next_length = units[last + 1][2]
+                if total + next_length > self.chunk_size:
+                    break
+
+                # close the chunk on a paragraph break once it is half full
+                if units[last + 1][3] and total >= self.chunk_size // 2:
+                    break
+
+                last += 1
+                total += next_length
+
+            chunk_text = text[units[first][0]:units[last][1]].strip()
+            if chunk_text:
+                chunks.append(chunk_text)
+
+            if last + 1 >= len(units):
+                break
+
+            # step back over the trailing units that fit into the overlap,
+            # leaving room for the next unit so every chunk makes progress
+            next_first = last + 1
+            budget = min(self.chunk_overlap, self.chunk_size - units[next_first][2])
+            overlap = 0
+            while next_first - 1 > first and overlap + units[next_first - 1][2] <= budget:
+                next_first -= 1
+                overlap += units[next_first][2]
+
+            first = next_first
+
+        return chunks
+
+    def create_documents(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> List[TextChunk]:
+        metadatas = metadatas or [{}] * len(texts)
+
+        return [
+            TextChunk(page_content=chunk, metadata=dict(metadata))
+            for text, metadata in zip(texts, metadatas)
+            for chunk in self.split_text(text)
+        ]
@@ -0,0 +1,226 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+REQUEST_ID_HEADER = "x-request-id"
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation of a trace. Unsampled spans are never recorded."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes",
+                 "sampled", "started_at", "started", "duration_ms", "status",
+                 "error", "trace_spans")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None,
+                 sampled: bool = True, attributes: dict = None, trace_spans: list = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.sampled = sampled
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.status = "ok"
+        self.error = None
+        # spans of the whole trace, shared by every span of it and exported with the root
+        self.trace_spans = trace_spans if trace_spans is not None else []
+
+    def set_attribute(self, key: str, value):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.started_at,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class ConsoleSpanExporter:
+    def export(self, spans: list):
+        for span in spans:
+            logger.info(json.dumps(span, default=str))
+
+
+class JSONFileSpanExporter:
+    """Appends finished traces to a JSON lines file, one span per line."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+
+    def export(self, spans: list):
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        with self.lock:
+            with open(self.file_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+
+class Tracer:
+
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.exporter = None
+
+    def configure(self, sample_rate: float, exporter):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    @property
+    def enabled(self):
+        return self.exporter is not None and self.sample_rate > 0
+
+    @contextmanager
+    def start_span(self, name: str, attributes: dict = None, trace_id: str = None):
+        """Open a span under the current one, or a new sampled/unsampled trace if there is none."""
+        parent = _current_span.get()
+
+        if parent is None:
+            sampled = self.enabled and random.random() < self.sample_rate
+            span = Span(name, trace_id=trace_id or uuid.uuid4().hex, sampled=sampled,
+                        attributes=attributes if sampled else None)
+        elif not parent.sampled:
+            # unsampled traces only carry the request id, no bookkeeping at all
+            yield parent
+            return
+        else:
+            span = Span(name, trace_id=parent.trace_id, parent_id=parent.span_id,
+                        attributes=attributes, trace_spans=parent.trace_spans)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            if span.sampled:
+                span.duration_ms = round((time.perf_counter() - span.started) * 1000, 3)
+                span.trace_spans.append(span.to_dict())
+                if parent is None:
+                    self.export(span.trace_spans)
+
+    def export(self, spans: list):
+        try:
+            self.exporter.export(spans)
+        except Exception as e:
+            logger.error(f"Error while exporting spans: {e}")
+
+
+tracer = Tracer()
+
+
+def configure_tracing(settings):
+    exporter = None
+    if settings.TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif settings.TRACING_EXPORTER == "file":
+        exporter = JSONFileSpanExporter(settings.TRACING_FILE_PATH)
+
+    tracer.configure(sample_rate=settings.TRACING_SAMPLE_RATE, exporter=exporter)
+
+
+def get_request_id():
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def traced(name: str = None):
+    """Decorator wrapping a sync or async callable in a span."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def trace_methods(prefix: str, include: list = None):
+    """Class decorator tracing the public instance methods (or only ``include``) as ``prefix.method``."""
+    def decorator(cls):
+        for attr_name, attr in list(vars(cls).items()):
+            if attr_name.startswith("_") or not inspect.isfunction(attr):
+                continue
+            if include is not None and attr_name not in include:
+                continue
+            setattr(cls, attr_name, traced(f"{prefix}.{attr_name}")(attr))
+        return cls
+
+    return decorator
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening the root span of every request.
+
+    The trace id is taken from the ``X-Request-ID`` header when present, so
+    ids propagate from upstream proxies, and is echoed back on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1"))
+                ]
+                span.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        with tracer.start_span("http.request", trace_id=request_id, attributes={
+            "http.method": scope.get("method"),
+        }) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                span.set_attribute("http.route", getattr(route, "path", "unmatched"))
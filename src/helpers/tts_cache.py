@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from helpers.audio_store import AudioStore
+from helpers.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def get_tts_key(text: str, model: str, voice: str) -> str:
+    """Content address of a synthesized phrase, stable across processes and restarts."""
+    normalized = WHITESPACE.sub(" ", text).strip()
+    return hashlib.sha256(f"{model}\x1f{voice}\x1f{normalized}".encode("utf-8")).hexdigest()[:32]
+
+
+class TTSCache:
+    """
+    Content addressed cache of synthesized speech.
+
+    Clips are persisted in the ``AudioStore`` served by
+    ``GET /api/v1/voice/audio/{audio_id}``, which bounds their disk use, and the
+    smallest, most recently used ones (single correction words) are also kept
+    in memory. Concurrent misses for the same key share one synthesis.
+    """
+
+    def __init__(self, store: AudioStore, memory_items: int = 512, memory_item_max_bytes: int = 256 * 1024):
+        self.store = store
+        self.memory_items = memory_items
+        self.memory_item_max_bytes = memory_item_max_bytes
+
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.inflight = {}
+
+    def get_path(self, key: str) -> str:
+        return self.store.get_path(key)
+
+    def remember(self, key: str, content: bytes):
+        if len(content) > self.memory_item_max_bytes or self.memory_items <= 0:
+            return
+        with self.lock:
+            self.memory[key] = content
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+
+    def contains(self, key: str) -> bool:
+        # the clip must still be on disk to be served, memory only saves the read
+        if not self.store.contains(key):
+            with self.lock:
+                self.memory.pop(key, None)
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            content = self.memory.get(key)
+            if content is not None:
+                self.memory.move_to_end(key)
+
+        if content is not None and self.store.contains(key):
+            return content
+
+        content = self.store.read(key)
+        if content is None:
+            with self.lock:
+                self.memory.pop(key, None)
+            return None
+
+        self.remember(key, content)
+        return content
+
+    def put(self, key: str, content: bytes):
+        self.store.put(key, content)
+        self.remember(key, content)
+
+    async def get_or_create(self, key: str, synthesize: Callable[[], Awaitable[Optional[bytes]]]) -> bool:
+        """Make sure ``key`` is cached, calling ``synthesize`` on a miss. Returns False if synthesis failed."""
+        if self.contains(key):
+            CACHE_REQUESTS.labels(cache="tts", result="hit").inc()
+            return True
+
+        inflight = self.inflight.get(key)
+        if inflight is not None:
+            CACHE_REQUESTS.labels(cache="tts", result="coalesced").inc()
+            return await asyncio.shield(inflight)
+
+        CACHE_REQUESTS.labels(cache="tts", result="miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+
+        try:
+            content = await synthesize()
+            if content:
+                await asyncio.to_thread(self.put, key, content)
+            future.set_result(bool(content))
+        except Exception as e:
+            logger.error(f"Error while synthesizing {key}: {e}")
+        finally:
+            # waiters must never hang, even when this request is cancelled
+            if not future.done():
+                future.set_result(False)
+            self.inflight.pop(key, None)
+
+        return future.result()
+
+    async def stream_or_create(self, key: str, stream: Callable[[], AsyncIterator[bytes]],
+                               chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """Yield the audio of ``key``, from the cache or from ``stream`` on a miss.
+
+        On a miss the chunks are passed on as soon as they are produced and the
+        complete clip is cached at the end; a stream cut short (client gone,
+        provider error) is never cached. Concurrent requests for a key being
+        streamed wait for it and are served from the cache.
+        """
+        while True:
+            content = await asyncio.to_thread(self.get, key)
+            if content is not None:
+                CACHE_REQUESTS.labels(cache="tts", result="hit").inc()
+                for i in range(0, len(content), chunk_size):
+                    yield content[i:i + chunk_size]
+                return
+
+            inflight = self.inflight.get(key)
+            if inflight is None:
+                break
+
+            CACHE_REQUESTS.labels(cache="tts", result="coalesced").inc()
+            if not await asyncio.shield(inflight):
+                # the other stream failed, try to synthesize it ourselves
+                continue
+
+        CACHE_REQUESTS.labels(cache="tts", result="miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+
+        try:
+            chunks = []
+            async for chunk in stream():
+                chunks.append(chunk)
+                yield chunk
+
+            content = b"".join(chunks)
+            if content:
+                await asyncio.to_thread(self.put, key, content)
+            future.set_result(bool(content))
+        except Exception as e:
+            # the response is already under way, abort it rather than end it as if complete
+            logger.error(f"Error while streaming {key}: {e}")
+            raise
+        finally:
+            if not future.done():
+                future.set_result(False)
+            self.inflight.pop(key, None)
@@ -1,65 +1,43 @@
 from fastapi import FastAPI
 import uvicorn
-from routes import base, data, nlp, voice, document
-from motor.motor_asyncio import AsyncIOMotorClient
+from routes import base, data, nlp, voice, document, metrics
+from contextlib import asynccontextmanager
 from helpers.config import get_settings
-from stores.llm.LLMProviderFactory import LLMProviderFactory
-from stores.vectordb.VectorDBProviderFactory import VectorDBProviderFactory
-from stores.llm.templates.template_parser import TemplateParser
+from helpers.container import ServiceContainer
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from helpers.metrics import PrometheusMiddleware
+from helpers.tracing import TracingMiddleware, configure_tracing
+from helpers.responses import CompressionMiddleware
 
 
-app = FastAPI()
-
-async def startup_span():
-    """Start up the application and connect to the database and other services
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the shared service container on startup and close its clients on shutdown
     """
-    # get settings
+    # settings are parsed once and cached by get_settings
     settings = get_settings()
-    
-    # connect to the database
-    app.mongo_conn = AsyncIOMotorClient(settings.MONGODB_URL) # connect to the database
-    app.db_client = app.mongo_conn[settings.MONGODB_DATABASE] # get the database
-
-    # create the provider factories
-    llm_provider_factory = LLMProviderFactory(settings)
-    vectordb_provider_factory = VectorDBProviderFactory(settings)
 
-    # generation client
-    app.generation_client = llm_provider_factory.create(provider=settings.GENERATION_BACKEND)
-    app.generation_client.set_generation_model(model_id = settings.GENERATION_MODEL_ID)
+    configure_tracing(settings)
 
-    # embedding client
-    app.embedding_client = llm_provider_factory.create(provider=settings.EMBEDDING_BACKEND)
-    app.embedding_client.set_embedding_model(model_id=settings.EMBEDDING_MODEL_ID,
-                                             embedding_size=settings.EMBEDDING_MODEL_SIZE)
-    
-    # vector db client
-    app.vectordb_client = vectordb_provider_factory.create(
-        provider=settings.VECTOR_DB_BACKEND
-    )
-    app.vectordb_client.connect()
+    container = ServiceContainer(settings=settings)
+    await container.startup()
+    app.state.container = container
 
-    app.template_parser = TemplateParser(
-        language=settings.PRIMARY_LANG,
-        default_language=settings.DEFAULT_LANG,
-    )
+    try:
+        yield
+    finally:
+        await container.shutdown()
 
 
-async def shutdown_span():
-    """Shut down the application and close the database connection
-    """
-    app.mongo_conn.close()
-    app.vectordb_client.disconnect()
-
-app.on_event("startup")(startup_span)
-app.on_event("shutdown")(shutdown_span)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.include_router(base.base_router)
 app.include_router(data.data_router)
 app.include_router(nlp.nlp_router)
 # app.include_router(document.voice_router)
 app.include_router(voice.voice_router)
+app.include_router(metrics.metrics_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -68,6 +46,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(PrometheusMiddleware)
+app.add_middleware(TracingMiddleware)
 
 
 # if __name__ == "__main__":
@@ -2,7 +2,9 @@ from .BaseDataModel import BaseDataModel
 from .db_schemes import Asset
 from .enums.DataBaseEnum import DataBaseEnum
 from bson import ObjectId
+from helpers.tracing import trace_methods
 
+@trace_methods("mongo.assets")
 class AssetModel(BaseDataModel):
 
     def __init__(self, db_client: object):
@@ -46,6 +48,18 @@ class AssetModel(BaseDataModel):
             for record in records
         ]
 
+    async def get_project_assets(self, asset_project_id: ObjectId):
+        """Every asset of a project, whatever its type."""
+
+        records = await self.collection.find({
+            "asset_project_id": asset_project_id,
+        }).to_list(length=None)
+
+        return [
+            Asset(**record)
+            for record in records
+        ]
+
     async def get_asset_record(self, asset_project_id: str, asset_name: str):
 
         record = await self.collection.find_one({
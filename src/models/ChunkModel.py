@@ -2,8 +2,11 @@ from .BaseDataModel import BaseDataModel
 from .db_schemes import DataChunk
 from .enums.DataBaseEnum import DataBaseEnum
 from bson.objectid import ObjectId
-from pymongo import InsertOne
+from pymongo import UpdateOne
+import asyncio
+from helpers.tracing import trace_methods
 
+@trace_methods("mongo.chunks")
 class ChunkModel(BaseDataModel):
 
     def __init__(self, db_client: object):
@@ -18,15 +21,20 @@ class ChunkModel(BaseDataModel):
 
     async def init_collection(self):
         all_collections = await self.db_client.list_collection_names()
-        if DataBaseEnum.COLLECTION_CHUNK_NAME.value not in all_collections:
-            self.collection = self.db_client[DataBaseEnum.COLLECTION_CHUNK_NAME.value]
-            indexes = DataChunk.get_indexes()
-            for index in indexes:
-                await self.collection.create_index(
-                    index["key"],
-                    name=index["name"],
-                    unique=index["unique"]
-                )
+        existing_indexes = {}
+        if DataBaseEnum.COLLECTION_CHUNK_NAME.value in all_collections:
+            # indexes added since the collection was created are built on the next startup
+            existing_indexes = await self.collection.index_information()
+
+        indexes = DataChunk.get_indexes()
+        for index in indexes:
+            if index["name"] in existing_indexes:
+                continue
+            await self.collection.create_index(
+                index["key"],
+                name=index["name"],
+                unique=index["unique"]
+            )
 
     async def create_chunk(self, chunk: DataChunk):
         result = await self.collection.insert_one(chunk.dict(by_alias=True, exclude_unset=True))
@@ -43,19 +51,38 @@ class ChunkModel(BaseDataModel):
         
         return DataChunk(**result)
 
-    async def insert_many_chunks(self, chunks: list, batch_size: int=100):
+    async def insert_many_chunks(self, chunks: list, batch_size: int=1000, max_in_flight: int=4):
+        return await self.insert_chunk_documents(
+            documents=[ chunk.to_document() for chunk in chunks ],
+            batch_size=batch_size,
+            max_in_flight=max_in_flight,
+        )
 
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i+batch_size]
+    async def insert_chunk_documents(self, documents: list, batch_size: int=1000, max_in_flight: int=4):
+        """Bulk insert chunk documents that are already valid (``DataChunk.to_document``).
 
-            operations = [
-                InsertOne(chunk.dict(by_alias=True, exclude_unset=True))
-                for chunk in batch
-            ]
+        Batches are unordered ``insert_many`` calls with up to ``max_in_flight``
+        of them running at once, so they may land in any order. Missing ids are
+        assigned here, in the order of ``documents``, and readers sort by
+        ``_id`` to get that order back.
+        """
+        for document in documents:
+            if "_id" not in document:
+                document["_id"] = ObjectId()
 
-            await self.collection.bulk_write(operations)
-        
-        return len(chunks)
+        semaphore = asyncio.Semaphore(max_in_flight)
+
+        async def insert_batch(batch: list):
+            async with semaphore:
+                result = await self.collection.insert_many(batch, ordered=False)
+            return len(result.inserted_ids)
+
+        inserted = await asyncio.gather(*[
+            insert_batch(documents[i:i+batch_size])
+            for i in range(0, len(documents), batch_size)
+        ])
+
+        return sum(inserted)
 
     async def delete_chunks_by_project_id(self, project_id: ObjectId):
         result = await self.collection.delete_many({
@@ -64,15 +91,157 @@ class ChunkModel(BaseDataModel):
 
         return result.deleted_count
     
-    async def get_project_chunks(self, project_id: ObjectId, page_no: int=1, page_size: int=50):
-        records = await self.collection.find({
+    async def get_project_chunks(self, project_id: ObjectId, page_no: int=1, page_size: int=50,
+                                 after_id: ObjectId=None):
+        """Page through the chunks of a project in ``_id`` order.
+
+        With ``after_id``, the id of the last chunk of the previous page, the
+        page starts right after it instead of skipping ``page_no - 1`` pages,
+        so reading every page costs one index seek each.
+        """
+        if after_id is not None:
+            cursor = self.collection.find({
+                        "chunk_project_id": project_id,
+                        "_id": {"$gt": after_id},
+                    }).sort("_id", 1)
+        else:
+            cursor = self.collection.find({
+                        "chunk_project_id": project_id
+                    }).sort("_id", 1).skip(
+                        (page_no-1) * page_size
+                    )
+
+        records = await cursor.limit(page_size).to_list(length=None)
+
+        return [
+            DataChunk(**record)
+            for record in records
+        ]
+
+    async def sample_project_chunks(self, project_id: ObjectId, sample_size: int):
+        records = await self.collection.aggregate([
+                    {"$match": {"chunk_project_id": project_id}},
+                    {"$sample": {"size": sample_size}},
+                ]).to_list(length=None)
+
+        return [
+            DataChunk(**record)
+            for record in records
+        ]
+
+    async def iter_project_chunks(self, project_id: ObjectId, batch_size: int=1000):
+        """Yield the chunks of a project in lists of ``batch_size``, reading them with one cursor."""
+        cursor = self.collection.find({
                     "chunk_project_id": project_id
-                }).skip(
-                    (page_no-1) * page_size
-                ).limit(page_size).to_list(length=None)
+                }).sort("_id", 1).batch_size(batch_size)
+
+        batch = []
+        async for record in cursor:
+            batch.append(DataChunk(**record))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    async def iter_project_chunk_minhashes(self, project_id: ObjectId, params: str, batch_size: int=1000):
+        """Yield the ``{"_id", "chunk_minhash"}`` records of the project's chunks whose signature was
+        computed with ``params``, in lists of ``batch_size`` read with one cursor."""
+        cursor = self.collection.find({
+                    "chunk_project_id": project_id,
+                    "chunk_minhash.params": params,
+                }, {"chunk_minhash": 1}).batch_size(batch_size)
+
+        batch = []
+        async for record in cursor:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    async def iter_project_chunks_without_minhash(self, project_id: ObjectId, params: str, batch_size: int=1000):
+        """Yield the project's chunks without a signature computed with ``params``, in lists of ``batch_size``."""
+        cursor = self.collection.find({
+                    "chunk_project_id": project_id,
+                    "chunk_minhash.params": {"$ne": params},
+                }).batch_size(batch_size)
+
+        batch = []
+        async for record in cursor:
+            batch.append(DataChunk(**record))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    async def update_chunks_minhash(self, minhashes: dict, batch_size: int=1000):
+        """Store near duplicate signatures, ``minhashes`` maps chunk ids to ``dump_signature`` results."""
+        items = list(minhashes.items())
+
+        for i in range(0, len(items), batch_size):
+            operations = [
+                UpdateOne({"_id": chunk_id}, {"$set": {"chunk_minhash": minhash}})
+                for chunk_id, minhash in items[i:i+batch_size]
+            ]
+
+            await self.collection.bulk_write(operations, ordered=False)
+
+        return len(items)
+
+    async def get_asset_chunks(self, asset_id: ObjectId):
+        records = await self.collection.find({
+                    "chunk_asset_id": asset_id
+                }).sort("chunk_order", 1).to_list(length=None)
 
         return [
             DataChunk(**record)
             for record in records
         ]
 
+    async def get_chunks_by_ids(self, project_id: ObjectId, chunk_ids: list):
+        records = await self.collection.find({
+                    "_id": {"$in": [ ObjectId(chunk_id) for chunk_id in chunk_ids ]},
+                    "chunk_project_id": project_id,
+                }).to_list(length=None)
+
+        return [
+            DataChunk(**record)
+            for record in records
+        ]
+
+    async def delete_chunks_by_ids(self, chunk_ids: list):
+        if not chunk_ids:
+            return 0
+
+        result = await self.collection.delete_many({
+            "_id": {"$in": [ ObjectId(chunk_id) for chunk_id in chunk_ids ]}
+        })
+
+        return result.deleted_count
+
+    async def update_chunks_order(self, chunks: list, batch_size: int=100):
+
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i:i+batch_size]
+
+            operations = [
+                UpdateOne(
+                    {"_id": chunk.id},
+                    {"$set": {
+                        "chunk_order": chunk.chunk_order,
+                        "chunk_metadata": chunk.chunk_metadata,
+                        "chunk_hash": chunk.chunk_hash,
+                    }}
+                )
+                for chunk in batch
+            ]
+
+            await self.collection.bulk_write(operations)
+
+        return len(chunks)
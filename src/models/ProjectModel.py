@@ -3,7 +3,9 @@ from .db_schemes import Project
 from .enums.DataBaseEnum import DataBaseEnum
 from pymongo.errors import PyMongoError
 from typing import List, Tuple, Optional
+from helpers.tracing import trace_methods
 
+@trace_methods("mongo.projects")
 class ProjectModel(BaseDataModel):
     """
     Model to handle project-related database operations.
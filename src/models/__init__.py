@@ -1,3 +1,3 @@
 from .enums.ResponseEnums import ResponseSignal
 from .enums.ProcessingEnum import ProcessingEnum
-
+from .enums.TextSplitterEnum import TextSplitterEnum, LengthUnitEnum
@@ -9,10 +9,30 @@ class DataChunk(BaseModel):
     chunk_order: int = Field(..., gt=0)
     chunk_project_id: ObjectId
     chunk_asset_id: ObjectId
+    chunk_hash: Optional[str] = None
+    chunk_minhash: Optional[dict] = None
 
     class Config:
         arbitrary_types_allowed = True
 
+    def to_document(self) -> dict:
+        """Mongo document of the chunk, the fields ``dict(by_alias=True, exclude_unset=True)``
+        would give for a chunk built by the app, without the pydantic serializer."""
+        document = {
+            "chunk_text": self.chunk_text,
+            "chunk_metadata": self.chunk_metadata,
+            "chunk_order": self.chunk_order,
+            "chunk_project_id": self.chunk_project_id,
+            "chunk_asset_id": self.chunk_asset_id,
+        }
+        if self.id is not None:
+            document["_id"] = self.id
+        if self.chunk_hash is not None:
+            document["chunk_hash"] = self.chunk_hash
+        if self.chunk_minhash is not None:
+            document["chunk_minhash"] = self.chunk_minhash
+        return document
+
     @classmethod
     def get_indexes(cls):
         return [
@@ -22,6 +42,22 @@ class DataChunk(BaseModel):
                 ],
                 "name": "chunk_project_id_index_1",
                 "unique": False
+            },
+            {
+                # project chunks are read in _id order
+                "key": [
+                    ("chunk_project_id", 1),
+                    ("_id", 1)
+                ],
+                "name": "chunk_project_id_id_index_1",
+                "unique": False
+            },
+            {
+                "key": [
+                    ("chunk_asset_id", 1)
+                ],
+                "name": "chunk_asset_id_index_1",
+                "unique": False
             }
         ]
     
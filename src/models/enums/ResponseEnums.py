@@ -14,6 +14,7 @@ class ResponseSignal(Enum):
     PROJECT_NOT_FOUND_ERROR = "project_not_found"
     INSERT_INTO_VECTORDB_ERROR = "insert_into_vectordb_error"
     INSERT_INTO_VECTORDB_SUCCESS = "insert_into_vectordb_success"
+    VECTORDB_LEGACY_POINT_IDS = "vectordb_legacy_point_ids_reset_required"
     VECTORDB_COLLECTION_RETRIEVED = "vectordb_collection_retrieved"
     VECTORDB_SEARCH_ERROR = "vectordb_search_error"
     VECTORDB_SEARCH_SUCCESS = "vectordb_search_success"
@@ -23,4 +24,10 @@ class ResponseSignal(Enum):
     SUMMARY_GENERATION_SUCCESS = "summary_generation_success"
     TRANSLATION_SUCCESS = "translation_success"
     TRANSLATION_ERROR = "translation_error"
-    
\ No newline at end of file
+    INGESTION_SUCCESS = "ingestion_success"
+    INGESTION_FAILED = "ingestion_failed"
+    EMBEDDING_PROJECTION_FITTED = "embedding_projection_fitted"
+    EMBEDDING_PROJECTION_ERROR = "embedding_projection_error"
+    SNAPSHOT_EXPORT_FAILED = "snapshot_export_failed"
+    SNAPSHOT_IMPORT_SUCCESS = "snapshot_import_success"
+    SNAPSHOT_IMPORT_FAILED = "snapshot_import_failed"
@@ -0,0 +1,11 @@
+from enum import Enum
+
+class TextSplitterEnum(Enum):
+
+    RECURSIVE = "recursive"
+    SENTENCE = "sentence"
+
+class LengthUnitEnum(Enum):
+
+    CHAR = "char"
+    TOKEN = "token"
@@ -1,17 +1,25 @@
-from fastapi import FastAPI, APIRouter, Depends, UploadFile, status, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, Depends, UploadFile, status, Request, Form
+from fastapi.responses import ORJSONResponse, FileResponse
+from starlette.background import BackgroundTask
+import asyncio
 import os
 from helpers.config import get_settings, Settings
-from controllers import DataController, ProjectController, ProcessController
+from controllers import (DataController, ProjectController, ProcessController, NLPController, IngestController,
+                         SnapshotController)
+from controllers.SnapshotController import SnapshotError
 import aiofiles
-from models import ResponseSignal
+from models import ResponseSignal, TextSplitterEnum, LengthUnitEnum
 import logging
+from helpers.metrics import track_job, CHUNKS_PROCESSED
 from .schemes.data import ProcessRequest
 from models.ProjectModel import ProjectModel
 from models.ChunkModel import ChunkModel
 from models.AssetModel import AssetModel
-from models.db_schemes import DataChunk, Asset
+from models.db_schemes import DataChunk, Asset, Project
 from models.enums.AssetTypeEnum import AssetTypeEnum
+from helpers.container import (get_project_model, get_chunk_model, get_asset_model,
+                               get_data_controller, get_project_controller, get_nlp_controller,
+                               get_snapshot_controller)
 
 logger = logging.getLogger('uvicorn.error')
 
@@ -20,33 +28,27 @@ data_router = APIRouter(
     tags=["api_v1", "data"],
 )
 
-@data_router.post("/upload/{project_id}")
-async def upload_data(request: Request, project_id: str, file: UploadFile,
-                      app_settings: Settings = Depends(get_settings)):
-        
-    
-    project_model = await ProjectModel.create_instance(
-        db_client=request.app.db_client
-    )
+async def store_uploaded_file(project: Project, project_id: str, file: UploadFile,
+                              app_settings: Settings, data_controller: DataController,
+                              project_controller: ProjectController, asset_model: AssetModel):
+    """Validate and save an uploaded file and register it as a project asset.
 
-    project = await project_model.get_project_or_create_one(
-        project_id=project_id
-    )
+    Returns:
+        tuple: (asset record, None) on success, (None, error ORJSONResponse) otherwise.
+    """
 
     # validate the file properties
-    data_controller = DataController()
-
     is_valid, result_signal = data_controller.validate_uploaded_file(file=file)
 
     if not is_valid:
-        return JSONResponse(
+        return None, ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
                 "signal": result_signal
             }
         )
 
-    project_dir_path = ProjectController().get_project_path(project_id=project_id)
+    project_dir_path = project_controller.get_project_path(project_id=project_id)
     file_path, file_id = data_controller.generate_unique_filepath(
         orig_file_name=file.filename,
         project_id=project_id
@@ -60,7 +62,7 @@ async def upload_data(request: Request, project_id: str, file: UploadFile,
 
         logger.error(f"Error while uploading file: {e}")
 
-        return JSONResponse(
+        return None, ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
                 "signal": ResponseSignal.FILE_UPLOAD_FAILED.value
@@ -68,10 +70,6 @@ async def upload_data(request: Request, project_id: str, file: UploadFile,
         )
 
     # store the assets into the database
-    asset_model = await AssetModel.create_instance(
-        db_client=request.app.db_client
-    )
-
     asset_resource = Asset(
         asset_project_id=project.id,
         asset_type=AssetTypeEnum.FILE.value,
@@ -81,32 +79,135 @@ async def upload_data(request: Request, project_id: str, file: UploadFile,
 
     asset_record = await asset_model.create_asset(asset=asset_resource)
 
-    return JSONResponse(
+    return asset_record, None
+
+@data_router.post("/upload/{project_id}")
+async def upload_data(request: Request, project_id: str, file: UploadFile,
+                      app_settings: Settings = Depends(get_settings),
+                      project_model: ProjectModel = Depends(get_project_model),
+                      asset_model: AssetModel = Depends(get_asset_model),
+                      data_controller: DataController = Depends(get_data_controller),
+                      project_controller: ProjectController = Depends(get_project_controller)):
+        
+    
+    project = await project_model.get_project_or_create_one(
+        project_id=project_id
+    )
+
+    asset_record, error_response = await store_uploaded_file(
+        project=project, project_id=project_id, file=file, app_settings=app_settings,
+        data_controller=data_controller, project_controller=project_controller,
+        asset_model=asset_model
+    )
+
+    if error_response:
+        return error_response
+
+    return ORJSONResponse(
             content={
                 "signal": ResponseSignal.FILE_UPLOAD_SUCCESS.value,
                 "file_id": str(asset_record.asset_name),
             }
         )
 
+@data_router.post("/ingest/{project_id}")
+@track_job("ingest")
+async def ingest_endpoint(request: Request, project_id: str, file: UploadFile,
+                          chunk_size: int = Form(default=100, gt=0),
+                          overlap_size: int = Form(default=20, ge=0),
+                          splitter: TextSplitterEnum = Form(default=TextSplitterEnum.RECURSIVE),
+                          length_unit: LengthUnitEnum = Form(default=LengthUnitEnum.CHAR),
+                          do_dedup: int = Form(default=1),
+                          app_settings: Settings = Depends(get_settings),
+                          project_model: ProjectModel = Depends(get_project_model),
+                          chunk_model: ChunkModel = Depends(get_chunk_model),
+                          asset_model: AssetModel = Depends(get_asset_model),
+                          data_controller: DataController = Depends(get_data_controller),
+                          project_controller: ProjectController = Depends(get_project_controller),
+                          nlp_controller: NLPController = Depends(get_nlp_controller)):
+    """
+    Upload, process and index a file in one call.
+
+    Parsing, splitting, chunk insertion, embedding and vector db upserts run
+    as overlapping pipeline stages; the response reports per-stage throughput.
+    """
+
+    if overlap_size >= chunk_size:
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.PROCESSING_FAILED.value,
+                "error": "overlap_size must be smaller than chunk_size",
+            }
+        )
+
+    project = await project_model.get_project_or_create_one(
+        project_id=project_id
+    )
+
+    asset_record, error_response = await store_uploaded_file(
+        project=project, project_id=project_id, file=file, app_settings=app_settings,
+        data_controller=data_controller, project_controller=project_controller,
+        asset_model=asset_model
+    )
+
+    if error_response:
+        return error_response
+
+    ingest_controller = IngestController(
+        process_controller=ProcessController(project_id=project_id),
+        nlp_controller=nlp_controller,
+        chunk_model=chunk_model,
+    )
+
+    try:
+        ingest_result = await ingest_controller.ingest_file(
+            project=project,
+            asset_id=asset_record.id,
+            file_id=asset_record.asset_name,
+            chunk_size=chunk_size,
+            overlap_size=overlap_size,
+            splitter=splitter.value,
+            length_unit=length_unit.value,
+            dedup=do_dedup == 1,
+        )
+    except Exception as e:
+        logger.error(f"Error while ingesting file {asset_record.asset_name}: {e}")
+        ingest_result = None
+
+    if not ingest_result:
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.INGESTION_FAILED.value,
+                "file_id": str(asset_record.asset_name),
+            }
+        )
+
+    return ORJSONResponse(
+        content={
+            "signal": ResponseSignal.INGESTION_SUCCESS.value,
+            "file_id": str(asset_record.asset_name),
+            **ingest_result,
+        }
+    )
+
 @data_router.post("/process/{project_id}")
-async def process_endpoint(request: Request, project_id: str, process_request: ProcessRequest):
+@track_job("process")
+async def process_endpoint(request: Request, project_id: str, process_request: ProcessRequest,
+                           project_model: ProjectModel = Depends(get_project_model),
+                           chunk_model: ChunkModel = Depends(get_chunk_model),
+                           asset_model: AssetModel = Depends(get_asset_model)):
 
     chunk_size = process_request.chunk_size
     overlap_size = process_request.overlap_size
     do_reset = process_request.do_reset
-
-    project_model = await ProjectModel.create_instance(
-        db_client=request.app.db_client
-    )
+    do_diff = process_request.do_diff
 
     project = await project_model.get_project_or_create_one(
         project_id=project_id
     )
 
-    asset_model = await AssetModel.create_instance(
-            db_client=request.app.db_client
-        )
-
     project_files_ids = {}
     if process_request.file_id:
         asset_record = await asset_model.get_asset_record(
@@ -115,7 +216,7 @@ async def process_endpoint(request: Request, project_id: str, process_request: P
         )
 
         if asset_record is None:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
                     "signal": ResponseSignal.FILE_ID_ERROR.value,
@@ -140,7 +241,7 @@ async def process_endpoint(request: Request, project_id: str, process_request: P
         }
 
     if len(project_files_ids) == 0:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
                 "signal": ResponseSignal.NO_FILES_ERROR.value,
@@ -152,15 +253,31 @@ async def process_endpoint(request: Request, project_id: str, process_request: P
     no_records = 0
     no_files = 0
 
-    chunk_model = await ChunkModel.create_instance(
-                        db_client=request.app.db_client
-                    )
-
     if do_reset == 1:
         _ = await chunk_model.delete_chunks_by_project_id(
             project_id=project.id
         )
 
+    # near duplicates (repeated headers, footers, disclaimers) are stored once per project
+    detector = None
+    no_duplicates = 0
+    if process_request.do_dedup == 1:
+        if do_reset == 1:
+            detector = process_controller.get_near_duplicate_detector(threshold=process_request.dedup_threshold)
+        else:
+            detector = await process_controller.load_near_duplicate_detector(
+                chunk_model=chunk_model,
+                project_id=project.id,
+                threshold=process_request.dedup_threshold,
+            )
+
+    delta = {
+        "inserted_chunk_ids": [],
+        "deleted_chunk_ids": [],
+        "reordered_chunks": 0,
+        "unchanged_chunks": 0,
+    }
+
     for asset_id, file_id in project_files_ids.items():
 
         file_content = process_controller.get_file_content(file_id=file_id)
@@ -173,11 +290,13 @@ async def process_endpoint(request: Request, project_id: str, process_request: P
             file_content=file_content,
             file_id=file_id,
             chunk_size=chunk_size,
-            overlap_size=overlap_size
+            overlap_size=overlap_size,
+            splitter=process_request.splitter.value,
+            length_unit=process_request.length_unit.value,
         )
 
         if file_chunks is None or len(file_chunks) == 0:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
                     "signal": ResponseSignal.PROCESSING_FAILED.value
@@ -190,18 +309,158 @@ async def process_endpoint(request: Request, project_id: str, process_request: P
                 chunk_metadata=chunk.metadata,
                 chunk_order=i+1,
                 chunk_project_id=project.id,
-                chunk_asset_id=asset_id
+                chunk_asset_id=asset_id,
+                chunk_hash=process_controller.get_chunk_hash(chunk.page_content),
             )
             for i, chunk in enumerate(file_chunks)
         ]
 
-        no_records += await chunk_model.insert_many_chunks(chunks=file_chunks_records)
+        CHUNKS_PROCESSED.labels(route="process").inc(len(file_chunks_records))
+
+        if do_diff == 1 and do_reset != 1:
+            # only touch the chunks whose text changed since the last run
+            existing_chunks = await chunk_model.get_asset_chunks(asset_id=asset_id)
+            chunks_delta = process_controller.diff_chunks(
+                existing_chunks=existing_chunks,
+                new_chunks=file_chunks_records
+            )
+
+            if detector is not None:
+                for chunk_id in chunks_delta["deleted"]:
+                    detector.remove(chunk_id)
+
+                inserted = await asyncio.to_thread(process_controller.drop_near_duplicates,
+                                                   detector, chunks_delta["inserted"])
+                no_duplicates += len(chunks_delta["inserted"]) - len(inserted)
+                chunks_delta["inserted"] = inserted
+
+            _ = await chunk_model.delete_chunks_by_ids(chunk_ids=chunks_delta["deleted"])
+            _ = await chunk_model.update_chunks_order(chunks=chunks_delta["reordered"])
+            no_records += await chunk_model.insert_many_chunks(chunks=chunks_delta["inserted"])
+
+            delta["inserted_chunk_ids"].extend(str(chunk.id) for chunk in chunks_delta["inserted"])
+            delta["deleted_chunk_ids"].extend(str(chunk_id) for chunk_id in chunks_delta["deleted"])
+            delta["reordered_chunks"] += len(chunks_delta["reordered"])
+            delta["unchanged_chunks"] += chunks_delta["unchanged"]
+        else:
+            if detector is not None:
+                kept_chunks_records = await asyncio.to_thread(process_controller.drop_near_duplicates,
+                                                              detector, file_chunks_records)
+                no_duplicates += len(file_chunks_records) - len(kept_chunks_records)
+                file_chunks_records = kept_chunks_records
+
+            no_records += await chunk_model.insert_many_chunks(chunks=file_chunks_records)
+
         no_files += 1
 
-    return JSONResponse(
+    response_content = {
+        "signal": ResponseSignal.PROCESSING_SUCCESS.value,
+        "inserted_chunks": no_records,
+        "duplicate_chunks": no_duplicates,
+        "processed_files": no_files
+    }
+
+    if do_diff == 1 and do_reset != 1:
+        response_content["delta"] = delta
+
+    return ORJSONResponse(
+        content=response_content
+    )
+
+def remove_file(file_path: str):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+@data_router.get("/export/{project_id}")
+@track_job("export")
+async def export_endpoint(request: Request, project_id: str,
+                          project_model: ProjectModel = Depends(get_project_model),
+                          snapshot_controller: SnapshotController = Depends(get_snapshot_controller)):
+    """
+    Download a snapshot of the project: assets metadata, chunks and their vectors.
+
+    The archive is written to a temporary file, sent, then removed.
+    """
+
+    project = await project_model.get_project_or_create_one(
+        project_id=project_id
+    )
+
+    archive_path = snapshot_controller.get_snapshot_path(project_id=project_id)
+
+    try:
+        await snapshot_controller.export_project(project=project, archive_path=archive_path)
+    except Exception as e:
+        logger.error(f"Error while exporting project {project_id}: {e}")
+        remove_file(archive_path)
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.SNAPSHOT_EXPORT_FAILED.value
+            }
+        )
+
+    return FileResponse(
+        archive_path,
+        media_type="application/x-tar",
+        filename=f"{project_id}.snapshot.tar",
+        background=BackgroundTask(remove_file, archive_path),
+    )
+
+@data_router.post("/import/{project_id}")
+@track_job("import")
+async def import_endpoint(request: Request, project_id: str, snapshot: UploadFile,
+                          do_reset: int = Form(default=0),
+                          app_settings: Settings = Depends(get_settings),
+                          project_model: ProjectModel = Depends(get_project_model),
+                          snapshot_controller: SnapshotController = Depends(get_snapshot_controller)):
+    """
+    Restore a snapshot into the project without any embedding call.
+
+    With ``do_reset=1`` the chunks and vectors of the project are replaced,
+    otherwise the snapshot chunks are added to them.
+    """
+
+    project = await project_model.get_project_or_create_one(
+        project_id=project_id
+    )
+
+    archive_path = snapshot_controller.get_snapshot_path(project_id=project_id)
+
+    try:
+        async with aiofiles.open(archive_path, "wb") as f:
+            while chunk := await snapshot.read(app_settings.FILE_DEFAULT_CHUNK_SIZE):
+                await f.write(chunk)
+
+        import_result = await snapshot_controller.import_project(
+            project=project,
+            archive_path=archive_path,
+            do_reset=do_reset == 1,
+        )
+    except SnapshotError as e:
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.SNAPSHOT_IMPORT_FAILED.value,
+                "error": str(e),
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error while importing a snapshot into {project_id}: {e}")
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.SNAPSHOT_IMPORT_FAILED.value
+            }
+        )
+    finally:
+        await asyncio.to_thread(remove_file, archive_path)
+
+    return ORJSONResponse(
         content={
-            "signal": ResponseSignal.PROCESSING_SUCCESS.value,
-            "inserted_chunks": no_records,
-            "processed_files": no_files
+            "signal": ResponseSignal.SNAPSHOT_IMPORT_SUCCESS.value,
+            **import_result,
         }
     )
@@ -1,15 +1,19 @@
 import time 
-from fastapi import FastAPI, APIRouter, status, Request
-from fastapi.responses import JSONResponse
-from routes.schemes.nlp import PushRequest, SearchRequest
+from fastapi import FastAPI, APIRouter, Depends, status, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from helpers.config import get_settings, Settings
+from helpers.responses import serialize_retrieved_documents
+from helpers.embedding_reduction import REDUCTION_PCA
+from routes.schemes.nlp import PushRequest, SearchRequest, SearchBatchRequest, AnswerBatchRequest, ProjectionRequest
 from models.ProjectModel import ProjectModel
 from models.ChunkModel import ChunkModel
 from controllers import NLPController
 from models import ResponseSignal
-from deep_translator import GoogleTranslator
-from fastapi import APIRouter, Request, status
-from fastapi.responses import JSONResponse
+import asyncio
 import logging
+import orjson
+from helpers.metrics import track_job
+from helpers.container import get_project_model, get_chunk_model, get_nlp_controller
 
 logger = logging.getLogger('uvicorn.error')
 
@@ -18,71 +22,140 @@ nlp_router = APIRouter(
     tags=["api_v1", "nlp"],
 )
 
-@nlp_router.post("/index/push/{project_id}")
-async def index_project(request: Request, project_id: str, push_request: PushRequest):
+async def push_project_chunks(project, chunk_model: ChunkModel, nlp_controller: NLPController,
+                              chunk_ids: list = None, target_collection_name: str = None):
+    """Index the chunks of a project page by page, only ``chunk_ids`` when given.
 
-    project_model = await ProjectModel.create_instance(
-        db_client=request.app.db_client
-    )
+    Returns the number of indexed chunks, or None when a page could not be inserted.
+    """
+    has_records = True
+    page_no = 1
+    page_size = 50
+    last_chunk_id = None
+    inserted_items_count = 0
 
-    chunk_model = await ChunkModel.create_instance(
-        db_client=request.app.db_client
-    )
+    while has_records:
+        if chunk_ids is not None:
+            # delta push: only the chunks reported by a diff reprocess
+            page_chunks_ids = chunk_ids[(page_no-1) * page_size:page_no * page_size]
+            if not page_chunks_ids:
+                break
+
+            # ids of other projects are left out, a page may come back short or empty
+            page_chunks = await chunk_model.get_chunks_by_ids(project_id=project.id,
+                                                              chunk_ids=page_chunks_ids)
+            page_no += 1
+            if not page_chunks:
+                continue
+        else:
+            page_chunks = await chunk_model.get_project_chunks(project_id=project.id, page_size=page_size,
+                                                               after_id=last_chunk_id)
+            if not page_chunks or len(page_chunks) == 0:
+                has_records = False
+                break
+
+            last_chunk_id = page_chunks[-1].id
+
+        chunks_ids = [ nlp_controller.get_chunk_vector_id(chunk.id) for chunk in page_chunks ]
+        
+        is_inserted = await asyncio.to_thread(
+            nlp_controller.index_into_vector_db,
+            project=project,
+            chunks=page_chunks,
+            chunks_ids=chunks_ids,
+            target_collection_name=target_collection_name,
+        )
+
+        if not is_inserted:
+            return None
+        
+        inserted_items_count += len(page_chunks)
+
+    return inserted_items_count
+
+@nlp_router.post("/index/push/{project_id}")
+@track_job("push")
+async def index_project(request: Request, project_id: str, push_request: PushRequest,
+                        project_model: ProjectModel = Depends(get_project_model),
+                        chunk_model: ChunkModel = Depends(get_chunk_model),
+                        nlp_controller: NLPController = Depends(get_nlp_controller)):
 
     project = await project_model.get_project_or_create_one(
         project_id=project_id
     )
 
     if not project:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
                 "signal": ResponseSignal.PROJECT_NOT_FOUND_ERROR.value
             }
         )
-    
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-        template_parser=request.app.template_parser,
-    )
 
-    has_records = True
-    page_no = 1
-    inserted_items_count = 0
-    idx = 0
+    if push_request.do_reset and push_request.chunk_ids is not None:
+        # a reset rebuilds the whole index, from a delta it would drop every other chunk
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.INSERT_INTO_VECTORDB_ERROR.value,
+                "error": "do_reset can not be combined with chunk_ids",
+            }
+        )
 
-    while has_records:
-        page_chunks = await chunk_model.get_project_chunks(project_id=project.id, page_no=page_no)
-        if len(page_chunks):
-            page_no += 1
-        
-        if not page_chunks or len(page_chunks) == 0:
-            has_records = False
-            break
+    do_reset = push_request.do_reset
+    # provider and vector db calls block while the gateway waits for a slot or
+    # backs off, so they run in worker threads instead of on the event loop
+    if not do_reset and await asyncio.to_thread(nlp_controller.has_legacy_point_ids, project=project):
+        if push_request.chunk_ids is not None or push_request.deleted_chunk_ids:
+            # a delta can not be matched to the old sequential point ids
+            return ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "signal": ResponseSignal.VECTORDB_LEGACY_POINT_IDS.value
+                }
+            )
 
-        chunks_ids =  list(range(idx, idx + len(page_chunks)))
-        idx += len(page_chunks)
-        
-        is_inserted = nlp_controller.index_into_vector_db(
+        # pushing over the old sequential point ids would index every chunk twice
+        do_reset = 1
+
+    if push_request.deleted_chunk_ids:
+        _ = await asyncio.to_thread(
+            nlp_controller.delete_from_vector_db,
             project=project,
-            chunks=page_chunks,
-            do_reset=push_request.do_reset,
-            chunks_ids=chunks_ids
+            chunks_ids=push_request.deleted_chunk_ids
         )
 
-        if not is_inserted:
-            return JSONResponse(
+    # a full reindex is built into a shadow collection, searches keep using
+    # the live one until the alias is switched to it
+    shadow_collection_name = None
+    if do_reset:
+        shadow_collection_name = await asyncio.to_thread(nlp_controller.create_shadow_collection, project=project)
+
+    try:
+        inserted_items_count = await push_project_chunks(project, chunk_model, nlp_controller,
+                                                         chunk_ids=push_request.chunk_ids,
+                                                         target_collection_name=shadow_collection_name)
+
+        if inserted_items_count is None:
+            if shadow_collection_name is not None:
+                await asyncio.to_thread(nlp_controller.drop_shadow_collection,
+                                        collection_name=shadow_collection_name)
+            return ORJSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
                     "signal": ResponseSignal.INSERT_INTO_VECTORDB_ERROR.value
                 }
             )
+    except Exception:
+        if shadow_collection_name is not None:
+            await asyncio.to_thread(nlp_controller.drop_shadow_collection, collection_name=shadow_collection_name)
+        raise
+
+    if shadow_collection_name is not None:
+        await asyncio.to_thread(nlp_controller.promote_shadow_collection,
+                                project=project, collection_name=shadow_collection_name)
         
-        inserted_items_count += len(page_chunks)
-        
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "signal": ResponseSignal.INSERT_INTO_VECTORDB_SUCCESS.value,
             "inserted_items_count": inserted_items_count
@@ -90,102 +163,191 @@ async def index_project(request: Request, project_id: str, push_request: PushReq
     )
 
 @nlp_router.get("/index/info/{project_id}")
-async def get_project_index_info(request: Request, project_id: str):
+async def get_project_index_info(request: Request, project_id: str,
+                                 project_model: ProjectModel = Depends(get_project_model),
+                                 nlp_controller: NLPController = Depends(get_nlp_controller)):
     
-    project_model = await ProjectModel.create_instance(
-        db_client=request.app.db_client
+    project = await project_model.get_project_or_create_one(
+        project_id=project_id
     )
 
+    collection_info = await asyncio.to_thread(nlp_controller.get_vector_db_collection_info, project=project)
+    # resolving the live collection of the projection is a vector db call too
+    embedding_projection = await asyncio.to_thread(nlp_controller.get_embedding_projection_info, project=project)
+
+    return ORJSONResponse(
+        content={
+            "signal": ResponseSignal.VECTORDB_COLLECTION_RETRIEVED.value,
+            "collection_info": collection_info,
+            "embedding_projection": embedding_projection,
+        }
+    )
+
+@nlp_router.post("/index/projection/{project_id}")
+@track_job("projection")
+async def fit_embedding_projection(request: Request, project_id: str, projection_request: ProjectionRequest,
+                                   project_model: ProjectModel = Depends(get_project_model),
+                                   chunk_model: ChunkModel = Depends(get_chunk_model),
+                                   nlp_controller: NLPController = Depends(get_nlp_controller)):
+    """Fit the PCA projection of a project's embeddings and reindex the project with it.
+
+    The new index is built next to the live one, searches use the old
+    projection and vectors until it replaces them.
+    """
+    if nlp_controller.embedding_reducer is None or nlp_controller.embedding_reducer.method != REDUCTION_PCA:
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.EMBEDDING_PROJECTION_ERROR.value,
+                "error": "EMBEDDING_REDUCTION is not set to pca",
+            }
+        )
+
     project = await project_model.get_project_or_create_one(
         project_id=project_id
     )
 
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-        template_parser=request.app.template_parser,
-    )
+    chunks = await chunk_model.sample_project_chunks(project_id=project.id,
+                                                     sample_size=projection_request.sample_size)
+
+    if len(chunks) <= nlp_controller.embedding_reducer.dimension:
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.EMBEDDING_PROJECTION_ERROR.value,
+                "error": f"PCA to {nlp_controller.embedding_reducer.dimension} dimensions needs more "
+                         f"than {nlp_controller.embedding_reducer.dimension} chunks, {len(chunks)} sampled",
+            }
+        )
 
-    collection_info = nlp_controller.get_vector_db_collection_info(project=project)
+    shadow_collection_name = await asyncio.to_thread(nlp_controller.create_shadow_collection, project=project)
 
-    return JSONResponse(
+    try:
+        projection_info = await asyncio.to_thread(nlp_controller.fit_embedding_projection,
+                                                  project=project, chunks=chunks,
+                                                  collection_name=shadow_collection_name)
+
+        if projection_info is None:
+            await asyncio.to_thread(nlp_controller.drop_shadow_collection, collection_name=shadow_collection_name)
+            return ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "signal": ResponseSignal.EMBEDDING_PROJECTION_ERROR.value
+                }
+            )
+
+        inserted_items_count = await push_project_chunks(project, chunk_model, nlp_controller,
+                                                         target_collection_name=shadow_collection_name)
+
+        if inserted_items_count is None:
+            await asyncio.to_thread(nlp_controller.drop_shadow_collection, collection_name=shadow_collection_name)
+            return ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "signal": ResponseSignal.INSERT_INTO_VECTORDB_ERROR.value
+                }
+            )
+    except Exception:
+        await asyncio.to_thread(nlp_controller.drop_shadow_collection, collection_name=shadow_collection_name)
+        raise
+
+    await asyncio.to_thread(nlp_controller.promote_shadow_collection,
+                            project=project, collection_name=shadow_collection_name)
+
+    return ORJSONResponse(
         content={
-            "signal": ResponseSignal.VECTORDB_COLLECTION_RETRIEVED.value,
-            "collection_info": collection_info
+            "signal": ResponseSignal.EMBEDDING_PROJECTION_FITTED.value,
+            "embedding_projection": projection_info,
+            "sample_size": len(chunks),
+            "inserted_items_count": inserted_items_count,
         }
     )
 
 @nlp_router.post("/index/search/{project_id}")
-async def search_index(request: Request, project_id: str, search_request: SearchRequest):
+async def search_index(request: Request, project_id: str, search_request: SearchRequest,
+                       project_model: ProjectModel = Depends(get_project_model),
+                       nlp_controller: NLPController = Depends(get_nlp_controller)):
     
-    project_model = await ProjectModel.create_instance(
-        db_client=request.app.db_client
-    )
-
     project = await project_model.get_project_or_create_one(
         project_id=project_id
     )
 
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-        template_parser=request.app.template_parser,
-    )
-
-    results = nlp_controller.search_vector_db_collection(
+    results = await asyncio.to_thread(
+        nlp_controller.search_vector_db_collection,
         project=project, text=search_request.text, limit=search_request.limit
     )
 
     if not results:
-        return JSONResponse(
+        return ORJSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
                     "signal": ResponseSignal.VECTORDB_SEARCH_ERROR.value
                 }
             )
     
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "signal": ResponseSignal.VECTORDB_SEARCH_SUCCESS.value,
-            "results": [ result.dict()  for result in results ]
+            "results": serialize_retrieved_documents(results)
         }
     )
 
-@nlp_router.post("/index/answer/{project_id}")
-async def answer_rag(request: Request, project_id: str, search_request: SearchRequest):
-    
-    project_model = await ProjectModel.create_instance(
-        db_client=request.app.db_client
-    )
+@nlp_router.post("/index/search-batch/{project_id}")
+async def search_index_batch(request: Request, project_id: str, search_request: SearchBatchRequest,
+                             project_model: ProjectModel = Depends(get_project_model),
+                             nlp_controller: NLPController = Depends(get_nlp_controller)):
 
     project = await project_model.get_project_or_create_one(
         project_id=project_id
     )
 
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-        template_parser=request.app.template_parser,
+    # embedding up to 256 texts and the batched search must not block the event loop
+    results = await asyncio.to_thread(
+        nlp_controller.search_vector_db_collection_batch,
+        project=project, texts=search_request.texts, limit=search_request.limit
+    )
+
+    if results is False:
+        return ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "signal": ResponseSignal.VECTORDB_SEARCH_ERROR.value
+                }
+            )
+
+    # one list per query, in the order of the request texts
+    return ORJSONResponse(
+        content={
+            "signal": ResponseSignal.VECTORDB_SEARCH_SUCCESS.value,
+            "results": [ serialize_retrieved_documents(documents) for documents in results ]
+        }
+    )
+
+@nlp_router.post("/index/answer/{project_id}")
+async def answer_rag(request: Request, project_id: str, search_request: SearchRequest,
+                     project_model: ProjectModel = Depends(get_project_model),
+                     nlp_controller: NLPController = Depends(get_nlp_controller)):
+    
+    project = await project_model.get_project_or_create_one(
+        project_id=project_id
     )
 
-    answer, full_prompt, chat_history = nlp_controller.answer_rag_question(
+    answer, full_prompt, chat_history = await asyncio.to_thread(
+        nlp_controller.answer_rag_question,
         project=project,
         query=search_request.text,
         limit=search_request.limit,
     )
 
     if not answer:
-        return JSONResponse(
+        return ORJSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
                     "signal": ResponseSignal.RAG_ANSWER_ERROR.value
                 }
         )
     
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "signal": ResponseSignal.RAG_ANSWER_SUCCESS.value,
             "answer": answer,
@@ -196,23 +358,66 @@ async def answer_rag(request: Request, project_id: str, search_request: SearchRe
 
 
 
-@nlp_router.post("/index/translate/{project_id}/{target_language}")
-async def translate_text(request: Request, project_id: str, target_language: str):
+@nlp_router.post("/index/answer-batch/{project_id}")
+async def answer_rag_batch(request: Request, project_id: str, answer_request: AnswerBatchRequest,
+                           app_settings: Settings = Depends(get_settings),
+                           project_model: ProjectModel = Depends(get_project_model),
+                           nlp_controller: NLPController = Depends(get_nlp_controller)):
+    """
+    Answer a list of questions about one project.
+    The questions are retrieved with one batched search, answered concurrently
+    and streamed back as NDJSON, one line per question in completion order.
+    """
 
-    project_model = await ProjectModel.create_instance(
-        db_client=request.app.db_client
+    project = await project_model.get_project_or_create_one(
+        project_id=project_id
     )
 
-    chunk_model = await ChunkModel.create_instance(
-        db_client=request.app.db_client
+    retrieved_documents = await asyncio.to_thread(
+        nlp_controller.search_vector_db_collection_batch,
+        project=project, texts=answer_request.texts, limit=answer_request.limit
     )
 
+    if retrieved_documents is False:
+        return ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "signal": ResponseSignal.VECTORDB_SEARCH_ERROR.value
+                }
+            )
+
+    async def answer_lines():
+        results = nlp_controller.answer_rag_questions(
+            queries=answer_request.texts,
+            retrieved_documents=retrieved_documents,
+            concurrency=app_settings.RAG_BATCH_CONCURRENCY,
+        )
+        try:
+            async for result in results:
+                if not answer_request.include_prompts:
+                    result.pop("full_prompt")
+                    result.pop("chat_history")
+
+                signal = ResponseSignal.RAG_ANSWER_SUCCESS if result["answer"] else ResponseSignal.RAG_ANSWER_ERROR
+                yield orjson.dumps({"signal": signal.value, **result}) + b"\n"
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(answer_lines(), media_type="application/x-ndjson")
+
+
+@nlp_router.post("/index/translate/{project_id}/{target_language}")
+@track_job("translate")
+async def translate_text(request: Request, project_id: str, target_language: str,
+                         project_model: ProjectModel = Depends(get_project_model),
+                         chunk_model: ChunkModel = Depends(get_chunk_model)):
+
     project = await project_model.get_project_or_create_one(
         project_id=project_id
     )
 
     if not project:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
                 "signal": ResponseSignal.PROJECT_NOT_FOUND_ERROR.value
@@ -220,12 +425,12 @@ async def translate_text(request: Request, project_id: str, target_language: str
         )
 
     has_records = True
-    page_no = 1
+    last_chunk_id = None
     page_chunks_list = []
     while has_records:
-        page_chunks = await chunk_model.get_project_chunks(project_id=project.id, page_no=page_no)
+        page_chunks = await chunk_model.get_project_chunks(project_id=project.id, after_id=last_chunk_id)
         if len(page_chunks):
-            page_no += 1
+            last_chunk_id = page_chunks[-1].id
         
         page_chunks_list.extend(page_chunks)
         
@@ -238,6 +443,8 @@ async def translate_text(request: Request, project_id: str, target_language: str
     
     # Translate the text
     try:
+        from deep_translator import GoogleTranslator
+
         translate_text = ""
         for i in range(0, len(full_text), 4000):
             translated_text = GoogleTranslator(source="auto", target=target_language).translate(full_text[i:i+4000])
@@ -245,7 +452,7 @@ async def translate_text(request: Request, project_id: str, target_language: str
             # sleep for 1 sec
             time.sleep(1)
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "signal": ResponseSignal.TRANSLATION_ERROR.value,
@@ -253,7 +460,7 @@ async def translate_text(request: Request, project_id: str, target_language: str
             }
         )
     
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "signal": ResponseSignal.TRANSLATION_SUCCESS.value,
             "translation": translate_text
@@ -262,45 +469,34 @@ async def translate_text(request: Request, project_id: str, target_language: str
 
 
 @nlp_router.post("/index/summry/{project_id}")
+@track_job("summary")
 async def summry(request: Request, 
                  project_id: str,
-                 target_word_count: int):
-
-    project_model = await ProjectModel.create_instance(
-        db_client=request.app.db_client
-    )
-
-    chunk_model = await ChunkModel.create_instance(
-        db_client=request.app.db_client
-    )
+                 target_word_count: int,
+                 project_model: ProjectModel = Depends(get_project_model),
+                 chunk_model: ChunkModel = Depends(get_chunk_model),
+                 nlp_controller: NLPController = Depends(get_nlp_controller)):
 
     project = await project_model.get_project_or_create_one(
         project_id=project_id
     )
 
     if not project:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
                 "signal": ResponseSignal.PROJECT_NOT_FOUND_ERROR.value
             }
         )
     
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-        template_parser=request.app.template_parser,
-    )
-
     has_records = True
-    page_no = 1
+    last_chunk_id = None
     page_chunks_list = []
     while has_records:
-        page_chunks = await chunk_model.get_project_chunks(project_id=project.id, page_no=page_no)
+        page_chunks = await chunk_model.get_project_chunks(project_id=project.id, after_id=last_chunk_id)
         print(page_chunks)
         if len(page_chunks):
-            page_no += 1
+            last_chunk_id = page_chunks[-1].id
         
         page_chunks_list.extend(page_chunks)
         
@@ -309,7 +505,7 @@ async def summry(request: Request,
             break
     
     if target_word_count > len(" ".join([chunk.chunk_text for chunk in page_chunks_list])):
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
                 "signal": ResponseSignal.SUMMARY_GENERATION_ERROR.value,
@@ -318,13 +514,14 @@ async def summry(request: Request,
         )
     
     # get the summary
-    summary = nlp_controller.summarize_text(
+    summary = await asyncio.to_thread(
+        nlp_controller.summarize_text,
         retrieved_documents=page_chunks_list,
         target_word_count=target_word_count
         
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "signal": ResponseSignal.SUMMARY_GENERATION_SUCCESS.value,
             "summary": summary
@@ -1,8 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
+from models.enums.TextSplitterEnum import TextSplitterEnum, LengthUnitEnum
 
 class ProcessRequest(BaseModel):
     file_id: str = None
-    chunk_size: Optional[int] = 100
-    overlap_size: Optional[int] = 20
+    chunk_size: int = Field(100, gt=0)
+    overlap_size: int = Field(20, ge=0)
     do_reset: Optional[int] = 0
+    do_diff: Optional[int] = 0
+    splitter: Optional[TextSplitterEnum] = TextSplitterEnum.RECURSIVE
+    length_unit: Optional[LengthUnitEnum] = LengthUnitEnum.CHAR
+    do_dedup: Optional[int] = 1
+    dedup_threshold: Optional[float] = Field(None, gt=0, le=1)
+
+    @model_validator(mode="after")
+    def validate_overlap_size(self):
+        # the splitters can not step forward when the overlap covers a whole chunk
+        if self.overlap_size >= self.chunk_size:
+            raise ValueError("overlap_size must be smaller than chunk_size")
+        return self
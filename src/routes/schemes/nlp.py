@@ -1,13 +1,36 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+from bson.objectid import ObjectId
 from typing import List, Optional
 
 class PushRequest(BaseModel):
     do_reset: Optional[int] = 0
+    chunk_ids: Optional[List[str]] = None
+    deleted_chunk_ids: Optional[List[str]] = None
+
+    @field_validator("chunk_ids", "deleted_chunk_ids")
+    def validate_chunk_ids(cls, value):
+        if value is not None:
+            invalid = [ chunk_id for chunk_id in value if not ObjectId.is_valid(chunk_id) ]
+            if invalid:
+                raise ValueError(f"invalid chunk ids: {invalid[:5]}")
+        return value
 
 class SearchRequest(BaseModel):
     text: str
     limit: Optional[int] = 5
 
+class SearchBatchRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=256)
+    limit: Optional[int] = 5
+
+class AnswerBatchRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=256)
+    limit: Optional[int] = 5
+    include_prompts: Optional[bool] = False
+
+class ProjectionRequest(BaseModel):
+    sample_size: Optional[int] = Field(2048, gt=0, le=50000)
+
 class TranslationRequest(BaseModel):
     text: str
     target_language: str
@@ -3,6 +3,8 @@ from typing import List, Optional, Dict, Any
 
 class TextToSpeechRequest(BaseModel):
     text: str = Field(..., description="The text to convert to speech", min_length=1)
+    stream: bool = Field(False, description="Return the audio itself, streamed while it is synthesized, "
+                                            "instead of a URL to fetch it from")
 
 class TextToSpeechResponse(BaseModel):
     audio_url: str = Field(..., description="URL to retrieve the generated audio")
@@ -18,6 +20,8 @@ class ChangeDetail(BaseModel):
     replacement: Optional[str] = Field(None, description="Replacement text for replaced type")
     replacement_audio_url: Optional[str] = Field(None, description="URL for the audio of replacement text")
     added_audio_url: Optional[str] = Field(None, description="URL for the audio of added text")
+    position: Optional[int] = Field(None, description="Index of the first expected word of the change")
+    similarity: Optional[float] = Field(None, description="Mean word similarity of the change, from 0 to 1")
 
 class TranscriptionResponse(BaseModel):
     transcribed_text: str = Field(..., description="The text transcribed from the audio")
@@ -1,10 +1,14 @@
 import os
+import logging
 import uuid
 from fastapi import APIRouter, Depends, File, Request, UploadFile, BackgroundTasks, HTTPException, Form
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 import io
 from typing import Dict, Any, Optional
 from controllers.VoiceController import VoiceController
+from helpers.config import get_settings, Settings
+from helpers.container import get_voice_controller, get_audio_store
+from helpers.audio_store import AudioStore, RangeNotSatisfiable, parse_range, iter_file_range
 from .schemes.voice import (
     TextToSpeechRequest,
     TextToSpeechResponse,
@@ -14,6 +18,8 @@ from .schemes.voice import (
     ErrorResponse
 )
 
+logger = logging.getLogger('uvicorn.error')
+
 voice_router = APIRouter(
     prefix="/api/v1/voice",
     tags=["Speech Processing"],
@@ -32,7 +38,8 @@ async def transcribe_audio(
     request: Request,
     audio_file: UploadFile = File(..., description="The audio file to transcribe", alias="audio_file"),
     expected_text: str = Form(..., description="The expected text to compare against"),
-    language: Optional[str] = Form(default="en", description="Language of the audio")
+    language: Optional[str] = Form(default="en", description="Language of the audio"),
+    voice_controller: VoiceController = Depends(get_voice_controller)
 ) -> TranscriptionResponse:
     """
     Transcribe audio file and compare with expected text.
@@ -45,8 +52,6 @@ async def transcribe_audio(
                 detail="Invalid file type. Please upload an audio file."
             )
         
-        voice_controller = VoiceController(generation_client=request.app.generation_client)
-
         response_data = await voice_controller.process_transcription(
             file=audio_file,
             expected_text=expected_text,
@@ -62,30 +67,49 @@ async def transcribe_audio(
     "/text-to-speech",
     response_model=TextToSpeechResponse,
     responses={
+        200: {"content": {"audio/mpeg": {}}, "description": "The audio itself when `stream` is set"},
         400: {"model": ErrorResponse},
         500: {"model": ErrorResponse}
     }
 )
-async def text_to_speech(request: Request,  tts_request: TextToSpeechRequest) -> TextToSpeechResponse:
+async def text_to_speech(request: Request,  tts_request: TextToSpeechRequest,
+                         voice_controller: VoiceController = Depends(get_voice_controller)):
     """
     Convert text to speech.
-    Returns URL to retrieve the generated audio file.
+    Returns URL to retrieve the generated audio file, or with ``stream`` the
+    audio itself, sent while it is being synthesized and cached for the URL.
     """
-    voice_controller = VoiceController(generation_client=request.app.generation_client)
-    
-    audio_stream = voice_controller.text_to_speech(
-        text=tts_request.text,
-    )
-    
-    if audio_stream:
-        unique_id = str(uuid.uuid4())
-        replacement_audio_path = f"assets/audio_changes/{unique_id}_tts.mp3"
-        os.makedirs(os.path.dirname(replacement_audio_path), exist_ok=True)
-        audio_stream.stream_to_file(replacement_audio_path)
-        
-        
+    if tts_request.stream:
+        audio_id = voice_controller.get_tts_key(tts_request.text)
+        chunks = voice_controller.stream_speech(tts_request.text)
+
+        # wait for the first chunk so a failed synthesis is still a proper 500
+        try:
+            first_chunk = await anext(chunks)
+        except Exception as e:
+            logger.error(f"Failed to stream speech: {e}")
+            raise HTTPException(status_code=500, detail="Failed to generate speech")
+
+        async def audio_stream():
+            try:
+                yield first_chunk
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+        return StreamingResponse(
+            audio_stream(),
+            media_type="audio/mpeg",
+            headers={"x-audio-url": f"{audio_id}.mp3"},
+        )
+
+    audio_ids = await voice_controller.synthesize_phrases([tts_request.text])
+    audio_id = audio_ids.get(tts_request.text)
+
+    if audio_id:
         return TextToSpeechResponse(
-            audio_url=f"{unique_id}_tts.mp3",
+            audio_url=f"{audio_id}.mp3",
         )
 
     else:
@@ -96,26 +120,68 @@ async def text_to_speech(request: Request,  tts_request: TextToSpeechRequest) ->
     "/audio/{audio_id}",
     response_class=StreamingResponse,
     responses={
+        206: {"description": "Requested byte range of the audio"},
+        304: {"description": "Audio not modified"},
         404: {"model": ErrorResponse},
+        416: {"description": "Requested range not satisfiable"},
         500: {"model": ErrorResponse}
     }
 )
-async def get_audio(audio_id: str) -> StreamingResponse:
+async def get_audio(request: Request, audio_id: str,
+                    app_settings: Settings = Depends(get_settings),
+                    audio_store: AudioStore = Depends(get_audio_store)) -> Response:
     """
     Retrieve audio file by ID.
-    Returns the audio file as a streaming response.
+    Returns the audio file, or the byte range asked for with a ``Range`` header.
+    Responses carry an ``ETag`` so clients and CDNs can revalidate cached clips.
     """
     try:
-        base_path = os.path.abspath("assets/audio_changes")
-        audio_path = os.path.join(base_path, f"{audio_id}.mp3")
-        print(f"Accessing file at: {audio_path}")
+        # text-to-speech hands out ids with the extension
+        audio_id = audio_id.removesuffix(".mp3")
+        if not audio_store.is_valid_id(audio_id):
+            raise HTTPException(status_code=404, detail="Audio file not found")
 
-        if not os.path.exists(audio_path):
+        size = audio_store.touch(audio_id)
+        if size is None:
             raise HTTPException(status_code=404, detail="Audio file not found")
-        if os.stat(audio_path).st_size == 0:
+        if size == 0:
             raise HTTPException(status_code=500, detail="Audio file is empty or corrupted")
 
-        return FileResponse(audio_path)
+        audio_path = audio_store.get_path(audio_id)
+        etag = audio_store.get_etag(audio_id)
+        headers = {
+            "etag": etag,
+            "cache-control": f"public, max-age={app_settings.AUDIO_CACHE_MAX_AGE_SECONDS}",
+            "accept-ranges": "bytes",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or
+                              etag in [ tag.strip() for tag in if_none_match.split(",") ]):
+            return Response(status_code=304, headers=headers)
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (if_range is None or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+            if byte_range is not None:
+                start, end = byte_range
+                return StreamingResponse(
+                    iter_file_range(audio_path, start, end),
+                    status_code=206,
+                    media_type="audio/mpeg",
+                    headers={
+                        **headers,
+                        "content-range": f"bytes {start}-{end}/{size}",
+                        "content-length": str(end - start + 1),
+                    },
+                )
+
+        return FileResponse(audio_path, media_type="audio/mpeg", headers=headers)
 
     except HTTPException as e:
         raise e
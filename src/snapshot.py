@@ -0,0 +1,56 @@
+"""Export a project to a snapshot archive, or import one, without going through the API.
+
+Connects to mongo and the vector db with the settings of the API (``.env``),
+so large projects can be moved without an HTTP upload or download. The
+archive format is described in ``controllers.SnapshotController``.
+
+Usage (from ``src``):
+    python snapshot.py export <project_id> <archive.tar>
+    python snapshot.py import <project_id> <archive.tar> [--reset]
+"""
+import argparse
+import asyncio
+import sys
+import orjson
+from helpers.config import get_settings
+from helpers.container import ServiceContainer
+from controllers.SnapshotController import SnapshotError
+
+
+async def run(args) -> int:
+    container = ServiceContainer(settings=get_settings())
+    await container.startup()
+
+    try:
+        project = await container.project_model.get_project_or_create_one(project_id=args.project_id)
+        snapshot_controller = container.snapshot_controller
+
+        if args.command == "export":
+            manifest = await snapshot_controller.export_project(project=project, archive_path=args.archive)
+            result = {key: value for key, value in manifest.items() if key != "shards"}
+        else:
+            result = await snapshot_controller.import_project(project=project, archive_path=args.archive,
+                                                              do_reset=args.reset)
+    except SnapshotError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        await container.shutdown()
+
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode("utf-8"))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("project_id")
+    parser.add_argument("archive", help="path of the snapshot archive (.tar)")
+    parser.add_argument("--reset", action="store_true", help="import: replace the chunks and vectors of the project")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ from enum import Enum
 class LLMEnums(Enum):
     OPENAI = "OPENAI"
     COHERE = "COHERE"
+    FAKE = "FAKE"
+    ROUTER = "ROUTER"
 
 class OpenAIEnums(Enum):
     SYSTEM = "system"
@@ -12,6 +14,8 @@ class OpenAIEnums(Enum):
     STT = "whisper-1"
     TTS = "tts-1"
     VOICE = "alloy"
+
+    WARMUP_TIMEOUT = 5
     
 
 class CoHereEnums(Enum):
@@ -22,6 +26,28 @@ class CoHereEnums(Enum):
     DOCUMENT = "search_document"
     QUERY = "search_query"
 
+    EMBED_BATCH_SIZE = 96
+
+    WARMUP_TIMEOUT = 5
+
+
+class FakeEnums(Enum):
+    SYSTEM = "system"
+    USER = "user"
+    ASSISTANT = "assistant"
+
+    CONSTANT = "constant"
+    UNIFORM = "uniform"
+    NORMAL = "normal"
+    LOGNORMAL = "lognormal"
+
+
+class RouterEnums(Enum):
+    # backend neutral roles, mapped to each backend's own on every call
+    SYSTEM = "system"
+    USER = "user"
+    ASSISTANT = "assistant"
+
 
 class DocumentTypeEnum(Enum):
     DOCUMENT = "document"
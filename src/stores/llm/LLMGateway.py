@@ -0,0 +1,300 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+from helpers.metrics import (PROVIDER_RETRIES, PROVIDER_CONCURRENCY_LIMIT, PROVIDER_IN_FLIGHT,
+                             PROVIDER_QUEUE_DEPTH, PROVIDER_QUEUE_WAIT, PROVIDER_CIRCUIT_STATE)
+
+logger = logging.getLogger(__name__)
+
+# statuses worth another attempt; 429 and 503 also mean the provider is overloaded
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+OVERLOAD_STATUS_CODES = {429, 503}
+
+CIRCUIT_CLOSED = 0
+CIRCUIT_HALF_OPEN = 1
+CIRCUIT_OPEN = 2
+
+
+class ProviderUnavailableError(Exception):
+    """The call was not sent: the circuit is open or no concurrency slot freed up in time."""
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Seconds asked for by the ``Retry-After`` header of a failed call, when it has one."""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        # HTTP dates are rare from these APIs, fall back to the backoff
+        return None
+
+
+def is_connection_error(error: Exception) -> bool:
+    # SDK specific timeout/connection errors are matched by name so the SDKs stay lazily imported
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit of one provider endpoint.
+
+    The limit grows by about one slot per limit's worth of successful calls
+    while callers are queueing (additive increase) and is multiplied by
+    ``decrease_factor`` when the provider reports overload (multiplicative
+    decrease). Calls started before the last decrease do not decrease it again,
+    so one burst of 429s shrinks the limit once.
+    """
+
+    def __init__(self, provider: str, operation: str, initial_limit: int = 8, min_limit: int = 1,
+                 max_limit: int = 64, decrease_factor: float = 0.7):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.in_flight = 0
+        self.waiting = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+        self.limit_gauge = PROVIDER_CONCURRENCY_LIMIT.labels(provider=provider, operation=operation)
+        self.in_flight_gauge = PROVIDER_IN_FLIGHT.labels(provider=provider, operation=operation)
+        self.queue_gauge = PROVIDER_QUEUE_DEPTH.labels(provider=provider, operation=operation)
+        self.queue_wait = PROVIDER_QUEUE_WAIT.labels(provider=provider, operation=operation)
+        self.limit_gauge.set(int(self.limit))
+
+    def acquire(self, timeout: float = None) -> Optional[float]:
+        """Wait for a free slot; returns the start time to pass to ``release``, None on timeout."""
+        started = time.monotonic()
+        with self.condition:
+            self.waiting += 1
+            self.queue_gauge.inc()
+            try:
+                acquired = self.condition.wait_for(lambda: self.in_flight < int(self.limit), timeout=timeout)
+            finally:
+                self.waiting -= 1
+                self.queue_gauge.dec()
+
+            if not acquired:
+                return None
+
+            self.in_flight += 1
+            self.in_flight_gauge.inc()
+
+        now = time.monotonic()
+        self.queue_wait.observe(now - started)
+        return now
+
+    def release(self, started: float, overloaded: bool = False):
+        with self.condition:
+            self.in_flight -= 1
+            self.in_flight_gauge.dec()
+
+            if overloaded:
+                if started >= self.last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.last_decrease = time.monotonic()
+            elif self.waiting or self.in_flight + 1 >= int(self.limit):
+                # only grow while the limit is what holds callers back
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self.limit_gauge.set(int(self.limit))
+            self.condition.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint after ``failure_threshold`` consecutive failures.
+
+    After ``reset_timeout`` seconds one probe call is let through (half open);
+    its success closes the circuit again, its failure re-opens it.
+    """
+
+    def __init__(self, provider: str, operation: str, failure_threshold: int = 10, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+        self.state_gauge = PROVIDER_CIRCUIT_STATE.labels(provider=provider, operation=operation)
+        self.state_gauge.set(CIRCUIT_CLOSED)
+
+    def set_state(self, state: int):
+        self.state = state
+        self.state_gauge.set(state)
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.set_state(CIRCUIT_HALF_OPEN)
+
+            if self.state == CIRCUIT_HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+
+            return False
+
+    def release_probe(self):
+        """Give the half open probe back when the allowed call was never sent."""
+        with self.lock:
+            self.probing = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != CIRCUIT_CLOSED:
+                self.set_state(CIRCUIT_CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+                self.set_state(CIRCUIT_OPEN)
+                self.opened_at = time.monotonic()
+
+
+class LLMGateway:
+    """
+    Shared entry point for the SDK calls of one provider.
+
+    Every endpoint (chat, embed, audio) gets its own adaptive concurrency limit
+    and circuit breaker. Failed calls with a retryable status or a connection
+    error are retried with full jitter exponential backoff, never sooner than
+    the provider's ``Retry-After``. Providers call ``gateway.call`` around the
+    SDK request itself so retries never re-run their own bookkeeping.
+
+    Queueing for a slot and backing off block the calling thread, so async
+    code reaches the providers through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, provider: str, initial_concurrency: int = 8, min_concurrency: int = 1,
+                 max_concurrency: int = 64, decrease_factor: float = 0.7, max_attempts: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 20, breaker_failures: int = 10,
+                 breaker_reset_seconds: float = 30, queue_timeout: float = 60):
+        self.provider = provider
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self.queue_timeout = queue_timeout
+
+        self.limiters: Dict[str, AIMDLimiter] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.lock = threading.Lock()
+        self.random = random.Random()
+
+    def get_limiter(self, operation: str) -> AIMDLimiter:
+        with self.lock:
+            if operation not in self.limiters:
+                self.limiters[operation] = AIMDLimiter(
+                    self.provider, operation,
+                    initial_limit=self.initial_concurrency,
+                    min_limit=self.min_concurrency,
+                    max_limit=self.max_concurrency,
+                    decrease_factor=self.decrease_factor,
+                )
+                self.breakers[operation] = CircuitBreaker(
+                    self.provider, operation,
+                    failure_threshold=self.breaker_failures,
+                    reset_timeout=self.breaker_reset_seconds,
+                )
+            return self.limiters[operation]
+
+    def get_breaker(self, operation: str) -> CircuitBreaker:
+        self.get_limiter(operation)
+        return self.breakers[operation]
+
+    def get_delay(self, attempt: int, error: Exception) -> float:
+        backoff = self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return max(min(retry_after, self.max_delay), backoff)
+        return backoff
+
+    def call(self, operation: str, func: Callable, *args, **kwargs):
+        """Run ``func`` under the limits of ``operation``, retrying transient failures.
+
+        Raises:
+            ProviderUnavailableError: the circuit is open or the queue timed out.
+            Exception: the last error of ``func`` when it is not retryable or attempts ran out.
+        """
+        limiter = self.get_limiter(operation)
+        breaker = self.get_breaker(operation)
+
+        for attempt in range(self.max_attempts):
+            if not breaker.allow():
+                raise ProviderUnavailableError(f"{self.provider} {operation} circuit is open")
+
+            started = limiter.acquire(timeout=self.queue_timeout)
+            if started is None:
+                breaker.release_probe()
+                raise ProviderUnavailableError(f"{self.provider} {operation} queue timed out")
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status_code = get_status_code(e)
+                overloaded = status_code in OVERLOAD_STATUS_CODES
+                limiter.release(started, overloaded=overloaded)
+
+                retryable = status_code in RETRYABLE_STATUS_CODES or \
+                    (status_code is None and is_connection_error(e))
+
+                # rate limits mean the provider is healthy but busy, the limiter handles them
+                if status_code == 429:
+                    breaker.record_success()
+                elif retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                if not retryable or attempt + 1 >= self.max_attempts:
+                    raise
+
+                delay = self.get_delay(attempt, e)
+                PROVIDER_RETRIES.labels(provider=self.provider, operation=operation).inc()
+                logger.warning(f"{self.provider} {operation} call failed ({status_code or type(e).__name__}), "
+                               f"retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            limiter.release(started)
+            breaker.record_success()
+            return result
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Iterator, Optional
 
 class LLMInterface(ABC):
 
@@ -19,6 +20,29 @@ class LLMInterface(ABC):
     def embed_text(self, text: str, document_type: str = None):
         pass
 
+    @abstractmethod
+    def embed_texts(self, texts: list, document_type: str = None):
+        pass
+
     @abstractmethod
     def construct_prompt(self, prompt: str, role: str):
         pass
+
+    def warmup(self) -> bool:
+        """Open the provider connection with a cheap probe request, no-op by default."""
+        return True
+
+    def close(self):
+        """Release the provider connections, no-op by default."""
+        pass
+
+    def text_to_speech_stream(self, text: str, chunk_size: int = 4096) -> Optional[Iterator[bytes]]:
+        """Audio chunks of the synthesized speech, None when synthesis failed.
+
+        Falls back to chunking the complete ``text_to_speech`` response; providers
+        able to stream the audio as it is generated override this.
+        """
+        response = self.text_to_speech(text)
+        if response is None:
+            return None
+        return response.iter_bytes(chunk_size)
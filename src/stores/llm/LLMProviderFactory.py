@@ -1,27 +1,84 @@
 
 from .LLMEnums import LLMEnums
-from .providers import OpenAIProvider, CoHereProvider
+from .LLMGateway import LLMGateway
 
 class LLMProviderFactory:
     def __init__(self, config: dict):
         self.config = config
+        self.gateways = {}
+
+    def get_gateway(self, provider: str) -> LLMGateway:
+        # the generation and embedding clients of one provider share its rate limits
+        if provider not in self.gateways:
+            self.gateways[provider] = LLMGateway(
+                provider=provider,
+                initial_concurrency=self.config.LLM_GATEWAY_INITIAL_CONCURRENCY,
+                min_concurrency=self.config.LLM_GATEWAY_MIN_CONCURRENCY,
+                max_concurrency=self.config.LLM_GATEWAY_MAX_CONCURRENCY,
+                decrease_factor=self.config.LLM_GATEWAY_DECREASE_FACTOR,
+                max_attempts=self.config.LLM_GATEWAY_MAX_ATTEMPTS,
+                base_delay=self.config.LLM_GATEWAY_BASE_DELAY_SECONDS,
+                max_delay=self.config.LLM_GATEWAY_MAX_DELAY_SECONDS,
+                breaker_failures=self.config.LLM_GATEWAY_BREAKER_FAILURES,
+                breaker_reset_seconds=self.config.LLM_GATEWAY_BREAKER_RESET_SECONDS,
+                queue_timeout=self.config.LLM_GATEWAY_QUEUE_TIMEOUT_SECONDS,
+            )
+        return self.gateways[provider]
 
     def create(self, provider: str):
+        # provider modules are imported on demand so unused SDKs never load
         if provider == LLMEnums.OPENAI.value:
+            from .providers.OpenAIProvider import OpenAIProvider
             return OpenAIProvider(
                 api_key = self.config.OPENAI_API_KEY,
                 api_url = self.config.OPENAI_API_URL,
                 default_input_max_characters=self.config.INPUT_DAFAULT_MAX_CHARACTERS,
                 default_generation_max_output_tokens=self.config.GENERATION_DAFAULT_MAX_TOKENS,
-                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE
+                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE,
+                gateway=self.get_gateway(provider),
             )
 
         if provider == LLMEnums.COHERE.value:
+            from .providers.CoHereProvider import CoHereProvider
             return CoHereProvider(
                 api_key = self.config.COHERE_API_KEY,
                 default_input_max_characters=self.config.INPUT_DAFAULT_MAX_CHARACTERS,
                 default_generation_max_output_tokens=self.config.GENERATION_DAFAULT_MAX_TOKENS,
-                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE
+                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE,
+                gateway=self.get_gateway(provider),
+            )
+
+        if provider == LLMEnums.FAKE.value:
+            from .providers.FakeProvider import FakeProvider
+            return FakeProvider(
+                default_input_max_characters=self.config.INPUT_DAFAULT_MAX_CHARACTERS,
+                latency_distribution=self.config.FAKE_LLM_LATENCY_DISTRIBUTION,
+                latency_ms=self.config.FAKE_LLM_LATENCY_MS,
+                latency_jitter_ms=self.config.FAKE_LLM_LATENCY_JITTER_MS,
+                error_rate=self.config.FAKE_LLM_ERROR_RATE,
+                rate_limit_rate=self.config.FAKE_LLM_RATE_LIMIT_RATE,
+                retry_after_seconds=self.config.FAKE_LLM_RETRY_AFTER_SECONDS,
+                seed=self.config.FAKE_LLM_SEED,
+                gateway=self.get_gateway(provider),
+            )
+
+        if provider == LLMEnums.ROUTER.value:
+            from .providers.RoutingProvider import RoutingProvider
+            backends = {
+                backend: self.create(backend)
+                for backend in self.config.GENERATION_ROUTER_BACKENDS
+                if backend != LLMEnums.ROUTER.value
+            }
+            return RoutingProvider(
+                backends={ name: backend for name, backend in backends.items() if backend is not None },
+                hedge=self.config.GENERATION_ROUTER_HEDGE,
+                hedge_percentile=self.config.GENERATION_ROUTER_HEDGE_PERCENTILE,
+                hedge_min_delay=self.config.GENERATION_ROUTER_HEDGE_MIN_DELAY_SECONDS,
+                latency_window=self.config.GENERATION_ROUTER_LATENCY_WINDOW,
+                min_samples=self.config.GENERATION_ROUTER_MIN_SAMPLES,
+                error_threshold=self.config.GENERATION_ROUTER_ERROR_THRESHOLD,
+                eject_seconds=self.config.GENERATION_ROUTER_EJECT_SECONDS,
+                model_ids=self.config.GENERATION_ROUTER_MODEL_IDS,
             )
 
         return None
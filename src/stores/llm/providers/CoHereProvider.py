@@ -1,14 +1,19 @@
 from ..LLMInterface import LLMInterface
-from ..LLMEnums import CoHereEnums, DocumentTypeEnum
+from ..LLMEnums import CoHereEnums, DocumentTypeEnum, LLMEnums
+from ..LLMGateway import LLMGateway
+from helpers.metrics import track_provider_call, record_tokens
 import cohere
 import logging
+from helpers.tracing import trace_methods
 
+@trace_methods("llm.cohere", include=["generate_text", "embed_text", "embed_texts", "transcribe", "text_to_speech"])
 class CoHereProvider(LLMInterface):
 
     def __init__(self, api_key: str,
                        default_input_max_characters: int=1000,
                        default_generation_max_output_tokens: int=1000,
-                       default_generation_temperature: float=0.1):
+                       default_generation_temperature: float=0.1,
+                       gateway: LLMGateway=None):
         
         self.api_key = api_key
 
@@ -22,8 +27,10 @@ class CoHereProvider(LLMInterface):
         self.embedding_size = None
 
         self.client = cohere.Client(api_key=self.api_key)
+        self.gateway = gateway or LLMGateway(provider=LLMEnums.COHERE.value)
 
         self.enums = CoHereEnums
+        self.provider_name = LLMEnums.COHERE.value
         self.logger = logging.getLogger(__name__)
 
     def set_generation_model(self, model_id: str):
@@ -36,6 +43,14 @@ class CoHereProvider(LLMInterface):
     def process_text(self, text: str):
         return text[:self.default_input_max_characters].strip()
 
+    def record_usage(self, response, model_id: str):
+        billed_units = getattr(getattr(response, "meta", None), "billed_units", None)
+        if billed_units:
+            record_tokens(self.provider_name, model_id,
+                          input_tokens=getattr(billed_units, "input_tokens", None),
+                          output_tokens=getattr(billed_units, "output_tokens", None))
+
+    @track_provider_call("chat", model_attr="generation_model_id")
     def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
                             temperature: float = None):
 
@@ -50,7 +65,8 @@ class CoHereProvider(LLMInterface):
         max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
         temperature = temperature if temperature else self.default_generation_temperature
 
-        response = self.client.chat(
+        response = self.gateway.call(
+            "chat", self.client.chat,
             model = self.generation_model_id,
             chat_history = chat_history,
             message = self.process_text(prompt),
@@ -61,9 +77,12 @@ class CoHereProvider(LLMInterface):
         if not response or not response.text:
             self.logger.error("Error while generating text with CoHere")
             return None
+
+        self.record_usage(response, self.generation_model_id)
         
         return response.text
     
+    @track_provider_call("embed", model_attr="embedding_model_id")
     def embed_text(self, text: str, document_type: str = None):
         if not self.client:
             self.logger.error("CoHere client was not set")
@@ -77,7 +96,8 @@ class CoHereProvider(LLMInterface):
         if document_type == DocumentTypeEnum.QUERY:
             input_type = CoHereEnums.QUERY
 
-        response = self.client.embed(
+        response = self.gateway.call(
+            "embed", self.client.embed,
             model = self.embedding_model_id,
             texts = [self.process_text(text)],
             input_type = input_type,
@@ -87,9 +107,54 @@ class CoHereProvider(LLMInterface):
         if not response or not response.embeddings or not response.embeddings.float:
             self.logger.error("Error while embedding text with CoHere")
             return None
+
+        self.record_usage(response, self.embedding_model_id)
         
         return response.embeddings.float[0]
+
+    @track_provider_call("embed", model_attr="embedding_model_id")
+    def embed_texts(self, texts: list, document_type: str = None):
+        if not self.client:
+            self.logger.error("CoHere client was not set")
+            return None
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for CoHere was not set")
+            return None
+
+        input_type = CoHereEnums.DOCUMENT.value
+        if document_type == DocumentTypeEnum.QUERY.value:
+            input_type = CoHereEnums.QUERY.value
+
+        embeddings = []
+        for i in range(0, len(texts), CoHereEnums.EMBED_BATCH_SIZE.value):
+            response = self.gateway.call(
+                "embed", self.client.embed,
+                model = self.embedding_model_id,
+                texts = [ self.process_text(text) for text in texts[i:i + CoHereEnums.EMBED_BATCH_SIZE.value] ],
+                input_type = input_type,
+                embedding_types=['float'],
+            )
+
+            if not response or not response.embeddings or not response.embeddings.float:
+                self.logger.error("Error while embedding texts with CoHere")
+                return None
+
+            self.record_usage(response, self.embedding_model_id)
+            embeddings.extend(response.embeddings.float)
+
+        return embeddings
     
+    def warmup(self) -> bool:
+        try:
+            self.client.check_api_key(
+                request_options={"timeout_in_seconds": CoHereEnums.WARMUP_TIMEOUT.value}
+            )
+            return True
+        except Exception as e:
+            self.logger.warning(f"Cohere warmup failed: {e}")
+            return False
+
     def construct_prompt(self, prompt: str, role: str):
         return {
             "role": role,
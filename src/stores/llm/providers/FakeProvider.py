@@ -0,0 +1,226 @@
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+from string import Template
+from typing import Optional
+from ..LLMInterface import LLMInterface
+from ..LLMEnums import FakeEnums, LLMEnums
+from ..LLMGateway import LLMGateway
+from helpers.metrics import track_provider_call, record_tokens
+from helpers.tracing import trace_methods
+
+GENERATION_TEMPLATE = Template("[$model_id] answer $digest to a $prompt_chars character prompt: $excerpt")
+TRANSCRIPTION_WORDS = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog",
+                       "reading", "aloud", "helps", "pronunciation", "practice"]
+
+
+class FakeProviderError(Exception):
+    """Injected provider failure, mirrors a 5xx from a real API."""
+
+    status_code = 500
+
+
+class FakeRateLimitError(FakeProviderError):
+    """Injected rate limit response, mirrors a 429 with a Retry-After header."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit reached, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+        self.headers = {"retry-after": f"{retry_after:.2f}"}
+
+
+class FakeAudioResponse:
+    """Mimics the binary response returned by OpenAI ``audio.speech.create``."""
+
+    def __init__(self, content: bytes, chunk_size: int = 4096):
+        self.content = content
+        self.chunk_size = chunk_size
+
+    def read(self) -> bytes:
+        return self.content
+
+    def iter_bytes(self, chunk_size: int = None):
+        chunk_size = chunk_size or self.chunk_size
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def stream_to_file(self, file_path: str):
+        with open(file_path, "wb") as f:
+            f.write(self.content)
+
+
+@trace_methods("llm.fake", include=["generate_text", "embed_text", "embed_texts", "transcribe", "text_to_speech"])
+class FakeProvider(LLMInterface):
+    """
+    Offline provider for load tests and local runs.
+
+    Embeddings are seeded by a hash of the text so the same text always maps to
+    the same unit vector. Generation, transcription and TTS return templated
+    outputs. Every call first sleeps for a latency drawn from the configured
+    distribution and then fails with the configured error and rate limit rates.
+    """
+
+    def __init__(self, default_input_max_characters: int=1000,
+                       latency_distribution: str=FakeEnums.CONSTANT.value,
+                       latency_ms: float=0.0, latency_jitter_ms: float=0.0,
+                       error_rate: float=0.0, rate_limit_rate: float=0.0,
+                       retry_after_seconds: float=1.0, seed: int=0, gateway: LLMGateway=None):
+
+        self.default_input_max_characters = default_input_max_characters
+
+        self.latency_distribution = latency_distribution
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+
+        self.generation_model_id = None
+
+        self.embedding_model_id = None
+        self.embedding_size = None
+
+        self.tts_model_id = "fake-tts"
+        self.tts_voice = "fake"
+
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+        # injected errors and rate limits go through the same gateway as real providers
+        self.gateway = gateway or LLMGateway(provider=LLMEnums.FAKE.value)
+
+        self.enums = FakeEnums
+        self.provider_name = LLMEnums.FAKE.value
+        self.logger = logging.getLogger(__name__)
+
+    def set_generation_model(self, model_id: str):
+        self.generation_model_id = model_id
+
+    def set_embedding_model(self, model_id: str, embedding_size: int):
+        self.embedding_model_id = model_id
+        self.embedding_size = embedding_size
+
+    def process_text(self, text: str):
+        return text[:self.default_input_max_characters].strip()
+
+    def sample_latency(self) -> float:
+        """Draw one call latency in seconds from the configured distribution."""
+        with self.random_lock:
+            if self.latency_distribution == FakeEnums.UNIFORM.value:
+                latency_ms = self.random.uniform(self.latency_ms - self.latency_jitter_ms,
+                                                 self.latency_ms + self.latency_jitter_ms)
+            elif self.latency_distribution == FakeEnums.NORMAL.value:
+                latency_ms = self.random.gauss(self.latency_ms, self.latency_jitter_ms)
+            elif self.latency_distribution == FakeEnums.LOGNORMAL.value and self.latency_ms > 0:
+                # parametrised so that latency_ms is the median and jitter widens the tail
+                sigma = math.log1p(self.latency_jitter_ms / self.latency_ms)
+                latency_ms = self.random.lognormvariate(math.log(self.latency_ms), sigma)
+            else:
+                latency_ms = self.latency_ms
+
+        return max(0.0, latency_ms) / 1000
+
+    def simulate_call(self):
+        latency = self.sample_latency()
+        if latency:
+            time.sleep(latency)
+
+        with self.random_lock:
+            roll = self.random.random()
+
+        if roll < self.rate_limit_rate:
+            raise FakeRateLimitError(retry_after=self.retry_after_seconds)
+
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeProviderError("Injected fake provider error")
+
+    @track_provider_call("chat", model_attr="generation_model_id")
+    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                            temperature: float = None):
+
+        if not self.generation_model_id:
+            self.logger.error("Generation model for Fake provider was not set")
+            return None
+
+        self.gateway.call("chat", self.simulate_call)
+
+        prompt = self.process_text(prompt)
+        answer = GENERATION_TEMPLATE.substitute(
+            model_id=self.generation_model_id,
+            digest=hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12],
+            prompt_chars=len(prompt),
+            excerpt=prompt[-80:].replace("\n", " "),
+        )
+
+        if max_output_tokens:
+            answer = " ".join(answer.split()[:max_output_tokens])
+
+        record_tokens(self.provider_name, self.generation_model_id,
+                      input_tokens=len(prompt.split()), output_tokens=len(answer.split()))
+
+        return answer
+
+    def embed_vector(self, text: str):
+        rng = random.Random(hashlib.sha256(self.process_text(text).encode("utf-8")).digest())
+        vector = [ rng.gauss(0, 1) for _ in range(self.embedding_size) ]
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [ x / norm for x in vector ]
+
+    @track_provider_call("embed", model_attr="embedding_model_id")
+    def embed_text(self, text: str, document_type: str = None):
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for Fake provider was not set")
+            return None
+
+        self.gateway.call("embed", self.simulate_call)
+
+        return self.embed_vector(text)
+
+    @track_provider_call("embed", model_attr="embedding_model_id")
+    def embed_texts(self, texts: list, document_type: str = None):
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for Fake provider was not set")
+            return None
+
+        self.gateway.call("embed", self.simulate_call)
+
+        return [ self.embed_vector(text) for text in texts ]
+
+    def construct_prompt(self, prompt: str, role: str):
+        return {
+            "role": role,
+            "content": self.process_text(prompt)
+        }
+
+    @track_provider_call("audio", model="fake-stt")
+    def transcribe(self, audio_file, prompt: str, language: str = "en") -> str:
+        """Return the prompt if given, otherwise words picked deterministically from the audio bytes."""
+        self.gateway.call("audio", self.simulate_call)
+
+        if prompt:
+            return prompt
+
+        if isinstance(audio_file, str):
+            with open(audio_file, "rb") as f:
+                digest = hashlib.sha256(f.read()).digest()
+        else:
+            digest = hashlib.sha256(audio_file.getvalue()).digest()
+
+        return " ".join(TRANSCRIPTION_WORDS[b % len(TRANSCRIPTION_WORDS)] for b in digest[:12])
+
+    @track_provider_call("audio", model="fake-tts")
+    def text_to_speech(self, text: str) -> Optional[FakeAudioResponse]:
+        """Return deterministic audio bytes, roughly 1KB per 16 characters of text."""
+        self.gateway.call("audio", self.simulate_call)
+
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        repeats = max(1, len(text) * 2)
+
+        return FakeAudioResponse(content=b"ID3" + digest * repeats)
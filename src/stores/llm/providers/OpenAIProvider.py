@@ -1,16 +1,22 @@
 import io
-from typing import Optional
+import os
+from typing import Iterator, Optional
 from ..LLMInterface import LLMInterface
-from ..LLMEnums import OpenAIEnums
+from ..LLMEnums import OpenAIEnums, LLMEnums
+from ..LLMGateway import LLMGateway
 from openai import OpenAI
+from helpers.metrics import track_provider_call, record_tokens
 import logging
+from helpers.tracing import trace_methods
 
+@trace_methods("llm.openai", include=["generate_text", "embed_text", "embed_texts", "transcribe", "text_to_speech"])
 class OpenAIProvider(LLMInterface):
 
     def __init__(self, api_key: str, api_url: str=None,
                        default_input_max_characters: int=1000,
                        default_generation_max_output_tokens: int=1000,
-                       default_generation_temperature: float=0.1):
+                       default_generation_temperature: float=0.1,
+                       gateway: LLMGateway=None):
         
         self.api_key = api_key
         self.api_url = api_url
@@ -24,12 +30,19 @@ class OpenAIProvider(LLMInterface):
         self.embedding_model_id = None
         self.embedding_size = None
 
+        self.tts_model_id = OpenAIEnums.TTS.value
+        self.tts_voice = OpenAIEnums.VOICE.value
+
+        # retries are left to the gateway, which shares its limits with every call to the provider
         self.client = OpenAI(
             api_key = self.api_key,
-            base_url = self.api_url if self.api_url and len(self.api_url) else None
+            base_url = self.api_url if self.api_url and len(self.api_url) else None,
+            max_retries = 0
         )
+        self.gateway = gateway or LLMGateway(provider=LLMEnums.OPENAI.value)
 
         self.enums = OpenAIEnums
+        self.provider_name = LLMEnums.OPENAI.value
         self.logger = logging.getLogger(__name__)
 
     def set_generation_model(self, model_id: str):
@@ -42,6 +55,7 @@ class OpenAIProvider(LLMInterface):
     def process_text(self, text: str):
         return text[:self.default_input_max_characters].strip()
 
+    @track_provider_call("chat", model_attr="generation_model_id")
     def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
                             temperature: float = None):
         
@@ -60,7 +74,8 @@ class OpenAIProvider(LLMInterface):
             self.construct_prompt(prompt=prompt, role=OpenAIEnums.USER.value)
         )
 
-        response = self.client.chat.completions.create(
+        response = self.gateway.call(
+            "chat", self.client.chat.completions.create,
             model = self.generation_model_id,
             messages = chat_history,
             max_tokens = max_output_tokens,
@@ -71,10 +86,16 @@ class OpenAIProvider(LLMInterface):
             self.logger.error("Error while generating text with OpenAI")
             return None
 
+        if response.usage:
+            record_tokens(self.provider_name, self.generation_model_id,
+                          input_tokens=response.usage.prompt_tokens,
+                          output_tokens=response.usage.completion_tokens)
+
         return response.choices[0].message.content
 
 
 
+    @track_provider_call("embed", model_attr="embedding_model_id")
     def embed_text(self, text: str, document_type: str = None):
         
         if not self.client:
@@ -85,7 +106,8 @@ class OpenAIProvider(LLMInterface):
             self.logger.error("Embedding model for OpenAI was not set")
             return None
         
-        response = self.client.embeddings.create(
+        response = self.gateway.call(
+            "embed", self.client.embeddings.create,
             model = self.embedding_model_id,
             input = text,
         )
@@ -94,8 +116,51 @@ class OpenAIProvider(LLMInterface):
             self.logger.error("Error while embedding text with OpenAI")
             return None
 
+        if response.usage:
+            record_tokens(self.provider_name, self.embedding_model_id,
+                          input_tokens=response.usage.prompt_tokens)
+
         return response.data[0].embedding
 
+    @track_provider_call("embed", model_attr="embedding_model_id")
+    def embed_texts(self, texts: list, document_type: str = None):
+
+        if not self.client:
+            self.logger.error("OpenAI client was not set")
+            return None
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for OpenAI was not set")
+            return None
+
+        response = self.gateway.call(
+            "embed", self.client.embeddings.create,
+            model = self.embedding_model_id,
+            input = texts,
+        )
+
+        if not response or not response.data or len(response.data) != len(texts):
+            self.logger.error("Error while embedding texts with OpenAI")
+            return None
+
+        if response.usage:
+            record_tokens(self.provider_name, self.embedding_model_id,
+                          input_tokens=response.usage.prompt_tokens)
+
+        return [ record.embedding for record in sorted(response.data, key=lambda record: record.index) ]
+
+    def warmup(self) -> bool:
+        # listing models is free and opens the pooled TLS connection
+        try:
+            self.client.with_options(timeout=OpenAIEnums.WARMUP_TIMEOUT.value).models.list()
+            return True
+        except Exception as e:
+            self.logger.warning(f"OpenAI warmup failed: {e}")
+            return False
+
+    def close(self):
+        self.client.close()
+
     def construct_prompt(self, prompt: str, role: str):
         return {
             "role": role,
@@ -103,17 +168,29 @@ class OpenAIProvider(LLMInterface):
         }
     
     # define a wrapper function for seeing how prompts affect transcriptions
-    def transcribe(self, audio_filepath: str,prompt: str, language: str = "en") -> str:
-        """Given a prompt, transcribe the audio file."""
-        transcript = self.client.audio.transcriptions.create(
-            file=open(audio_filepath, "rb"),
-            model=OpenAIEnums.STT.value,
-            prompt=prompt,
-            language=language
-        )
+    @track_provider_call("audio", model=OpenAIEnums.STT.value)
+    def transcribe(self, audio_file, prompt: str, language: str = "en") -> str:
+        """Transcribe an audio file path or an in-memory buffer (whose ``name`` carries the extension)."""
+        if isinstance(audio_file, str):
+            with open(audio_file, "rb") as f:
+                audio_file = io.BytesIO(f.read())
+                audio_file.name = os.path.basename(f.name)
+
+        def create_transcription():
+            # a retried attempt must upload the buffer from its start again
+            audio_file.seek(0)
+            return self.client.audio.transcriptions.create(
+                file=audio_file,
+                model=OpenAIEnums.STT.value,
+                prompt=prompt,
+                language=language
+            )
+
+        transcript = self.gateway.call("audio", create_transcription)
         return transcript.text
     
     
+    @track_provider_call("audio", model=OpenAIEnums.TTS.value)
     def text_to_speech(self, text: str) -> Optional[io.BytesIO]:
         """
         Converts text to speech using OpenAI's TTS-1 model and returns an audio stream.
@@ -127,9 +204,10 @@ class OpenAIProvider(LLMInterface):
         """
         try:
             # Generate audio using OpenAI's API
-            response = self.client.audio.speech.create(
-                    model=OpenAIEnums.TTS.value,
-                    voice=OpenAIEnums.VOICE.value,
+            response = self.gateway.call(
+                    "audio", self.client.audio.speech.create,
+                    model=self.tts_model_id,
+                    voice=self.tts_voice,
                     input=text,
                 )
             return response
@@ -137,6 +215,35 @@ class OpenAIProvider(LLMInterface):
         except Exception as e:
             logging.exception(f"Error in OpenAI TTS: {e}")
             return None
+
+    @track_provider_call("audio", model=OpenAIEnums.TTS.value)
+    def text_to_speech_stream(self, text: str, chunk_size: int = 4096) -> Optional[Iterator[bytes]]:
+        """
+        Starts the speech synthesis and returns its audio chunks as they arrive.
+
+        The request is sent before returning, so errors surface here and the
+        recorded latency is the time to the first byte; the HTTP response is
+        closed once the iterator is exhausted or closed.
+        """
+        try:
+            response = self.gateway.call(
+                    "audio", lambda: self.client.audio.speech.with_streaming_response.create(
+                        model=self.tts_model_id,
+                        voice=self.tts_voice,
+                        input=text,
+                    ).__enter__()
+                )
+        except Exception as e:
+            logging.exception(f"Error in OpenAI TTS stream: {e}")
+            return None
+
+        def iter_chunks():
+            try:
+                yield from response.iter_bytes(chunk_size)
+            finally:
+                response.close()
+
+        return iter_chunks()
         
     
     
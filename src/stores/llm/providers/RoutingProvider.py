@@ -0,0 +1,267 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+from ..LLMInterface import LLMInterface
+from ..LLMEnums import RouterEnums, LLMEnums
+from helpers.metrics import ROUTER_CALLS, ROUTER_HEDGES
+from helpers.tracing import trace_methods
+
+
+class BackendStats:
+    """Rolling latency and outcome window of one backend."""
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.ejected_until = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, success: bool):
+        with self.lock:
+            self.outcomes.append(success)
+            if success:
+                self.latencies.append(latency)
+
+    def error_rate(self) -> float:
+        with self.lock:
+            if not self.outcomes:
+                return 0.0
+            return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self.lock:
+            if not self.latencies:
+                return None
+            values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+@trace_methods("llm.router", include=["generate_text"])
+class RoutingProvider(LLMInterface):
+    """
+    Generation provider spreading calls over several backends.
+
+    Every backend keeps a rolling window of its latencies and outcomes. A call
+    goes to the healthy backend with the lowest median latency (backends without
+    samples first, so each gets measured), and fails over to the next one when
+    it raises or returns nothing. A backend whose error rate exceeds
+    ``error_threshold`` is skipped for ``eject_seconds``.
+
+    With ``hedge`` enabled, a call still running after the chosen backend's p95
+    latency is duplicated on the next backend and the first answer wins. The
+    SDK calls are blocking, so the losing call cannot be interrupted: its result
+    is discarded when it completes. Hedging is not free: every call hops
+    through the router's thread pool, and about ``100 - hedge_percentile``
+    percent of calls run twice and load both backends, so the median
+    latency rises slightly in exchange for the much shorter tail.
+
+    Embeddings, transcription and speech stay on the first backend, embeddings
+    of different models are not comparable and the TTS cache is keyed by its voice.
+    """
+
+    def __init__(self, backends: Dict[str, LLMInterface], hedge: bool = False, hedge_percentile: float = 95,
+                 hedge_min_delay: float = 0.2, latency_window: int = 100, min_samples: int = 10,
+                 error_threshold: float = 0.5, eject_seconds: float = 30, model_ids: Dict[str, str] = None,
+                 max_workers: int = 32):
+        if not backends:
+            raise ValueError("The routing provider needs at least one backend")
+
+        self.backends = backends
+        self.primary = next(iter(backends.values()))
+        self.stats = { name: BackendStats(window=latency_window) for name in backends }
+
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.min_samples = min_samples
+        self.error_threshold = error_threshold
+        self.eject_seconds = eject_seconds
+
+        self.model_ids = model_ids or {}
+        self.generation_model_ids = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+        self.enums = RouterEnums
+        self.provider_name = LLMEnums.ROUTER.value
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def generation_model_id(self):
+        return ",".join(f"{name}:{model_id}" for name, model_id in self.generation_model_ids.items())
+
+    @property
+    def embedding_model_id(self):
+        return getattr(self.primary, "embedding_model_id", None)
+
+    @property
+    def embedding_size(self):
+        return getattr(self.primary, "embedding_size", None)
+
+    @property
+    def tts_model_id(self):
+        return getattr(self.primary, "tts_model_id", type(self.primary).__name__)
+
+    @property
+    def tts_voice(self):
+        return getattr(self.primary, "tts_voice", "")
+
+    def set_generation_model(self, model_id: str):
+        # backends of another provider need their own model, listed in model_ids
+        for name, backend in self.backends.items():
+            self.generation_model_ids[name] = self.model_ids.get(name, model_id)
+            backend.set_generation_model(model_id=self.generation_model_ids[name])
+
+    def set_embedding_model(self, model_id: str, embedding_size: int):
+        self.primary.set_embedding_model(model_id=model_id, embedding_size=embedding_size)
+
+    def embed_text(self, text: str, document_type: str = None):
+        return self.primary.embed_text(text=text, document_type=document_type)
+
+    def embed_texts(self, texts: list, document_type: str = None):
+        return self.primary.embed_texts(texts=texts, document_type=document_type)
+
+    def transcribe(self, audio_file, prompt: str, language: str = "en"):
+        return self.primary.transcribe(audio_file=audio_file, prompt=prompt, language=language)
+
+    def text_to_speech(self, text: str):
+        return self.primary.text_to_speech(text)
+
+    def text_to_speech_stream(self, text: str, chunk_size: int = 4096):
+        return self.primary.text_to_speech_stream(text, chunk_size=chunk_size)
+
+    def construct_prompt(self, prompt: str, role: str):
+        # backend neutral message, translated for the backend the call is routed to
+        return {
+            "role": role,
+            "content": prompt
+        }
+
+    def translate_messages(self, backend: LLMInterface, chat_history: list) -> list:
+        roles = {
+            RouterEnums.SYSTEM.value: backend.enums.SYSTEM.value,
+            RouterEnums.USER.value: backend.enums.USER.value,
+            RouterEnums.ASSISTANT.value: backend.enums.ASSISTANT.value,
+        }
+        return [
+            backend.construct_prompt(prompt=message["content"], role=roles.get(message["role"], message["role"]))
+            for message in chat_history
+        ]
+
+    def rank_backends(self) -> List[str]:
+        """Healthy backends, unmeasured then fastest first, followed by the ejected ones as a last resort."""
+        now = time.monotonic()
+        healthy, ejected = [], []
+
+        for name, stats in self.stats.items():
+            if stats.ejected_until > now:
+                ejected.append(name)
+                continue
+
+            if len(stats.outcomes) >= self.min_samples and stats.error_rate() > self.error_threshold:
+                self.logger.warning(f"Ejecting generation backend {name} for {self.eject_seconds}s")
+                stats.ejected_until = now + self.eject_seconds
+                with stats.lock:
+                    stats.outcomes.clear()
+                ejected.append(name)
+                continue
+
+            median = stats.percentile(50)
+            healthy.append((median is not None, median or 0.0, name))
+
+        return [ name for _, _, name in sorted(healthy) ] + ejected
+
+    def get_hedge_delay(self, name: str) -> Optional[float]:
+        stats = self.stats[name]
+        if len(stats.latencies) < self.min_samples:
+            return None
+        return max(self.hedge_min_delay, stats.percentile(self.hedge_percentile))
+
+    def call_backend(self, name: str, prompt: str, chat_history: list, max_output_tokens: int,
+                     temperature: float):
+        backend = self.backends[name]
+        started = time.monotonic()
+        answer = None
+        try:
+            answer = backend.generate_text(
+                prompt=prompt,
+                chat_history=self.translate_messages(backend, chat_history),
+                max_output_tokens=max_output_tokens,
+                temperature=temperature,
+            )
+            return answer
+        finally:
+            self.stats[name].record(time.monotonic() - started, success=answer is not None)
+            ROUTER_CALLS.labels(backend=name, outcome="success" if answer is not None else "error").inc()
+
+    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                            temperature: float = None):
+        ranked = self.rank_backends()
+        pending = {}
+        hedged = False
+        last_error = None
+
+        # the backends get the history without the new turn, each appends its own
+        history = list(chat_history)
+        chat_history.append(
+            self.construct_prompt(prompt=prompt, role=RouterEnums.USER.value)
+        )
+
+        def submit(name: str):
+            future = self.executor.submit(self.call_backend, name, prompt, history,
+                                          max_output_tokens, temperature)
+            pending[future] = name
+            return future
+
+        primary = submit(ranked.pop(0))
+
+        while pending:
+            timeout = None
+            if self.hedge and not hedged and ranked and len(pending) == 1:
+                timeout = self.get_hedge_delay(pending[primary]) if primary in pending else None
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # still running after its p95: race it against the next backend
+                hedged = True
+                ROUTER_HEDGES.labels(outcome="fired").inc()
+                submit(ranked.pop(0))
+                continue
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    last_error = e
+                    self.logger.error(f"Generation backend {name} failed: {e}")
+                    answer = None
+
+                if answer is None:
+                    continue
+
+                if hedged:
+                    ROUTER_HEDGES.labels(outcome="primary" if future is primary else "hedge").inc()
+                # a call already running cannot be interrupted, its answer is dropped
+                for other in pending:
+                    other.cancel()
+                return answer
+
+            if not pending and ranked:
+                # fail over to the next backend
+                submit(ranked.pop(0))
+
+        if last_error is not None:
+            raise last_error
+        return None
+
+    def warmup(self) -> bool:
+        return any([ backend.warmup() for backend in self.backends.values() ])
+
+    def close(self):
+        for backend in self.backends.values():
+            backend.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,2 +1,27 @@
-from .CoHereProvider import CoHereProvider
-from .OpenAIProvider import OpenAIProvider
+import importlib
+
+# providers pull in their SDKs (openai, cohere), so they are only imported on first access
+_PROVIDER_MODULES = {
+    "CoHereProvider": ".CoHereProvider",
+    "OpenAIProvider": ".OpenAIProvider",
+    "FakeProvider": ".FakeProvider",
+    "FakeProviderError": ".FakeProvider",
+    "FakeRateLimitError": ".FakeProvider",
+    "FakeAudioResponse": ".FakeProvider",
+    "RoutingProvider": ".RoutingProvider",
+}
+
+__all__ = list(_PROVIDER_MODULES)
+
+
+def __getattr__(name: str):
+    if name not in _PROVIDER_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_PROVIDER_MODULES[name], __name__)
+    # importing the submodule binds its name on the package, rebind every export of it.
+    # a submodule imported before the first access keeps that binding and __getattr__ never
+    # runs for it, so code inside the app imports the classes from their submodules
+    for export, module_name in _PROVIDER_MODULES.items():
+        if module_name == _PROVIDER_MODULES[name]:
+            globals()[export] = getattr(module, export)
+    return globals()[name]
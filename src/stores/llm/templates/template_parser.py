@@ -1,43 +1,151 @@
+import importlib
 import os
+import threading
+import time
+from string import Template
+from typing import Dict, List, Optional
 
 class TemplateParser:
+    """
+    Registry of the prompt templates of every locale.
 
-    def __init__(self, language: str=None, default_language='en'):
+    All ``locales/<language>/<group>.py`` modules are imported once, and each
+    ``(group, key)`` is resolved to the template of the current language or,
+    when missing, of the default language. Templates without placeholders are
+    rendered once and returned as is. With ``hot_reload`` the locale files are
+    checked for changes at most every ``reload_interval`` seconds.
+    """
+
+    def __init__(self, language: str=None, default_language='en', hot_reload: bool = False,
+                 reload_interval: float = 1.0):
         self.current_path = os.path.dirname(os.path.abspath(__file__))
+        self.locales_path = os.path.join(self.current_path, "locales")
         self.default_language = default_language
         self.language = None
 
+        self.hot_reload = hot_reload
+        self.reload_interval = reload_interval
+        self.last_reload_check = 0.0
+        self.lock = threading.Lock()
+
+        # language -> group -> key -> template
+        self.templates: Dict[str, Dict[str, Dict[str, Template]]] = {}
+        # (group, key) -> template of the current language, and the rendered text of static ones
+        self.resolved: Dict[tuple, Template] = {}
+        self.static: Dict[tuple, str] = {}
+        self.mtimes: Dict[str, float] = {}
+
+        self.load()
         self.set_language(language)
 
-    
-    def set_language(self, language: str):
-        if not language:
-            self.language = self.default_language
+    def scan(self) -> Dict[str, float]:
+        """Modification time of every ``locales/<language>/<group>.py`` file."""
+        mtimes = {}
+        for language in sorted(os.listdir(self.locales_path)):
+            language_path = os.path.join(self.locales_path, language)
+            if not os.path.isdir(language_path) or language.startswith("__"):
+                continue
+
+            for file_name in sorted(os.listdir(language_path)):
+                if file_name.endswith(".py") and not file_name.startswith("__"):
+                    file_path = os.path.join(language_path, file_name)
+                    mtimes[file_path] = os.path.getmtime(file_path)
+
+        return mtimes
 
-        language_path = os.path.join(self.current_path, "locales", language)
-        if os.path.exists(language_path):
+    def load(self):
+        """Import the template modules of every locale, reloading the ones changed since the last load."""
+        templates = {}
+        mtimes = self.scan()
+
+        for file_path, mtime in mtimes.items():
+            language = os.path.basename(os.path.dirname(file_path))
+            group = os.path.splitext(os.path.basename(file_path))[0]
+
+            module = importlib.import_module(f"stores.llm.templates.locales.{language}.{group}")
+            if file_path in self.mtimes and self.mtimes[file_path] != mtime:
+                module = importlib.reload(module)
+
+            templates.setdefault(language, {})[group] = {
+                key: value for key, value in vars(module).items() if isinstance(value, Template)
+            }
+
+        self.templates = templates
+        self.mtimes = mtimes
+
+    def set_language(self, language: str):
+        if language and language in self.templates:
             self.language = language
         else:
             self.language = self.default_language
 
+        self.resolve()
+
+    def resolve(self):
+        resolved, static = {}, {}
+
+        # default language first so the current language overrides it
+        for language in (self.default_language, self.language):
+            for group, keys in self.templates.get(language, {}).items():
+                for key, template in keys.items():
+                    resolved[(group, key)] = template
+
+        for name, template in resolved.items():
+            if not self.get_identifiers(template):
+                static[name] = template.substitute()
+
+        self.resolved = resolved
+        self.static = static
+
+    @staticmethod
+    def get_identifiers(template: Template) -> List[str]:
+        # Template.get_identifiers is only available from python 3.11
+        return [
+            match.group("named") or match.group("braced")
+            for match in template.pattern.finditer(template.template)
+            if match.group("named") or match.group("braced")
+        ]
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now - self.last_reload_check < self.reload_interval:
+            return
+
+        with self.lock:
+            if now - self.last_reload_check < self.reload_interval:
+                return
+            self.last_reload_check = now
+
+            if self.scan() != self.mtimes:
+                self.load()
+                self.set_language(self.language)
+
+    def get_template(self, group: str, key: str) -> Optional[Template]:
+        """The resolved template, for callers rendering it many times."""
+        if self.hot_reload:
+            self.reload_if_changed()
+        return self.resolved.get((group, key))
+
     def get(self, group: str, key: str, vars: dict={}):
         if not group or not key:
             return None
-        
-        group_path = os.path.join(self.current_path, "locales", self.language, f"{group}.py" )
-        targeted_language = self.language
-        if not os.path.exists(group_path):
-            group_path = os.path.join(self.current_path, "locales", self.default_language, f"{group}.py" )
-            targeted_language = self.default_language
-
-        if not os.path.exists(group_path):
-            return None
-        
-        # import group module
-        module = __import__(f"stores.llm.templates.locales.{targeted_language}.{group}", fromlist=[group])
 
-        if not module:
+        if self.hot_reload:
+            self.reload_if_changed()
+
+        static = self.static.get((group, key))
+        if static is not None:
+            return static
+
+        template = self.resolved.get((group, key))
+        if template is None:
             return None
-        
-        key_attribute = getattr(module, key)
-        return key_attribute.substitute(vars)
+
+        return template.substitute(vars)
+
+    def render_many(self, group: str, key: str, vars_list: List[dict]) -> List[str]:
+        """Render one template for every vars dict, resolving it only once."""
+        template = self.get_template(group, key)
+        if template is None:
+            return []
+        return [ template.substitute(vars) for vars in vars_list ]
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 from models.db_schemes import RetrievedDocument
 
 class VectorDBInterface(ABC):
@@ -28,6 +28,18 @@ class VectorDBInterface(ABC):
     def delete_collection(self, collection_name: str):
         pass
 
+    @abstractmethod
+    def get_alias_target(self, alias_name: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def switch_alias(self, alias_name: str, collection_name: str):
+        pass
+
+    @abstractmethod
+    def delete_alias(self, alias_name: str):
+        pass
+
     @abstractmethod
     def create_collection(self, collection_name: str, 
                                 embedding_size: int,
@@ -46,7 +58,24 @@ class VectorDBInterface(ABC):
                           record_ids: list = None, batch_size: int = 50):
         pass
 
+    @abstractmethod
+    def delete_many(self, collection_name: str, record_ids: list):
+        pass
+
     @abstractmethod
     def search_by_vector(self, collection_name: str, vector: list, limit: int) -> List[RetrievedDocument]:
         pass
-    
\ No newline at end of file
+    
+
+    @abstractmethod
+    def search_many_by_vectors(self, collection_name: str, vectors: List[list],
+                               limit: int) -> List[List[RetrievedDocument]]:
+        pass
+
+    @abstractmethod
+    def sample_record_ids(self, collection_name: str, limit: int = 1) -> list:
+        pass
+
+    @abstractmethod
+    def get_vectors(self, collection_name: str, record_ids: list) -> dict:
+        pass
@@ -1,4 +1,3 @@
-from .providers import QdrantDBProvider
 from .VectorDBEnums import VectorDBEnums
 from controllers.BaseController import BaseController
 
@@ -9,6 +8,8 @@ class VectorDBProviderFactory:
 
     def create(self, provider: str):
         if provider == VectorDBEnums.QDRANT.value:
+            from .providers.QdrantDBProvider import QdrantDBProvider
+
             # db_path = self.base_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH)
             db_path = self.config.VECTOR_DB_PATH
 
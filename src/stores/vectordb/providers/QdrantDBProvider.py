@@ -1,12 +1,15 @@
 from qdrant_client import models, QdrantClient
 from ..VectorDBInterface import VectorDBInterface
-from ..VectorDBEnums import DistanceMethodEnums
+from ..VectorDBEnums import DistanceMethodEnums, VectorDBEnums
+from helpers.metrics import VECTORS_UPSERTED
 import logging
-from typing import List
+from typing import List, Optional
 from models.db_schemes import RetrievedDocument
 from qdrant_client.local.qdrant_local import QdrantLocal
 from portalocker.exceptions import AlreadyLocked
+from helpers.tracing import trace_methods
 
+@trace_methods("qdrant")
 class QdrantDBProvider(VectorDBInterface):
     def __init__(self, db_path: str, distance_method: str):
 
@@ -24,7 +27,10 @@ class QdrantDBProvider(VectorDBInterface):
     def connect(self):
         try:
             print("Connecting to Qdrant at local path: %s", self.db_path)
-            self.client = QdrantClient(host=self.db_path, port=None ,https=False)
+            if self.db_path == ":memory:":
+                self.client = QdrantClient(location=":memory:")
+            else:
+                self.client = QdrantClient(host=self.db_path, port=None ,https=False)
             self.logger.info("Connected to Qdrant at local path: %s", self.db_path)
         except AlreadyLocked as e:
             self.logger.error(
@@ -46,18 +52,47 @@ class QdrantDBProvider(VectorDBInterface):
 
 
     def is_collection_existed(self, collection_name: str) -> bool:
-        return self.client.collection_exists(collection_name=collection_name)
+        # an alias counts as the collection it points to
+        return (self.client.collection_exists(collection_name=collection_name)
+                or self.get_alias_target(collection_name) is not None)
     
     def list_all_collections(self) -> List:
         return self.client.get_collections()
     
     def get_collection_info(self, collection_name: str) -> dict:
-        return self.client.get_collection(collection_name=collection_name)
+        # pydantic's typed serializer gives JSON-ready values (enums as strings) in one pass
+        return self.client.get_collection(collection_name=collection_name).model_dump(mode="json")
     
     def delete_collection(self, collection_name: str):
         if self.is_collection_existed(collection_name):
             return self.client.delete_collection(collection_name=collection_name)
         
+    def get_alias_target(self, alias_name: str) -> Optional[str]:
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == alias_name:
+                return alias.collection_name
+        return None
+
+    def switch_alias(self, alias_name: str, collection_name: str):
+        """Point ``alias_name`` at ``collection_name``, readers see either the old or the new collection."""
+        operations = []
+        if self.get_alias_target(alias_name) is not None:
+            operations.append(models.DeleteAliasOperation(
+                delete_alias=models.DeleteAlias(alias_name=alias_name)
+            ))
+        operations.append(models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias_name)
+        ))
+
+        # all the operations of one request are applied atomically
+        return self.client.update_collection_aliases(change_aliases_operations=operations)
+
+    def delete_alias(self, alias_name: str):
+        if self.get_alias_target(alias_name) is not None:
+            return self.client.update_collection_aliases(change_aliases_operations=[
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias_name))
+            ])
+
     def create_collection(self, collection_name: str, 
                                 embedding_size: int,
                                 do_reset: bool = False):
@@ -143,6 +178,24 @@ class QdrantDBProvider(VectorDBInterface):
                 self.logger.error(f"Error while inserting batch: {e}")
                 return False
 
+            VECTORS_UPSERTED.labels(provider=VectorDBEnums.QDRANT.value).inc(len(batch_records))
+
+        return True
+
+    def delete_many(self, collection_name: str, record_ids: list):
+
+        if not self.is_collection_existed(collection_name):
+            return False
+
+        try:
+            _ = self.client.delete(
+                collection_name=collection_name,
+                points_selector=models.PointIdsList(points=record_ids),
+            )
+        except Exception as e:
+            self.logger.error(f"Error while deleting records: {e}")
+            return False
+
         return True
         
     def search_by_vector(self, collection_name: str, vector: list, limit: int = 5):
@@ -164,3 +217,61 @@ class QdrantDBProvider(VectorDBInterface):
             for result in results
         ]
 
+    def search_many_by_vectors(self, collection_name: str, vectors: List[list], limit: int = 5):
+        """Run all the searches in one request, results are in the order of ``vectors``."""
+
+        try:
+            batch_results = self.client.search_batch(
+                collection_name=collection_name,
+                requests=[
+                    models.SearchRequest(vector=vector, limit=limit, with_payload=True)
+                    for vector in vectors
+                ]
+            )
+        except Exception as e:
+            self.logger.error(f"Error while searching batch: {e}")
+            return None
+
+        return [
+            [
+                RetrievedDocument(**{
+                    "score": result.score,
+                    "text": result.payload["text"],
+                })
+                for result in results
+            ]
+            for results in batch_results
+        ]
+
+    def sample_record_ids(self, collection_name: str, limit: int = 1):
+        """Ids of up to ``limit`` records of the collection, empty if it has none or does not exist."""
+        if not self.is_collection_existed(collection_name):
+            return []
+
+        records, _ = self.client.scroll(
+            collection_name=collection_name,
+            limit=limit,
+            with_payload=False,
+            with_vectors=False,
+        )
+
+        return [ record.id for record in records ]
+
+    def get_vectors(self, collection_name: str, record_ids: list):
+        """Stored vectors of ``record_ids`` by id, records without one are left out; None on error."""
+
+        try:
+            records = self.client.retrieve(
+                collection_name=collection_name,
+                ids=record_ids,
+                with_payload=False,
+                with_vectors=True,
+            )
+        except Exception as e:
+            self.logger.error(f"Error while retrieving vectors: {e}")
+            return None
+
+        return {
+            str(record.id): record.vector
+            for record in records
+        }